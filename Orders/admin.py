@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, Coupon, PaymentTransaction
+from .models import Order, OrderItem, Coupon, PaymentTransaction, StockReservation, PaymentEvent
 
 # Register your models here.
 @admin.register(Order)
@@ -42,4 +42,19 @@ class PaymentTransactionAdmin(admin.ModelAdmin):
     
 
     def __str__(self):
-        return f"payment of {self.amount} made -- trancID #{self.transaction_id}"
\ No newline at end of file
+        return f"payment of {self.amount} made -- trancID #{self.transaction_id}"
+
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("order", "product", "quantity", "status", "expires_at", "created_at")
+    search_fields = ("order__order_id", "status")
+    list_filter = ("status", "expires_at", "created_at")
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "event", "reference", "status", "received_at", "processed_at")
+    search_fields = ("event_id", "reference")
+    list_filter = ("event", "status", "received_at")
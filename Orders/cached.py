@@ -0,0 +1,65 @@
+from .models import Order
+from .serializers import OrderSerializer
+from utils.cache.cache import get_or_set_namespaced, refresh_namespaced
+from utils.cache.user_orders_cache_key import user_orders_cache_key, user_orders_cache_namespace
+from handlers.tasks.cacheRefresh import background_refresh
+
+STAFF_ORDERS_CACHE_KEY = "all_orders_admin"
+STAFF_ORDERS_CACHE_NAMESPACE = "orders"
+STAFF_ORDERS_TTL = 60 * 60 * 24 * 30
+
+
+def _orders_queryset():
+    return (
+        Order.objects.select_related("coupon", "payment")
+        .prefetch_related("items__product__category", "items__product__images")
+        .order_by('-created_at')
+    )
+
+
+def build_all_orders():
+    return OrderSerializer(_orders_queryset(), many=True).data
+
+
+def build_user_orders(user_id):
+    return OrderSerializer(_orders_queryset().filter(user_id=user_id), many=True).data
+
+
+def get_all_orders_cached():
+    # Cache for 30 days, rebuilt by one request at a time
+    return get_or_set_namespaced(
+        STAFF_ORDERS_CACHE_NAMESPACE,
+        STAFF_ORDERS_CACHE_KEY,
+        build_all_orders,
+        timeout=STAFF_ORDERS_TTL,
+        refresh=background_refresh("staff_orders")
+    )
+
+
+def get_user_orders_cached(user_id):
+    return get_or_set_namespaced(
+        user_orders_cache_namespace(user_id),
+        user_orders_cache_key(user_id),
+        lambda: build_user_orders(user_id),
+        refresh=background_refresh("user_orders", user_id)
+    )
+
+
+def warm_staff_orders():
+    """
+        Cache warmer for the staff order list, see CACHE_WARMERS.
+    """
+
+    get_all_orders_cached()
+
+
+def refresh_staff_orders():
+    refresh_namespaced(STAFF_ORDERS_CACHE_NAMESPACE, STAFF_ORDERS_CACHE_KEY, build_all_orders, timeout=STAFF_ORDERS_TTL)
+
+
+def refresh_user_orders(user_id):
+    refresh_namespaced(
+        user_orders_cache_namespace(user_id),
+        user_orders_cache_key(user_id),
+        lambda: build_user_orders(user_id)
+    )
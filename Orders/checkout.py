@@ -0,0 +1,144 @@
+import uuid
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from .models import Order, OrderItem, Coupon
+from .reservations import reserve_stock, OutOfStock
+from store.models import Product
+from users.models import Cart
+
+ORDER_TYPES = [value for value, _ in Order.ORDER_TYPE]
+
+
+class CheckoutError(ValueError):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def parse_cart_items(cart_items):
+    """
+        {product_id: quantity} from the cart lines sent by the client. Lines for the same
+        product are added up.
+    """
+
+    quantities = {}
+    for item in cart_items:
+        try:
+            product_id = uuid.UUID(str(item["product"]["id"]))
+            quantity = int(item["quantity"])
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError("Invalid cart item")
+
+        if quantity < 1:
+            raise CheckoutError("Quantity must be at least 1")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def apply_coupon(subtotal, coupon):
+    if coupon is None:
+        return subtotal
+
+    if coupon.discount_type == "percent":
+        discount = subtotal * coupon.discount_value / 100
+    else:
+        discount = coupon.discount_value
+    return max(Decimal("0"), subtotal - discount).quantize(Decimal("0.01"))
+
+
+def _lock_coupon(code):
+    try:
+        coupon = Coupon.objects.select_for_update().get(code=code)
+    except Coupon.DoesNotExist:
+        raise CheckoutError("coupon does not exist", status.HTTP_404_NOT_FOUND)
+
+    if coupon.used:
+        raise CheckoutError("coupon is already used")
+    if not coupon.is_active or (coupon.expires_at and timezone.now() > coupon.expires_at):
+        raise CheckoutError("The coupon has expired or not active")
+    return coupon
+
+
+def place_order(account, cart_items, order_type, coupon_code=None, empty_cart=True, **details):
+    """
+        Create the order and its items, reserve their stock, use up the coupon and empty the
+        user's cart (unless empty_cart is False), all in one transaction. The number of queries
+        does not depend on the number of cart lines. Raises CheckoutError with the message and
+        status code to answer with.
+    """
+
+    if order_type not in ORDER_TYPES:
+        raise CheckoutError("Invalid order type")
+
+    quantities = parse_cart_items(cart_items)
+
+    with transaction.atomic():
+        # Locked until commit, so two checkouts can't both use a single-use coupon
+        coupon = _lock_coupon(coupon_code) if coupon_code else None
+
+        products = Product.objects.only("id", "title", "price", "discount_price", "not_available").in_bulk(list(quantities))
+        for product_id in quantities:
+            product = products.get(product_id)
+            if product is None:
+                raise CheckoutError(f"Product with id {product_id} not found", status.HTTP_404_NOT_FOUND)
+            if product.not_available:
+                raise CheckoutError(f"Product with id {product_id} is not available")
+
+        lines = []
+        subtotal = Decimal("0")
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            price = product.discount_price if product.discount_price is not None else product.price
+            subtotal += price * quantity
+            lines.append((product, quantity, price))
+
+        order = Order.objects.create(
+            user=account,
+            total_amount=apply_coupon(subtotal, coupon),
+            order_type=order_type,
+            coupon=coupon,
+            reference=str(uuid.uuid4()),
+            **details
+        )
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price_at_purchase=price)
+            for product, quantity, price in lines
+        ])
+
+        # Delivery orders hold their stock until paid, pickup orders are paid on collection
+        try:
+            reserve_stock(order, quantities, hold=order_type == "delivery")
+        except OutOfStock as e:
+            titles = ", ".join(products[pk].title for pk in e.product_ids) or "some products"
+            raise CheckoutError(f"Not enough stock for {titles}", status.HTTP_409_CONFLICT)
+
+        if coupon is not None:
+            coupon.used = True
+            coupon.save(update_fields=["used"])
+
+        if empty_cart:
+            Cart.objects.filter(user=account).delete()
+
+    return order
+
+
+def empty_cart(account):
+    Cart.objects.filter(user=account).delete()
+
+
+def cancel_order(order):
+    """
+        Undo a checkout whose payment could not be started: the order is cancelled, which puts
+        its stock back (see signals), and its coupon can be used again.
+    """
+
+    with transaction.atomic():
+        order.status = "cancelled"
+        order.save(update_fields=["status", "updated_at"])
+        if order.coupon is not None:
+            order.coupon.used = False
+            order.coupon.save(update_fields=["used"])
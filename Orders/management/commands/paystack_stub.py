@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from Orders.paystack_stub import PaystackStub
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for the Paystack API, with configurable latency and failures (set PAYSTACK_BASE_URL to its url)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8099)
+        parser.add_argument("--latency", type=float, default=0, help="Seconds added to every response")
+        parser.add_argument("--jitter", type=float, default=0, help="Up to this many more seconds, at random")
+        parser.add_argument("--failure-rate", type=float, default=0, help="Share of requests answered with a 500")
+        parser.add_argument("--hang-rate", type=float, default=0, help="Share of requests left without an answer")
+        parser.add_argument("--hang", type=float, default=60, help="Seconds a hanging request is held")
+        parser.add_argument("--outcome", choices=["success", "failed", "abandoned"], default="success",
+                            help="Status initialized transactions verify with")
+        parser.add_argument("--verbose", action="store_true", help="Log every request")
+
+    def handle(self, *args, **options):
+        stub = PaystackStub(
+            host=options["host"],
+            port=options["port"],
+            latency=options["latency"],
+            jitter=options["jitter"],
+            failure_rate=options["failure_rate"],
+            hang_rate=options["hang_rate"],
+            hang=options["hang"],
+            outcome=options["outcome"],
+            verbose=options["verbose"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Paystack stub listening, set PAYSTACK_BASE_URL={stub.url}"))
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stub.stop()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from Orders.reconciliation import (
+    reconcile_pending_payments, PAYMENT_RECONCILE_AFTER, PAYMENT_FAIL_AFTER, PAYMENT_RECONCILE_WORKERS
+)
+
+
+class Command(BaseCommand):
+    help = "Check pending payments with Paystack, settle the paid ones and fail the ones that never will be"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=PAYMENT_RECONCILE_AFTER, help="Minutes")
+        parser.add_argument("--fail-after", type=int, default=PAYMENT_FAIL_AFTER, help="Hours")
+        parser.add_argument("--workers", type=int, default=PAYMENT_RECONCILE_WORKERS)
+
+    def handle(self, *args, **options):
+        counts = reconcile_pending_payments(
+            older_than=options["older_than"],
+            fail_after=options["fail_after"],
+            workers=options["workers"]
+        )
+        self.stdout.write(self.style.SUCCESS(", ".join(f"{name}: {count}" for name, count in counts.items())))
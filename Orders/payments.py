@@ -0,0 +1,105 @@
+import hashlib
+import hmac
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Order, PaymentTransaction, PaymentEvent
+from .reservations import commit_reservations
+
+
+def settle_payment(reference, amount_paid, paid_at=None):
+    """
+        Mark a successful payment and its order as paid and commit the order's stock.
+        Safe to call more than once for the same payment (verify_payment, webhooks and the
+        reconciliation job may all report it). Returns the payment, None when unknown.
+    """
+
+    with transaction.atomic():
+        payment = PaymentTransaction.objects.select_for_update().filter(reference=reference).first()
+        if payment is None:
+            return None
+        if payment.status == "success":
+            return payment
+
+        payment.status = "success"
+        payment.paystack_amount = amount_paid
+        payment.paid_at = paid_at or timezone.now()
+        payment.save()
+
+        # Locked so the reservation sweep can't release the stock under us
+        order = Order.objects.select_for_update().filter(reference=reference).first()
+        if order is None:
+            print(f"⚠️ Payment {reference} settled without an order")
+            return payment
+
+        order.status = "paid"
+        order.payment = payment
+        order.save()
+        commit_reservations(order)
+
+    return payment
+
+
+def verify_signature(body, signature):
+    """
+        Paystack signs webhook bodies with HMAC-SHA512 of the secret key.
+    """
+
+    if not signature or not settings.PAYSTACK_SECRET_KEY:
+        return False
+
+    expected = hmac.new(settings.PAYSTACK_SECRET_KEY.encode("utf-8"), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def event_id(payload):
+    """
+        Paystack events carry no id of their own, the event name and the id of the
+        transaction it is about identify them.
+    """
+
+    data = payload.get("data") or {}
+    return f"{payload.get('event')}:{data.get('id') or data.get('reference')}"
+
+
+def record_event(payload):
+    """
+        Store a webhook event, returns (event, created). A redelivered event is not stored again.
+    """
+
+    data = payload.get("data") or {}
+    return PaymentEvent.objects.get_or_create(
+        event_id=event_id(payload),
+        defaults={
+            "event": payload.get("event") or "",
+            "reference": data.get("reference"),
+            "payload": payload,
+        }
+    )
+
+
+def apply_event(event_pk):
+    """
+        Apply a stored webhook event to its payment and order, once.
+    """
+
+    with transaction.atomic():
+        event = PaymentEvent.objects.select_for_update().filter(pk=event_pk).first()
+        if event is None or event.status != "received":
+            return event
+
+        data = event.payload.get("data") or {}
+        if event.event == "charge.success" and data.get("status") == "success":
+            payment = settle_payment(
+                event.reference,
+                data.get("amount", 0) / 100,
+                parse_datetime(data["paid_at"]) if data.get("paid_at") else None
+            )
+            event.status = "processed" if payment else "ignored"
+        else:
+            event.status = "ignored"
+
+        event.processed_at = timezone.now()
+        event.save(update_fields=["status", "processed_at"])
+    return event
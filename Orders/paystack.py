@@ -0,0 +1,200 @@
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+PAYSTACK_CALLBACK_URL = getattr(settings, "PAYSTACK_CALLBACK_URL", "https://bijoux-chic.vercel.app/checkout/success-payment")
+# Seconds to open a connection and to wait for the response
+PAYSTACK_CONNECT_TIMEOUT = getattr(settings, "PAYSTACK_CONNECT_TIMEOUT", 3.05)
+PAYSTACK_READ_TIMEOUT = getattr(settings, "PAYSTACK_READ_TIMEOUT", 10)
+# Attempts after the first one, backing off exponentially with full jitter
+PAYSTACK_MAX_RETRIES = getattr(settings, "PAYSTACK_MAX_RETRIES", 2)
+PAYSTACK_RETRY_BACKOFF = getattr(settings, "PAYSTACK_RETRY_BACKOFF", 0.25)
+# Keep-alive connections kept per process
+PAYSTACK_POOL_SIZE = getattr(settings, "PAYSTACK_POOL_SIZE", 10)
+# After this many failed calls in a row, fail fast for PAYSTACK_CIRCUIT_RESET seconds
+PAYSTACK_CIRCUIT_FAILURES = getattr(settings, "PAYSTACK_CIRCUIT_FAILURES", 5)
+PAYSTACK_CIRCUIT_RESET = getattr(settings, "PAYSTACK_CIRCUIT_RESET", 30)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class PaystackError(Exception):
+    pass
+
+
+class PaystackUnavailable(PaystackError):
+    """
+        Paystack could not be reached, timed out, answered with a server error, or the
+        circuit breaker is open. Nothing is known about the outcome of the call.
+    """
+
+
+class CircuitBreaker:
+    """
+        Closed: calls go through. Open after `failures` failed calls in a row: calls fail
+        right away for `reset` seconds, then a single trial call is let through (half-open)
+        and its outcome closes or reopens the circuit. State is kept per process.
+    """
+
+    def __init__(self, failures=PAYSTACK_CIRCUIT_FAILURES, reset=PAYSTACK_CIRCUIT_RESET):
+        self.failures = failures
+        self.reset = reset
+        self._failed = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def succeeded(self):
+        with self._lock:
+            self._failed = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failed(self):
+        with self._lock:
+            self._failed += 1
+            if self._trial or self._failed >= self.failures:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+circuit_breaker = CircuitBreaker()
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+        Keep-alive session of this process (workers are forked, a pool can't be shared).
+    """
+
+    global _session, _session_pid
+
+    if _session_pid != os.getpid():
+        with _session_lock:
+            if _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PAYSTACK_POOL_SIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+                _session_pid = os.getpid()
+    return _session
+
+
+def _backoff(attempt):
+    return random.uniform(0, PAYSTACK_RETRY_BACKOFF * (2 ** attempt))
+
+
+def _can_retry(error, idempotent):
+    # A POST is only sent again when the connection failed: it could not be opened, or a pooled
+    # keep-alive connection turned out to be closed by Paystack. Never after a read timeout,
+    # the request may be in progress. A POST that did get through is refused as a duplicate
+    # reference the second time, not charged twice.
+    return idempotent or isinstance(error, requests.ConnectionError)
+
+
+def request(method, path, idempotent=True, **kwargs):
+    """
+        Call the Paystack API and return its JSON body, also for 4xx answers (they carry
+        "status": false and a message). Raises PaystackUnavailable otherwise.
+    """
+
+    headers = {
+        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
+        "Content-Type": "application/json",
+    }
+    # Read on every call, tests point it at the local stub (see paystack_stub)
+    url = getattr(settings, "PAYSTACK_BASE_URL", "https://api.paystack.co").rstrip("/") + path
+
+    # The breaker counts calls, not attempts: a call that succeeds on a retry is no failure
+    if not circuit_breaker.allow():
+        raise PaystackUnavailable("Paystack is unavailable, not calling it for now")
+
+    error = None
+    settled = False
+    try:
+        for attempt in range(PAYSTACK_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(_backoff(attempt - 1))
+
+            try:
+                response = get_session().request(
+                    method, url, headers=headers,
+                    timeout=(PAYSTACK_CONNECT_TIMEOUT, PAYSTACK_READ_TIMEOUT),
+                    **kwargs
+                )
+            except requests.RequestException as e:
+                error = e
+                if _can_retry(e, idempotent):
+                    continue
+                break
+
+            if response.status_code in RETRY_STATUS_CODES:
+                error = f"Paystack answered {response.status_code}"
+                # Rate limited or overloaded means the request was not processed
+                if idempotent or response.status_code in (429, 503):
+                    continue
+                break
+
+            try:
+                data = response.json()
+            except ValueError:
+                error = f"Paystack answered {response.status_code} without JSON"
+                break
+
+            circuit_breaker.succeeded()
+            settled = True
+            return data
+
+        circuit_breaker.failed()
+        settled = True
+
+    finally:
+        # Anything else that went wrong counts as a failure too, so a half-open trial always ends
+        if not settled:
+            circuit_breaker.failed()
+
+    print(f"⚠️ Paystack {method} {path} failed: {error}")
+    raise PaystackUnavailable(str(error))
+
+
+def initialize_transaction(email, amount, reference, callback_url=PAYSTACK_CALLBACK_URL):
+    """
+        Start a payment of `amount` (in the main currency unit) and get its authorization_url.
+    """
+
+    return request("POST", "/transaction/initialize", idempotent=False, json={
+        "email": email,
+        "amount": int(amount * 100),
+        "reference": reference,
+        "callback_url": callback_url,
+    })
+
+
+def verify_transaction(reference):
+    return request("GET", f"/transaction/verify/{reference}")
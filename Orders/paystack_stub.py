@@ -0,0 +1,175 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.utils import timezone
+
+# Local stand-in for the two Paystack endpoints we call, to load test checkout and payment
+# verification offline and to see how the client copes with slow or failing responses.
+# Run it with `python manage.py paystack_stub` and set PAYSTACK_BASE_URL to its url.
+
+
+class PaystackStub:
+    """
+        Serves POST /transaction/initialize and GET /transaction/verify/<reference>.
+        Every response is delayed by `latency` plus up to `jitter` seconds. A `failure_rate`
+        share of the requests get a 500 and a `hang_rate` share get no answer for `hang`
+        seconds. Initialized transactions verify with `outcome` ("success", "failed" or
+        "abandoned"); tests can also seed them with add_transaction().
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0, jitter=0, failure_rate=0, hang_rate=0, hang=60, outcome="success", verbose=False):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.outcome = outcome
+        self.verbose = verbose
+        self.transactions = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.server = ThreadingHTTPServer((host, port), _handler(self))
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_transaction(self, reference, amount, status="success", email="customer@example.com"):
+        """
+            Known to the stub as if it had been initialized, `amount` in kobo.
+        """
+
+        with self._lock:
+            self.transactions[reference] = {
+                "id": random.randint(10 ** 8, 10 ** 9),
+                "reference": reference,
+                "amount": amount,
+                "email": email,
+                "status": status,
+                "created_at": timezone.now().isoformat(),
+            }
+
+    def start(self):
+        """
+            Serve from a background thread, for tests.
+        """
+
+        self._thread = threading.Thread(target=self.server.serve_forever, name="paystack-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # Request handling
+
+    def handle(self, method, path, authorization, body):
+        with self._lock:
+            self.requests += 1
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if self.hang_rate and random.random() < self.hang_rate:
+            time.sleep(self.hang)
+            return None
+        if self.failure_rate and random.random() < self.failure_rate:
+            return 500, {"status": False, "message": "Stub failure"}
+
+        if not authorization.startswith("Bearer "):
+            return 401, {"status": False, "message": "Invalid key"}
+
+        if method == "POST" and path == "/transaction/initialize":
+            return self.initialize(body)
+        if method == "GET" and path.startswith("/transaction/verify/"):
+            return self.verify(path[len("/transaction/verify/"):])
+        return 404, {"status": False, "message": "Not found"}
+
+    def initialize(self, body):
+        try:
+            data = json.loads(body or b"{}")
+            email, amount, reference = data["email"], int(data["amount"]), str(data["reference"])
+        except (ValueError, KeyError, TypeError):
+            return 400, {"status": False, "message": "email, amount and reference are required"}
+
+        if reference in self.transactions:
+            return 400, {"status": False, "message": "Duplicate Transaction Reference"}
+
+        self.add_transaction(reference, amount, status=self.outcome, email=email)
+        access_code = uuid.uuid4().hex[:15]
+        return 200, {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"{self.url}/checkout/{access_code}",
+                "access_code": access_code,
+                "reference": reference,
+            },
+        }
+
+    def verify(self, reference):
+        transaction = self.transactions.get(reference)
+        if transaction is None:
+            return 400, {"status": False, "message": "Transaction reference not found"}
+
+        paid = transaction["status"] == "success"
+        return 200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": {
+                "id": transaction["id"],
+                "status": transaction["status"],
+                "reference": reference,
+                "amount": transaction["amount"],
+                "currency": "GHS",
+                "gateway_response": "Successful" if paid else "Declined",
+                "paid_at": timezone.now().isoformat() if paid else None,
+                "created_at": transaction["created_at"],
+                "customer": {"email": transaction["email"]},
+            },
+        }
+
+
+def _handler(stub):
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, like the real API
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+
+            result = stub.handle(self.command, self.path.split("?")[0], self.headers.get("Authorization", ""), body)
+            if result is None:
+                self.close_connection = True
+                return
+
+            code, payload = result
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = _respond
+        do_POST = _respond
+
+        def log_message(self, format, *args):
+            if stub.verbose:
+                super().log_message(format, *args)
+
+    return Handler
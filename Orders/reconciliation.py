@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import PaymentTransaction
+from .payments import settle_payment
+from . import paystack
+
+# Pending payments are checked with Paystack once they are this many minutes old...
+PAYMENT_RECONCILE_AFTER = getattr(settings, "PAYMENT_RECONCILE_AFTER", 15)
+# ...and given up on (marked failed) once they are this many hours old and still not paid
+PAYMENT_FAIL_AFTER = getattr(settings, "PAYMENT_FAIL_AFTER", 24)
+PAYMENT_RECONCILE_BATCH = getattr(settings, "PAYMENT_RECONCILE_BATCH", 100)
+# Paystack calls in flight at once
+PAYMENT_RECONCILE_WORKERS = getattr(settings, "PAYMENT_RECONCILE_WORKERS", 8)
+
+# Paystack transaction statuses that will never turn into a payment
+FAILED_STATUSES = ("failed", "reversed")
+
+
+def _verify(reference):
+    try:
+        return paystack.verify_transaction(reference)
+    except paystack.PaystackUnavailable:
+        return None
+
+
+def reconcile_pending_payments(older_than=PAYMENT_RECONCILE_AFTER, fail_after=PAYMENT_FAIL_AFTER,
+                               batch_size=PAYMENT_RECONCILE_BATCH, workers=PAYMENT_RECONCILE_WORKERS):
+    """
+        Ask Paystack about every payment still pending `older_than` minutes after it started.
+        Paid ones are settled (order and stock included), declined ones and those still unpaid
+        after `fail_after` hours are marked failed. Returns counts of what was done.
+    """
+
+    now = timezone.now()
+    fail_before = now - timedelta(hours=fail_after)
+    pending = PaymentTransaction.objects.filter(
+        status="pending", created_at__lte=now - timedelta(minutes=older_than)
+    ).only("id", "reference", "status", "created_at").order_by("pk")
+
+    counts = {"checked": 0, "settled": 0, "failed": 0, "pending": 0, "errors": 0}
+    last_pk = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Keyset paging: rows leaving the pending state don't shift the pages
+            payments = list(pending.filter(pk__gt=last_pk)[:batch_size])
+            if not payments:
+                break
+            last_pk = payments[-1].pk
+
+            # Only the Paystack calls run on the pool, the database is used from this thread
+            results = executor.map(_verify, [payment.reference for payment in payments])
+
+            failed = []
+            for payment, result in zip(payments, results):
+                counts["checked"] += 1
+
+                if result is None:
+                    counts["errors"] += 1
+                    continue
+
+                data = result.get("data") or {}
+                paystack_status = data.get("status") if result.get("status") else None
+
+                if paystack_status == "success":
+                    settle_payment(payment.reference, data.get("amount", 0) / 100)
+                    counts["settled"] += 1
+                elif paystack_status in FAILED_STATUSES or payment.created_at <= fail_before:
+                    failed.append(payment.pk)
+                else:
+                    counts["pending"] += 1
+
+            # One UPDATE per page, skipping payments a webhook settled in the meantime
+            counts["failed"] += PaymentTransaction.objects.filter(pk__in=failed, status="pending").update(status="failed")
+
+            if paystack.circuit_breaker.state == "open":
+                print("⚠️ Paystack is unavailable, payment reconciliation stopped early")
+                break
+
+    return counts
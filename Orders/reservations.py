@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+import operator
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Case, When, IntegerField
+from django.utils import timezone
+from .models import Order, StockReservation
+from store.models import Product
+from store.invalidation import invalidate_stock
+
+# How long an unpaid order keeps its stock before the sweep puts it back
+STOCK_RESERVATION_TTL = getattr(settings, "STOCK_RESERVATION_TTL", 60 * 30)
+# Orders released per sweep run
+STOCK_RESERVATION_SWEEP_BATCH = getattr(settings, "STOCK_RESERVATION_SWEEP_BATCH", 200)
+
+
+class OutOfStock(ValueError):
+    def __init__(self, product_ids):
+        super().__init__("Not enough stock")
+        self.product_ids = product_ids
+
+
+def _lock_products(product_ids):
+    # Always in the same order, so two carts sharing products can't deadlock
+    list(Product.objects.select_for_update().filter(pk__in=product_ids).order_by("pk").values_list("pk", flat=True))
+
+
+def _stock_change(quantities, sign):
+    return Case(
+        *[When(pk=pk, then=F("stock") + sign * quantity) for pk, quantity in quantities.items()],
+        default=F("stock"),
+        output_field=IntegerField()
+    )
+
+
+def take_stock(quantities):
+    """
+        Take {product_id: quantity} out of stock, all or nothing, with a single conditional
+        UPDATE: a product is only decremented if it still has enough stock at that moment.
+        Raises OutOfStock (with nothing taken) otherwise. Must run inside a transaction.
+    """
+
+    _lock_products(list(quantities))
+
+    enough = reduce(operator.or_, (Q(pk=pk, stock__gte=quantity) for pk, quantity in quantities.items()))
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(enough).update(
+                stock=_stock_change(quantities, -1),
+                # Moves the products' cached fragments out of the way
+                updated_at=timezone.now()
+            )
+            if updated < len(quantities):
+                raise OutOfStock([])
+    except OutOfStock:
+        stock = dict(Product.objects.filter(pk__in=list(quantities)).values_list("pk", "stock"))
+        raise OutOfStock([pk for pk, quantity in quantities.items() if stock.get(pk, 0) < quantity])
+
+    transaction.on_commit(lambda: invalidate_stock(list(quantities)))
+
+
+def put_back_stock(quantities):
+    _lock_products(list(quantities))
+    Product.objects.filter(pk__in=list(quantities)).update(
+        stock=_stock_change(quantities, 1),
+        updated_at=timezone.now()
+    )
+    transaction.on_commit(lambda: invalidate_stock(list(quantities)))
+
+
+def _quantities(reservations):
+    quantities = defaultdict(int)
+    for reservation in reservations:
+        quantities[reservation.product_id] += reservation.quantity
+    return dict(quantities)
+
+
+def reserve_stock(order, quantities, hold=True):
+    """
+        Take the order's products out of stock and record it. Held reservations expire after
+        STOCK_RESERVATION_TTL unless the payment commits them, other ones are committed right away.
+        Raises OutOfStock. Must run inside the transaction creating the order.
+    """
+
+    take_stock(quantities)
+
+    expires_at = timezone.now() + timedelta(seconds=STOCK_RESERVATION_TTL) if hold else None
+    StockReservation.objects.bulk_create([
+        StockReservation(
+            order=order,
+            product_id=product_id,
+            quantity=quantity,
+            status="held" if hold else "committed",
+            expires_at=expires_at
+        )
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def commit_reservations(order):
+    """
+        The order was paid, its held stock is sold for good. Holds that expired before the
+        payment came in are taken out of stock again if there is still enough.
+    """
+
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update().filter(order=order).exclude(status="committed")
+        )
+        released = [reservation for reservation in reservations if reservation.status == "released"]
+        committed = [reservation for reservation in reservations if reservation.status == "held"]
+
+        if released:
+            try:
+                take_stock(_quantities(released))
+                committed += released
+            except OutOfStock as e:
+                print(f"⚠️ Order {order.order_id} was paid after its stock was released, now out of stock: {e.product_ids}")
+
+        StockReservation.objects.filter(pk__in=[reservation.pk for reservation in committed]).update(
+            status="committed", expires_at=None, updated_at=timezone.now()
+        )
+    return len(committed)
+
+
+def release_reservations(order, expired_only=False):
+    """
+        Put the order's reserved stock back. Only expired holds with expired_only, otherwise
+        everything the order still holds or bought (it was cancelled).
+    """
+
+    with transaction.atomic():
+        reservations = StockReservation.objects.select_for_update().filter(order=order)
+        if expired_only:
+            reservations = reservations.filter(status="held", expires_at__lte=timezone.now())
+        else:
+            reservations = reservations.exclude(status="released")
+        reservations = list(reservations)
+        if not reservations:
+            return 0
+
+        put_back_stock(_quantities(reservations))
+        StockReservation.objects.filter(pk__in=[reservation.pk for reservation in reservations]).update(
+            status="released", updated_at=timezone.now()
+        )
+    return len(reservations)
+
+
+def release_expired_reservations(batch_size=STOCK_RESERVATION_SWEEP_BATCH):
+    """
+        Give back the stock of unpaid orders whose holds expired and cancel them.
+        Returns the number of orders released.
+    """
+
+    order_ids = list(
+        StockReservation.objects.filter(status="held", expires_at__lte=timezone.now())
+        .values_list("order_id", flat=True).distinct()[:batch_size]
+    )
+
+    released = 0
+    for order_id in order_ids:
+        with transaction.atomic():
+            # verify_payment locks the order too, a payment and the sweep can't cross
+            order = Order.objects.select_for_update().filter(pk=order_id).first()
+            if order is None:
+                continue
+            if order.status in ("paid", "delivered"):
+                commit_reservations(order)
+                continue
+            if not release_reservations(order, expired_only=True):
+                continue
+            if order.status == "pending":
+                order.status = "cancelled"
+                order.save(update_fields=["status", "updated_at"])
+            released += 1
+    return released
@@ -1,18 +1,21 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
 from .models import Coupon, Order
-from .views import STAFF_ORDERS_CACHE_KEY
-from admin_panel.views import COUPONS_CACHE_KEY
-from utils.cache.user_orders_cache_key import user_orders_cache_key
+from .cached import STAFF_ORDERS_CACHE_NAMESPACE
+from .reservations import release_reservations
+from admin_panel.cached import COUPONS_CACHE_NAMESPACE
+from handlers.tasks.cacheWarming import schedule_cache_warming
+from utils.cache.cache import bump_namespace
+from utils.cache.user_orders_cache_key import user_orders_cache_namespace
 
 @receiver([post_save, post_delete], sender=Coupon)
 def clear_coupon_cache(sender, instance, **kwargs):
     """
         Clear cached coupons whenever a coupon is created, updated, or deleted.
     """
-    cache.delete(COUPONS_CACHE_KEY)
-    print(f"🧹 Cleared cache for coupons: {COUPONS_CACHE_KEY}")
+    bump_namespace(COUPONS_CACHE_NAMESPACE)
+    schedule_cache_warming("coupons")
+    print(f"🧹 Cleared cache for coupons: {COUPONS_CACHE_NAMESPACE}")
 
 
 @receiver([post_save, post_delete], sender=Order)
@@ -21,9 +24,21 @@ def clear_user_orders_cache(sender, instance, **kwargs):
         Clear cached orders for a user whenever an order is created, updated, or deleted.
     """
     
-    if instance.user:
-        cache_key = user_orders_cache_key(instance.user.id)
-        cache.delete(cache_key)
+    if instance.user_id:
+        bump_namespace(user_orders_cache_namespace(instance.user_id))
     
-    cache.delete(STAFF_ORDERS_CACHE_KEY)
-    print(f"Cleared cache for staff orders: {STAFF_ORDERS_CACHE_KEY}")
+    bump_namespace(STAFF_ORDERS_CACHE_NAMESPACE)
+    schedule_cache_warming("orders")
+    print(f"Cleared cache for staff orders: {STAFF_ORDERS_CACHE_NAMESPACE}")
+
+
+@receiver(post_save, sender=Order)
+def release_cancelled_order_stock(sender, instance, **kwargs):
+    """
+        Put the stock of a cancelled order back on sale.
+    """
+
+    if instance.status == "cancelled":
+        released = release_reservations(instance)
+        if released:
+            print(f"Released {released} stock reservations of cancelled order {instance.order_id}")
@@ -1,3 +1,503 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+import requests
+from django.contrib.auth.models import User
+from django.db import connection, DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from django.utils import timezone
+from .checkout import place_order, CheckoutError
+from .models import Order, Coupon, StockReservation, PaymentTransaction, PaymentEvent
+from .reservations import commit_reservations, release_expired_reservations
+from .reconciliation import reconcile_pending_payments
+from .paystack_stub import PaystackStub
+from store.models import Product, Category
+from users.models import UserAccount, Cart
+from handlers.tasks.paystackWebhooks import process_payment_event
+from . import paystack
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 # Create your tests here.
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CheckoutTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret")
+        self.account = UserAccount.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        category = Category.objects.create(name="rings")
+        self.products = [
+            Product.objects.create(title=f"ring {i}", description="", category=category, price=Decimal("20.00"), discount_price=Decimal("10.00"), stock=100)
+            for i in range(30)
+        ]
+
+    def checkout(self, products, coupon=None):
+        Cart.objects.bulk_create([Cart(user=self.account, product=product) for product in products])
+        return self.client.post("/api/v1/orders/order/checkout/", {
+            "order_type": "pickup",
+            "coupon": coupon,
+            "cart_items": [{"product": {"id": str(product.id)}, "quantity": 2} for product in products],
+        }, format="json")
+
+    def count_checkout_queries(self, products):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.checkout(products)
+        self.assertEqual(response.status_code, 201, response.data)
+        # Filling the cart is test setup, not checkout
+        return len(queries) - 1
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        # The first request also caches the user's account
+        self.checkout(self.products[:1])
+
+        one_line = self.count_checkout_queries(self.products[:1])
+        thirty_lines = self.count_checkout_queries(self.products)
+        self.assertEqual(one_line, thirty_lines)
+
+    def test_order_items_and_cart(self):
+        response = self.checkout(self.products[:3])
+
+        order = Order.objects.get(id=response.data["order_id"])
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.total_amount, Decimal("60.00"))
+        self.assertFalse(Cart.objects.filter(user=self.account).exists())
+
+    def test_coupon_applied_once_and_used_up(self):
+        Coupon.objects.create(code="TENOFF", discount_type="percent", discount_value=Decimal("10"))
+
+        response = self.checkout(self.products[:3], coupon="TENOFF")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Order.objects.get(id=response.data["order_id"]).total_amount, Decimal("54.00"))
+        self.assertTrue(Coupon.objects.get(code="TENOFF").used)
+
+        response = self.checkout(self.products[:1], coupon="TENOFF")
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_product_writes_nothing(self):
+        Cart.objects.create(user=self.account, product=self.products[0])
+        response = self.client.post("/api/v1/orders/order/checkout/", {
+            "order_type": "pickup",
+            "cart_items": [
+                {"product": {"id": str(self.products[0].id)}, "quantity": 1},
+                {"product": {"id": "00000000-0000-0000-0000-000000000000"}, "quantity": 1},
+            ],
+        }, format="json")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(Cart.objects.filter(user=self.account).exists())
+
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class PaystackCheckoutTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = PaystackStub().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret")
+        self.account = UserAccount.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(title="ring", description="", price=Decimal("10.00"), stock=5)
+        Coupon.objects.create(code="TENOFF", discount_type="percent", discount_value=Decimal("10"))
+        Cart.objects.create(user=self.account, product=self.product, color="gold")
+        paystack.circuit_breaker.succeeded()
+
+    def tearDown(self):
+        self.stub.failure_rate = 0
+        paystack.circuit_breaker.succeeded()
+
+    def checkout(self):
+        with self.settings(PAYSTACK_BASE_URL=self.stub.url):
+            return self.client.post("/api/v1/orders/order/checkout/", {
+                "order_type": "delivery",
+                "coupon": "TENOFF",
+                "cart_items": [{"product": {"id": str(self.product.id)}, "quantity": 2}],
+            }, format="json")
+
+    def test_payment_started(self):
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get(id=response.data["order_id"])
+        self.assertEqual(order.payment.status, "pending")
+        self.assertTrue(Coupon.objects.get(code="TENOFF").used)
+        self.assertFalse(Cart.objects.filter(user=self.account).exists())
+
+    def test_paystack_down_keeps_coupon_and_cart(self):
+        self.stub.failure_rate = 1
+
+        response = self.checkout()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(Order.objects.get().status, "cancelled")
+        self.assertFalse(Coupon.objects.get(code="TENOFF").used)
+        self.assertEqual(Cart.objects.get(user=self.account).color, "gold")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+        # Once Paystack is back the same cart and coupon go through
+        self.stub.failure_rate = 0
+        paystack.circuit_breaker.succeeded()
+        self.assertEqual(self.checkout().status_code, 201)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class StockReservationTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret")
+        self.account = UserAccount.objects.create(user=user)
+        self.product = Product.objects.create(title="ring", description="", price=Decimal("10.00"), stock=5)
+
+    def order(self, quantity, order_type="delivery"):
+        return place_order(self.account, [{"product": {"id": str(self.product.id)}, "quantity": quantity}], order_type)
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock
+
+    def test_checkout_holds_stock(self):
+        order = self.order(2)
+
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(order.reservations.get().status, "held")
+
+    def test_not_enough_stock_writes_nothing(self):
+        with self.assertRaises(CheckoutError) as raised:
+            self.order(6)
+
+        self.assertEqual(raised.exception.status_code, 409)
+        self.assertEqual(self.stock(), 5)
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_hold_is_released_and_order_cancelled(self):
+        order = self.order(2)
+        order.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(self.stock(), 5)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "cancelled")
+
+    def test_payment_commits_hold(self):
+        order = self.order(2)
+        commit_reservations(order)
+        order.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(order.reservations.get().status, "committed")
+
+    def test_payment_after_release_takes_stock_again(self):
+        order = self.order(2)
+        order.reservations.update(expires_at=timezone.now() - timedelta(seconds=1))
+        release_expired_reservations()
+
+        commit_reservations(order)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(order.reservations.get().status, "committed")
+
+    def test_cancelling_puts_stock_back(self):
+        order = self.order(2, order_type="pickup")
+        self.assertEqual(self.stock(), 3)
+
+        order.status = "cancelled"
+        order.save()
+        self.assertEqual(self.stock(), 5)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ConcurrentCheckoutTests(TransactionTestCase):
+    BUYERS = 12
+    STOCK = 5
+
+    def setUp(self):
+        self.product = Product.objects.create(title="hot ring", description="", price=Decimal("10.00"), stock=self.STOCK)
+        self.accounts = [
+            UserAccount.objects.create(user=User.objects.create_user(username=f"buyer{i}", password="secret"))
+            for i in range(self.BUYERS)
+        ]
+
+    def test_concurrent_checkouts_never_oversell(self):
+        barrier = threading.Barrier(self.BUYERS)
+        results = []
+
+        def buy(account):
+            barrier.wait()
+            try:
+                # SQLite lets one writer in at a time and fails the others, try again
+                for attempt in range(100):
+                    try:
+                        place_order(account, [{"product": {"id": str(self.product.id)}, "quantity": 1}], "delivery")
+                        results.append("ok")
+                        return
+                    except CheckoutError:
+                        results.append("out of stock")
+                        return
+                    except DatabaseError:
+                        time.sleep(0.01)
+                results.append("gave up")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(account,)) for account in self.accounts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        sold = results.count("ok")
+        self.product.refresh_from_db()
+        self.assertEqual(len(results), self.BUYERS)
+        self.assertEqual(sold, self.STOCK)
+        self.assertEqual(results.count("out of stock"), self.BUYERS - self.STOCK)
+        self.assertEqual(self.product.stock, self.STOCK - sold)
+        self.assertEqual(Order.objects.count(), sold)
+        self.assertEqual(sum(StockReservation.objects.values_list("quantity", flat=True)), sold)
+
+
+
+@override_settings(CACHES=LOCAL_CACHES, PAYSTACK_SECRET_KEY="sk_test_webhook", PAYSTACK_BASE_URL="http://127.0.0.1:9")
+class PaystackWebhookTests(TestCase):
+
+    def setUp(self):
+        # Run the task in-process, whether or not a broker is around
+        self.eager = process_payment_event.app.conf.task_always_eager
+        process_payment_event.app.conf.task_always_eager = True
+
+        self.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret")
+        account = UserAccount.objects.create(user=self.user)
+        self.product = Product.objects.create(title="ring", description="", price=Decimal("10.00"), stock=5)
+        self.order = place_order(account, [{"product": {"id": str(self.product.id)}, "quantity": 2}], "delivery")
+        self.order.payment = PaymentTransaction.objects.create(reference=self.order.reference, amount=20)
+        self.order.save()
+
+    def tearDown(self):
+        process_payment_event.app.conf.task_always_eager = self.eager
+
+    def post_event(self, payload, signature=None):
+        body = json.dumps(payload).encode("utf-8")
+        if signature is None:
+            signature = hmac.new(b"sk_test_webhook", body, hashlib.sha512).hexdigest()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                "/api/v1/orders/order/paystack/webhook/", body,
+                content_type="application/json", HTTP_X_PAYSTACK_SIGNATURE=signature
+            )
+
+    def charge_success(self):
+        return {
+            "event": "charge.success",
+            "data": {"id": 4099260516, "reference": self.order.reference, "status": "success", "amount": 2000, "paid_at": "2026-10-18T10:00:00.000Z"},
+        }
+
+    def test_rejects_bad_signature(self):
+        response = self.post_event(self.charge_success(), signature="0" * 128)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_charge_success_settles_order_once(self):
+        self.assertEqual(self.post_event(self.charge_success()).status_code, 200)
+        self.assertEqual(self.post_event(self.charge_success()).data["message"], "already received")
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "paid")
+        self.assertEqual(self.order.payment.status, "success")
+        self.assertEqual(self.order.reservations.get().status, "committed")
+        self.assertEqual(PaymentEvent.objects.get().status, "processed")
+
+    def test_verify_payment_answers_from_settled_payment(self):
+        self.post_event(self.charge_success())
+
+        # PAYSTACK_BASE_URL points nowhere, a call out would fail with a 503
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post("/api/v1/orders/order/checkout/verify/", {"reference": self.order.reference}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_verify_payment_handles_paystack_errors(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with mock.patch.object(paystack, "verify_transaction", side_effect=paystack.PaystackError("rejected")):
+            response = client.post("/api/v1/orders/order/checkout/verify/", {"reference": self.order.reference}, format="json")
+
+        self.assertEqual(response.status_code, 503)
+
+
+
+@override_settings(CACHES=LOCAL_CACHES, PAYSTACK_SECRET_KEY="sk_test_reconcile")
+class PaymentReconciliationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = PaystackStub().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret")
+        self.account = UserAccount.objects.create(user=user)
+        self.product = Product.objects.create(title="ring", description="", price=Decimal("10.00"), stock=50)
+
+    def pending_payment(self, paystack_status, age):
+        order = place_order(self.account, [{"product": {"id": str(self.product.id)}, "quantity": 1}], "delivery")
+        payment = PaymentTransaction.objects.create(reference=order.reference, amount=10)
+        PaymentTransaction.objects.filter(pk=payment.pk).update(created_at=timezone.now() - age)
+        Order.objects.filter(pk=order.pk).update(payment=payment)
+        if paystack_status:
+            self.stub.add_transaction(order.reference, 1000, status=paystack_status)
+        return payment
+
+    def reconcile(self):
+        with self.settings(PAYSTACK_BASE_URL=self.stub.url):
+            return reconcile_pending_payments(older_than=15, fail_after=24, batch_size=2, workers=4)
+
+    def status(self, payment):
+        payment.refresh_from_db()
+        return payment.status
+
+    def test_reconciles_pending_payments(self):
+        paid = self.pending_payment("success", timedelta(hours=1))
+        declined = self.pending_payment("failed", timedelta(hours=1))
+        abandoned = self.pending_payment("abandoned", timedelta(hours=1))
+        abandoned_long_ago = self.pending_payment("abandoned", timedelta(days=2))
+        never_started = self.pending_payment(None, timedelta(days=2))
+        too_recent = self.pending_payment("success", timedelta(minutes=1))
+
+        counts = self.reconcile()
+
+        self.assertEqual(counts, {"checked": 5, "settled": 1, "failed": 3, "pending": 1, "errors": 0})
+        self.assertEqual(self.status(paid), "success")
+        self.assertEqual(Order.objects.get(reference=paid.reference).status, "paid")
+        self.assertEqual(self.status(declined), "failed")
+        self.assertEqual(self.status(abandoned), "pending")
+        self.assertEqual(self.status(abandoned_long_ago), "failed")
+        self.assertEqual(self.status(never_started), "failed")
+        self.assertEqual(self.status(too_recent), "pending")
+
+    def test_settled_payments_are_left_alone(self):
+        paid = self.pending_payment("success", timedelta(hours=1))
+        self.reconcile()
+
+        self.assertEqual(self.reconcile()["checked"], 0)
+        self.assertEqual(self.status(paid), "success")
+
+
+class PaystackClientTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = PaystackStub().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.stub.requests = 0
+        self.stub.failure_rate = 0
+        self.enterContext(mock.patch.object(paystack, "circuit_breaker", paystack.CircuitBreaker(failures=2, reset=0.2)))
+        self.enterContext(mock.patch.object(paystack, "PAYSTACK_RETRY_BACKOFF", 0.01))
+        self.enterContext(self.settings(PAYSTACK_BASE_URL=self.stub.url))
+        self.stub.add_transaction("ref-1", 1000)
+
+    def test_verify_is_retried(self):
+        self.stub.failure_rate = 1
+
+        with self.assertRaises(paystack.PaystackUnavailable):
+            paystack.verify_transaction("ref-1")
+        self.assertEqual(self.stub.requests, paystack.PAYSTACK_MAX_RETRIES + 1)
+
+    def test_post_is_not_retried_after_a_server_error(self):
+        self.stub.failure_rate = 1
+
+        with self.assertRaises(paystack.PaystackUnavailable):
+            paystack.initialize_transaction("buyer@example.com", 10, "ref-2")
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_post_is_retried_on_a_dropped_keep_alive_connection(self):
+        session = paystack.get_session()
+        send = session.request
+
+        def drop_first(*args, **kwargs):
+            if request.call_count == 1:
+                raise requests.ConnectionError("Connection aborted.")
+            return send(*args, **kwargs)
+
+        with mock.patch.object(session, "request", side_effect=drop_first) as request:
+            data = paystack.initialize_transaction("buyer@example.com", 10, "ref-3")
+
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(self.stub.requests, 1)
+        self.assertTrue(data["status"])
+
+    def test_backoff_has_full_jitter(self):
+        delays = [paystack._backoff(2) for _ in range(200)]
+
+        self.assertTrue(all(0 <= delay <= paystack.PAYSTACK_RETRY_BACKOFF * 4 for delay in delays))
+        self.assertGreater(len(set(delays)), 100)
+
+    def test_breaker_opens_then_lets_one_trial_through(self):
+        self.stub.failure_rate = 1
+        for _ in range(2):
+            with self.assertRaises(paystack.PaystackUnavailable):
+                paystack.verify_transaction("ref-1")
+        calls = self.stub.requests
+
+        # Open: fails without calling Paystack
+        self.assertEqual(paystack.circuit_breaker.state, "open")
+        with self.assertRaises(paystack.PaystackUnavailable):
+            paystack.verify_transaction("ref-1")
+        self.assertEqual(self.stub.requests, calls)
+
+        # Half-open: the trial call closes the circuit again
+        time.sleep(0.25)
+        self.stub.failure_rate = 0
+        self.assertEqual(paystack.circuit_breaker.state, "half-open")
+        self.assertTrue(paystack.verify_transaction("ref-1")["status"])
+        self.assertEqual(paystack.circuit_breaker.state, "closed")
+
+    def test_trial_ending_in_an_unexpected_error_reopens_the_circuit(self):
+        breaker = paystack.circuit_breaker
+        breaker.failed()
+        breaker.failed()
+        time.sleep(0.25)
+
+        with mock.patch.object(paystack, "get_session", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                paystack.verify_transaction("ref-1")
+
+        # The trial ended, the next one is let through once the circuit resets again
+        self.assertEqual(breaker.state, "open")
+        time.sleep(0.25)
+        self.assertTrue(paystack.verify_transaction("ref-1")["status"])
@@ -1,24 +1,25 @@
 from django.shortcuts import render
-from .models import OrderItem, Order, PaymentTransaction, Coupon
+from .models import Order, PaymentTransaction, Coupon
 from users.models import UserAccount
 from django.contrib.auth.models import User
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import OrderItemSerializer, OrderSerializer, CouponSerializer
-from store.models import Product
-from users.models import Cart, UserAccount
-import requests
+from .serializers import OrderItemSerializer, CouponSerializer
+from users.accounts import get_user_account
 import uuid
-from django.conf import settings
+import json
 from django.utils import timezone
 from django.utils.timezone import timedelta
 from django.db import transaction
 from admin_panel.permissions import IsStaffUser
 from .utils import generate_coupon_code
-from utils.cache.cache import get_cached_data, set_cached_data
-from utils.cache.user_orders_cache_key import user_orders_cache_key
+from .cached import get_all_orders_cached, get_user_orders_cached
+from .checkout import place_order, cancel_order, empty_cart, CheckoutError
+from . import paystack
+from .payments import settle_payment, verify_signature, record_event
+from handlers.tasks.paystackWebhooks import schedule_payment_event
 # Create your views here.
 
 
@@ -36,7 +37,7 @@ def checkout(request):
     region = data.get("region", "")
     phone_number = data.get("phone_number", "")
     shipping_address = data.get("shipping_address", "")
-    order_type = data.get("order_type")
+    order_type = data.get("order_type") or "delivery"
     coupon = data.get("coupon")
 
     try:
@@ -48,123 +49,53 @@ def checkout(request):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            account_user = UserAccount.objects.get(user=user)
+            account_user = get_user_account(request)
         except UserAccount.DoesNotExist:
             return Response({
                 "status": "error",
                 "message": "User account not found."
             }, status=status.HTTP_404_NOT_FOUND)
 
-
-        if coupon:
-            try:
-                order_coupon = Coupon.objects.get(code=coupon)
-                if order_coupon.used:
-                    return Response({
-                        "status":"error",
-                        "message":"coupon is already used"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-
-                if not order_coupon.is_active or (order_coupon.expires_at and timezone.now() > order_coupon.expires_at):
-                    return Response({
-                        "status":"error",
-                        "message":"The coupon has expired or not active"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-
-            except Coupon.DoesNotExist:
-                return Response({
-                    "status":"error",
-                    "message":"coupon does not exist"
-                }, status=status.HTTP_404_NOT_FOUND)
-
-
-        total_amount = 0
-        order_items = []
-
-        for item in cart_items:
-            product_id = item["product"]["id"]
-            quantity = item["quantity"]
-
-            try:
-                product = Product.objects.get(id=product_id)
-            except Product.DoesNotExist:
-                return Response({
-                    "status": "error",
-                    "message": f"Product with id {product_id} not found"
-                }, status=status.HTTP_404_NOT_FOUND)
-            
-
-            total_amount += product.discount_price * quantity
-            order_items.append((product, quantity, product.discount_price))
-
-            if order_coupon.discount_type == 'percent':
-                discount_amount = total_amount * (order_coupon.discount_value / 100)
-                total_amount = total_amount - discount_amount
-            else: 
-                total_amount = max(0, total_amount - order_coupon.discount_value)
-
-        order = Order.objects.create(
-            user=account_user,
-            total_amount=total_amount,
-            shipping_address=shipping_address,
-            first_name=first_name,
-            last_name=last_name,
-            email=email,
-            region=region,
-            city=city,
-            phone_number=phone_number
-        )
-
-        for product, quantity, price in order_items:
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                price_at_purchase=price
+        try:
+            order = place_order(
+                account_user,
+                cart_items,
+                order_type,
+                coupon_code=coupon,
+                shipping_address=shipping_address,
+                first_name=first_name,
+                last_name=last_name,
+                email=email,
+                region=region,
+                city=city,
+                phone_number=phone_number,
+                # A delivery order keeps the cart until its payment is started
+                empty_cart=order_type != "delivery"
             )
+        except CheckoutError as e:
+            return Response({
+                "status": "error",
+                "message": e.message
+            }, status=e.status_code)
 
-        reference = str(uuid.uuid4())
-        order.reference = reference
-        order.order_type = order_type
-        order.coupon = order_coupon
-        order.save()
-
-        with transaction.atomic():
-
-            user_account = UserAccount.objects.get(user=user)
-
-            user_cart = Cart.objects.filter(user=user_account)
-            user_cart.delete()
+        reference = order.reference
+        total_amount = order.total_amount
 
 
         if order_type == "delivery":
 
-            headers = {
-                "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-                "Content-Type": "application/json"
-            }
-
-            payload = {
-                "email": user.email,
-                "amount": int(total_amount * 100),
-                "reference": reference,
-                "callback_url": "https://bijoux-chic.vercel.app/checkout/success-payment"
-            }
-
+            # The customer keeps the coupon and the cart when the payment can't be started
             try:
-                paystack_res = requests.post(
-                    "https://api.paystack.co/transaction/initialize",
-                    json=payload,
-                    headers=headers
-                )
-                paystack_data = paystack_res.json()
-            except requests.RequestException:
+                paystack_data = paystack.initialize_transaction(user.email, total_amount, reference)
+            except paystack.PaystackError:
+                cancel_order(order)
                 return Response({
                     "status": "error",
                     "message": "Could not connect to Paystack"
                 }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
             if not paystack_data.get("status"):
+                cancel_order(order)
                 return Response({
                     "status": "error",
                     "message": "Payment initiation failed",
@@ -172,11 +103,11 @@ def checkout(request):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
 
-            payment = PaymentTransaction.objects.create(reference=reference, status="pending", amount=total_amount, gateway_response=paystack_data)
-            order.payment = payment
-            order.coupon.used = True
-            order.coupon.save()
-            order.save()
+            with transaction.atomic():
+                payment = PaymentTransaction.objects.create(reference=reference, status="pending", amount=total_amount, gateway_response=paystack_data)
+                order.payment = payment
+                order.save(update_fields=["payment", "updated_at"])
+                empty_cart(account_user)
 
             return Response({
                 "status": "success",
@@ -216,14 +147,24 @@ def verify_payment(request):
                 "message": "Reference is required"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"
-        }
+        try:
+            payment = PaymentTransaction.objects.get(reference=reference)
+        except PaymentTransaction.DoesNotExist:
+            return Response({
+                "status": "error", 
+                "message": "Payment record not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # Usually settled by the webhook already, no need to ask Paystack
+        if payment.status == "success":
+            return Response({
+                "status": "success", 
+                "message": "Payment verified and order updated"
+            }, status=status.HTTP_201_CREATED)
 
         try:
-            response = requests.get(f"https://api.paystack.co/transaction/verify/{reference}", headers=headers)
-            data = response.json()
-        except requests.RequestException:
+            data = paystack.verify_transaction(reference)
+        except paystack.PaystackError:
             return Response({
                 "status": "error", 
                 "message": "Could not connect to Paystack"
@@ -239,24 +180,8 @@ def verify_payment(request):
         amount_paid = payment_data["amount"] / 100  
         status_paid = payment_data["status"]
 
-        try:
-            payment = PaymentTransaction.objects.get(reference=reference)
-        except PaymentTransaction.DoesNotExist:
-            return Response({
-                "status": "error", 
-                "message": "Payment record not found"
-            }, status=status.HTTP_404_NOT_FOUND)
-
         if status_paid == "success":
-            payment.status = "success"
-            payment.paystack_amount = amount_paid
-            payment.paid_at = timezone.now()
-            payment.save()
-
-            order = Order.objects.get(reference=reference)
-            order.status = "paid"
-            order.payment = payment
-            order.save()
+            settle_payment(reference, amount_paid)
 
             return Response({
                 "status": "success", 
@@ -280,6 +205,51 @@ def verify_payment(request):
 
 
 
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@authentication_classes([])
+@throttle_classes([])
+def paystack_webhook(request):
+    """
+        Paystack payment events. Only checked and stored here, a Celery task applies them
+        (see handlers.tasks.paystackWebhooks) so Paystack gets its 200 right away.
+    """
+
+    body = request.body
+    if not verify_signature(body, request.headers.get("X-Paystack-Signature")):
+        return Response({
+            "status": "error",
+            "message": "Invalid signature"
+        }, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return Response({
+            "status": "error",
+            "message": "Invalid payload"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            event, created = record_event(payload)
+            if created:
+                schedule_payment_event(event)
+
+        return Response({
+            "status": "success",
+            "message": "ok" if created else "already received"
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({
+            "status":"error",
+            "message":f"{e}"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def pay_via_reference(request):
@@ -297,28 +267,11 @@ def pay_via_reference(request):
                 "message":"Order reference not found"
             }, status=status.HTTP_404_NOT_FOUND)    
 
-        headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
-
         new_reference = str(uuid.uuid4())
 
-        payload = {
-            "email": user.email,
-            "amount": int(order.total_amount * 100),
-            "reference": new_reference,
-            "callback_url": "https://bijoux-chic.vercel.app/checkout/success-payment"
-        }
-
         try:
-            paystack_res = requests.post(
-                "https://api.paystack.co/transaction/initialize",
-                json=payload,
-                headers=headers
-            )
-            paystack_data = paystack_res.json()
-        except requests.RequestException:
+            paystack_data = paystack.initialize_transaction(user.email, order.total_amount, new_reference)
+        except paystack.PaystackError:
             return Response({
                 "status": "error",
                 "message": "Could not connect to Paystack"
@@ -394,33 +347,20 @@ def get_order_by_reference(request, reference):
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
     try:
-        account_user = UserAccount.objects.get(user=request.user)
+        account_user = get_user_account(request)
     except UserAccount.DoesNotExist:
         return Response({
             "status": "error",
             "message": "User account not found."
         }, status=status.HTTP_404_NOT_FOUND)
 
-    cache_key = user_orders_cache_key(account_user.id)
-    cached_data = get_cached_data(cache_key)
-
-    if cached_data:
-        return Response({
-            "status": "success",
-            "message": "ok",
-            "orders": cached_data
-        }, status=status.HTTP_200_OK)
-
     try:
-        orders = Order.objects.filter(user=account_user).select_related("user", "products").order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-
-        set_cached_data(cache_key, serializer.data)
+        orders = get_user_orders_cached(account_user.id)
 
         return Response({
             "status": "success",
             "message": "ok",
-            "orders": serializer.data
+            "orders": orders
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -431,31 +371,16 @@ def get_user_orders(request):
 
 
 
-STAFF_ORDERS_CACHE_KEY = "all_orders_admin"
-
 @api_view(["GET"])
 @permission_classes([IsStaffUser])
 def get_all_orders(request):
     try:
-        cached_data = get_cached_data(STAFF_ORDERS_CACHE_KEY)
-        if cached_data:
-            return Response({
-                "status": "success",
-                "message": "ok (from cache)",
-                "orders": cached_data
-            }, status=status.HTTP_200_OK)
-
-        orders = Order.objects.select_related("user", "products").all().order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-
-        # Cache for 30 days
-        set_cached_data(STAFF_ORDERS_CACHE_KEY, serializer.data, timeout=60 * 60 * 24 * 30)
-        print("🧠 Cached all orders for staff")
+        orders = get_all_orders_cached()
 
         return Response({
             "status": "success",
             "message": "ok",
-            "orders": serializer.data
+            "orders": orders
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -0,0 +1,33 @@
+from Orders.models import Coupon
+from .serializers import CouponSerializer
+from utils.cache.cache import get_or_set_namespaced, refresh_namespaced
+from handlers.tasks.cacheRefresh import background_refresh
+
+COUPONS_CACHE_KEY = "all_coupons_admin"
+COUPONS_CACHE_NAMESPACE = "coupons"
+
+
+def build_coupons():
+    all_coupons = Coupon.objects.all().order_by('-id')
+    return CouponSerializer(all_coupons, many=True).data
+
+
+def get_coupons_cached():
+    return get_or_set_namespaced(
+        COUPONS_CACHE_NAMESPACE,
+        COUPONS_CACHE_KEY,
+        build_coupons,
+        refresh=background_refresh("coupons")
+    )
+
+
+def warm_coupons():
+    """
+        Cache warmer for the coupon list, see CACHE_WARMERS.
+    """
+
+    get_coupons_cached()
+
+
+def refresh_coupons():
+    refresh_namespaced(COUPONS_CACHE_NAMESPACE, COUPONS_CACHE_KEY, build_coupons)
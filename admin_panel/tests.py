@@ -1,3 +1,55 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from utils.cache.cache import get_or_set_cache, delete_cache_key
+from utils.cache.near import near_cache
+from utils.cache.stats import key_family, reset_cache_stats
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 # Create your tests here.
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CacheStatsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        near_cache.clear()
+        reset_cache_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="staff", password="secret", is_staff=True))
+
+    def test_key_families_ignore_namespaces(self):
+        self.assertEqual(key_family("catalog@12:public_products_24_first"), "public_products")
+        self.assertEqual(key_family("category:rings@3:products_in_rings_compact"), "category")
+        self.assertIsNone(key_family("cache_version_catalog"))
+
+    def test_counters_per_family(self):
+        get_or_set_cache("public_products_24_first", lambda: {"product": []})
+        get_or_set_cache("public_products_24_first", lambda: {"product": []})
+        delete_cache_key("public_products_24_first")
+
+        response = self.client.get("/api/v1/admin/dashboard/cache/")
+
+        self.assertEqual(response.status_code, 200)
+        stats = response.data["cache"]["public_products"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["sets"], stats["deletes"]), (1, 1, 1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+        self.assertGreater(stats["avg_payload_bytes"], 0)
+        self.assertIsNone(response.data["cache"]["coupons"]["hit_ratio"])
+
+    def test_reset(self):
+        get_or_set_cache("all_coupons_admin", lambda: [])
+
+        self.assertEqual(self.client.delete("/api/v1/admin/dashboard/cache/").status_code, 200)
+
+        stats = self.client.get("/api/v1/admin/dashboard/cache/").data["cache"]["coupons"]
+        self.assertEqual((stats["misses"], stats["sets"]), (0, 0))
+
+    def test_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="buyer", password="secret"))
+
+        self.assertEqual(client.get("/api/v1/admin/dashboard/cache/").status_code, 403)
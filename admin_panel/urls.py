@@ -9,5 +9,6 @@ urlpatterns = [
     path('dashboard/payments/', views.payment_insights),
     path('dashboard/categories/', views.category_metrics),
     path('dashboard/alerts/', views.active_alerts),
+    path('dashboard/cache/', views.cache_stats),
     path('coupons/', views.get_coupons),
 ]
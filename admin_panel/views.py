@@ -12,9 +12,9 @@ from datetime import timedelta
 from store.models import Product, Category
 from Orders.models import Coupon, PaymentTransaction, Order
 from django.utils import timezone
-from .serializers import CouponSerializer
 from utils.cookies.setCookies import set_jwt_cookies
-from utils.cache.cache import set_cached_data, get_cached_data
+from .cached import get_coupons_cached
+from utils.cache.stats import get_cache_stats, reset_cache_stats
 
 # Create your views here.
 
@@ -256,34 +256,50 @@ def active_alerts(request):
 
 
 
-COUPONS_CACHE_KEY = "all_coupons_admin"
-
 @api_view(["GET"])
 @permission_classes([IsAdminUser])
 def get_coupons(request):
     try:
-        cached_data = get_cached_data(COUPONS_CACHE_KEY)
-        if cached_data:
+        coupons = get_coupons_cached()
+
+        return Response({
+            "status": "success",
+            "message": "ok",
+            "coupons": coupons
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({
+            "status": "error",
+            "message": f"An error occurred: {str(e)}"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsStaffUser])
+def cache_stats(request):
+    """
+        Hit/miss/set/delete counters, payload sizes and latencies per cache key family.
+        DELETE resets the counters.
+    """
+
+    try:
+        if request.method == "DELETE":
+            reset_cache_stats()
             return Response({
                 "status": "success",
-                "message": "ok (from cache)",
-                "coupons": cached_data
+                "message": "Cache stats reset."
             }, status=status.HTTP_200_OK)
 
-        all_coupons = Coupon.objects.all().order_by('-created_at')
-        serializer = CouponSerializer(all_coupons, many=True)
-
-        set_cached_data(COUPONS_CACHE_KEY, serializer.data)
-        print("🧠 Cached all coupons for admin")
-
         return Response({
             "status": "success",
             "message": "ok",
-            "coupons": serializer.data
+            "cache": get_cache_stats()
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
         return Response({
             "status": "error",
             "message": f"An error occurred: {str(e)}"
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,3 +1,14 @@
+import gzip
+import hashlib
+import time
+from urllib.parse import urlencode, parse_qsl
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from utils.cache.cache import get_cached_data, set_cached_data, get_namespace_versions, get_namespaces_modified
+from utils.cache.rendered import accepts_gzip, CACHE_GZIP_MIN_BYTES
+from utils.cache.surrogate import get_surrogate_keys, ANON_RESPONSE_CACHE_TTL, ANON_RESPONSE_MAX_AGE
+
+
 class CSRFFromCookieMiddleware:
     """
     Reads the 'csrftoken' cookie and injects it into request.META['HTTP_X_CSRFTOKEN']
@@ -12,3 +23,90 @@ class CSRFFromCookieMiddleware:
             if token:
                 request.META["HTTP_X_CSRFTOKEN"] = token
         return self.get_response(request)
+
+
+CACHED_RESPONSE_HEADERS = (
+    "Content-Type", "Content-Encoding", "Vary", "ETag", "Last-Modified", "Surrogate-Key", "Cache-Control",
+)
+
+
+class AnonymousResponseCacheMiddleware:
+    """
+    Caches whole responses to anonymous GETs, keyed on path plus normalized query string.
+    Only responses a view tagged with surrogate keys (utils.cache.surrogate.tag_response) are
+    stored. Each entry remembers the versions of its keys and is skipped as soon as one of them
+    is bumped, so the signals that invalidate the catalog purge exactly the affected responses.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        key = self.cache_key(request)
+        entry = get_cached_data(key)
+        if isinstance(entry, dict) and self.is_fresh(entry):
+            return self.build_response(entry, request)
+
+        started = time.time()
+        response = self.get_response(request)
+
+        surrogate_keys = get_surrogate_keys(response)
+        if surrogate_keys and response.status_code == 200 and not response.streaming:
+            patch_cache_control(response, public=True, max_age=ANON_RESPONSE_MAX_AGE, s_maxage=ANON_RESPONSE_CACHE_TTL)
+            self.store(key, request, response, surrogate_keys, started)
+
+        return response
+
+    def is_cacheable_request(self, request):
+        return (
+            request.method == "GET"
+            and "HTTP_AUTHORIZATION" not in request.META
+            and "at" not in request.COOKIES
+            and "sessionid" not in request.COOKIES
+        )
+
+    def cache_key(self, request):
+        query = urlencode(sorted(parse_qsl(request.META.get("QUERY_STRING", ""), keep_blank_values=True)))
+        digest = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+        return f"anon_response_{digest}_{'gz' if accepts_gzip(request) else 'id'}"
+
+    def is_fresh(self, entry):
+        versions = get_namespace_versions(list(entry["keys"]))
+        return all(versions[namespace] == version for namespace, version in entry["keys"].items())
+
+    def store(self, key, request, response, surrogate_keys, started):
+        # A key bumped while the view ran may already be baked into this response, skip it
+        modified = get_namespaces_modified(surrogate_keys)
+        if any(at is not None and at >= started for at in modified.values()):
+            return
+
+        content = response.content
+        headers = {name: response[name] for name in CACHED_RESPONSE_HEADERS if response.has_header(name)}
+
+        # Responses rendered on a miss are not compressed yet, later hits should be
+        if accepts_gzip(request) and "Content-Encoding" not in headers and len(content) >= CACHE_GZIP_MIN_BYTES:
+            content = gzip.compress(content, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = ", ".join(dict.fromkeys([*filter(None, headers.get("Vary", "").split(", ")), "Accept-Encoding"]))
+
+        set_cached_data(key, {
+            "status": response.status_code,
+            "content": content,
+            "headers": headers,
+            "keys": get_namespace_versions(surrogate_keys),
+        }, ANON_RESPONSE_CACHE_TTL)
+
+    def build_response(self, entry, request):
+        etag = entry["headers"].get("ETag")
+        if etag and etag in request.META.get("HTTP_IF_NONE_MATCH", ""):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        response = HttpResponse(entry["content"], status=entry["status"])
+        for name, value in entry["headers"].items():
+            response[name] = value
+        response["Content-Length"] = str(len(entry["content"]))
+        return response
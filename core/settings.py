@@ -55,6 +55,7 @@ MIDDLEWARE = [
     # 'users.permissions.IsFromAllowedOrigin',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.middleware.AnonymousResponseCacheMiddleware',
     'core.middleware.CSRFFromCookieMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -97,6 +98,51 @@ CORS_ALLOWED_ORIGINS = [
 
 CACHE_TTL = 60 * 60 * 24 * 30
 
+# Catalog responses are cached as encoded JSON bytes, gzipped above this size
+CACHE_RENDERED_RESPONSES = True
+CACHE_GZIP_MIN_BYTES = 1024
+
+# Per-process LRU in front of Redis, kept in sync through Redis pub/sub
+NEAR_CACHE_ENABLED = True
+NEAR_CACHE_MAX_ENTRIES = 512
+NEAR_CACHE_MAX_BYTES = 64 * 1024 * 1024
+NEAR_CACHE_TTL = 60
+
+# Cached lists rebuilt in the background after invalidation (see warm_caches)
+CACHE_WARMERS = {
+    "catalog": "store.cached.warm_catalog",
+    "categories": "store.cached.warm_categories",
+    "orders": "Orders.cached.warm_staff_orders",
+    "coupons": "admin_panel.cached.warm_coupons",
+}
+CACHE_WARM_DELAY = 5
+
+# Cached lists older than this are served stale while a Celery task refreshes them
+CACHE_SOFT_TTL = 60 * 10
+# How long unknown product ids are remembered as 404s
+NEGATIVE_CACHE_TTL = 60 * 5
+
+# Whole responses to anonymous GETs tagged with surrogate keys (core.middleware)
+ANON_RESPONSE_CACHE_TTL = 60 * 10
+ANON_RESPONSE_MAX_AGE = 60
+CACHE_REFRESHERS = {
+    "products_page": "store.cached.refresh_products_page",
+    "admin_products": "store.cached.refresh_admin_products",
+    "categories": "store.cached.refresh_categories",
+    "category_products": "store.cached.refresh_category_products",
+    "staff_orders": "Orders.cached.refresh_staff_orders",
+    "user_orders": "Orders.cached.refresh_user_orders",
+    "coupons": "admin_panel.cached.refresh_coupons",
+}
+
+# Per key family hit/miss counters, see admin_panel dashboard/cache/
+CACHE_STATS_ENABLED = True
+CACHE_STATS_FLUSH_INTERVAL = 10
+
+# Cached values encoded above this size are stored as compact JSON/msgpack, compressed
+# (see `python manage.py benchmark_cache_codecs`)
+CACHE_CODEC_MIN_BYTES = 16 * 1024
+
 
 CSRF_TRUSTED_ORIGINS = CORS_ALLOWED_ORIGINS
 
@@ -221,6 +267,41 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Task modules that live outside the apps' tasks.py
+CELERY_IMPORTS = [
+    "handlers.tasks.sendMail",
+    "handlers.tasks.relatedProducts",
+    "handlers.tasks.imageDerivatives",
+    "handlers.tasks.cacheWarming",
+    "handlers.tasks.cacheRefresh",
+    "handlers.tasks.stockReservations",
+    "handlers.tasks.paystackWebhooks",
+    "handlers.tasks.paymentReconciliation",
+]
+
+CELERY_BEAT_SCHEDULE = {
+    "refresh-related-products": {
+        "task": "handlers.tasks.relatedProducts.refresh_related_products",
+        "schedule": 60 * 60 * 6,
+    },
+    "release-expired-stock-reservations": {
+        "task": "handlers.tasks.stockReservations.release_expired_stock_reservations",
+        "schedule": 60,
+    },
+    "reconcile-pending-payments": {
+        "task": "handlers.tasks.paymentReconciliation.reconcile_payments",
+        "schedule": 60 * 15,
+    },
+}
+
+RELATED_PRODUCTS_COUNT = 6
+
+# Unpaid delivery orders give their stock back after this long (see Orders.reservations)
+STOCK_RESERVATION_TTL = 60 * 30
+
+# Resized WebP/JPEG copies generated for every uploaded product and category image
+IMAGE_DERIVATIVE_WIDTHS = [320, 640, 1024]
+
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -230,3 +311,11 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = 'Bijoux Chic <no-reply@goriaai.com>'
 PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
+# `python manage.py paystack_stub` serves a local stand-in for offline and load testing
+PAYSTACK_BASE_URL = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
+PAYSTACK_CONNECT_TIMEOUT = 3.05
+PAYSTACK_READ_TIMEOUT = 10
+PAYSTACK_MAX_RETRIES = 2
+# Pending payments are checked with Paystack after this many minutes and failed after this many hours
+PAYMENT_RECONCILE_AFTER = 15
+PAYMENT_FAIL_AFTER = 24
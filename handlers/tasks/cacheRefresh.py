@@ -0,0 +1,27 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# name -> dotted path of a function rebuilding one cached value from JSON-friendly arguments
+CACHE_REFRESHERS = getattr(settings, "CACHE_REFRESHERS", {})
+
+
+@shared_task
+def refresh_cached_value(name, args):
+    import_string(CACHE_REFRESHERS[name])(*args)
+
+
+def background_refresh(name, *args):
+    """
+        Refresh callback for get_or_set_cache(): queues refresh_cached_value(name, args).
+    """
+
+    def refresh():
+        try:
+            refresh_cached_value.delay(name, list(args))
+            return True
+        except Exception as e:
+            print(f"Could not queue cache refresh {name}{args}: {e}")
+            return False
+
+    return refresh
@@ -0,0 +1,42 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from utils.cache.warming import warm_caches as run_cache_warmers
+
+# Changes arriving within this many seconds of each other share one warm-up
+CACHE_WARM_DELAY = getattr(settings, "CACHE_WARM_DELAY", 5)
+
+
+def _scheduled_key(name):
+    return f"cache_warm_scheduled_{name}"
+
+
+@shared_task
+def warm_caches(names=None):
+    # Changes from now on need another run, the one they would join has already started
+    if names:
+        cache.delete_many([_scheduled_key(name) for name in names])
+    results = run_cache_warmers(names)
+    print(f"Warmed caches: {results}")
+    return results
+
+
+def schedule_cache_warming(*names):
+    """
+        Queue a warm-up of the given cache families once the current transaction commits.
+        A family already waiting for its warm-up is not queued again.
+    """
+
+    # The flag outlives the countdown so a lost task does not block warming forever
+    pending = [name for name in names if cache.add(_scheduled_key(name), 1, CACHE_WARM_DELAY + 60)]
+    if not pending:
+        return
+
+    def enqueue():
+        try:
+            warm_caches.apply_async(args=[pending], countdown=CACHE_WARM_DELAY)
+        except Exception as e:
+            print(f"Could not queue cache warming for {pending}: {e}")
+
+    transaction.on_commit(enqueue)
@@ -0,0 +1,47 @@
+from celery import shared_task
+from django.apps import apps
+from django.db import transaction
+from utils.images.derivatives import build_derivatives
+
+# model label -> name of the image field derivatives are built from
+IMAGE_FIELDS = {
+    "store.product": "product_image",
+    "store.productimages": "image",
+    "store.category": "image",
+}
+
+
+@shared_task
+def generate_image_derivatives(model_label, pk):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+
+    image = getattr(instance, IMAGE_FIELDS[model_label])
+    if not image:
+        return
+
+    instance.image_variants = build_derivatives(image.name)
+
+    update_fields = ["image_variants"]
+    if hasattr(instance, "updated_at"):
+        update_fields.append("updated_at")
+    instance.save(update_fields=update_fields)
+
+
+def schedule_image_derivatives(instance):
+    """
+        Queue derivative generation for an uploaded image once the current transaction commits.
+    """
+
+    model_label = instance._meta.label_lower
+    pk = str(instance.pk)
+
+    def enqueue():
+        try:
+            generate_image_derivatives.delay(model_label, pk)
+        except Exception as e:
+            print(f"Could not queue image derivatives for {model_label} {pk}: {e}")
+
+    transaction.on_commit(enqueue)
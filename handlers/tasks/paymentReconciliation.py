@@ -0,0 +1,9 @@
+from celery import shared_task
+from Orders.reconciliation import reconcile_pending_payments
+
+
+@shared_task
+def reconcile_payments():
+    counts = reconcile_pending_payments()
+    print(f"Reconciled pending payments: {counts}")
+    return counts
@@ -0,0 +1,37 @@
+from celery import shared_task
+from django.db import transaction
+from Orders.models import PaymentEvent
+from Orders.payments import apply_event
+
+
+@shared_task(bind=True, max_retries=5)
+def process_payment_event(self, event_pk):
+    try:
+        event = apply_event(event_pk)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=2 ** self.request.retries * 10)
+        PaymentEvent.objects.filter(pk=event_pk).update(status="failed", error=str(e))
+        print(f"⚠️ Could not apply payment event {event_pk}: {e}")
+        return None
+
+    if event is None:
+        return None
+    print(f"Payment event {event.event_id}: {event.status}")
+    return event.status
+
+
+def schedule_payment_event(event):
+    """
+        Apply the event from a worker once the current transaction commits, or right away
+        when no worker can be reached: an event we acknowledged is never dropped.
+    """
+
+    def enqueue():
+        try:
+            process_payment_event.delay(event.pk)
+        except Exception as e:
+            print(f"Could not queue payment event {event.event_id}, applying it now: {e}")
+            apply_event(event.pk)
+
+    transaction.on_commit(enqueue)
@@ -0,0 +1,9 @@
+from celery import shared_task
+from store.related import compute_related_products
+
+
+@shared_task
+def refresh_related_products():
+    processed = compute_related_products()
+    print(f"Computed related products for {processed} products")
+    return processed
@@ -0,0 +1,10 @@
+from celery import shared_task
+from Orders.reservations import release_expired_reservations
+
+
+@shared_task
+def release_expired_stock_reservations():
+    released = release_expired_reservations()
+    if released:
+        print(f"Released the stock of {released} unpaid orders")
+    return released
@@ -0,0 +1,346 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from uuid import UUID
+from django.db import transaction, DatabaseError
+from django.utils import timezone
+from .models import Product, Category
+from .facets import FLAG_FIELDS, drop_facet_index
+from .search import index_products
+from .invalidation import invalidate_catalog
+
+IMPORT_CHUNK_SIZE = 500
+
+EXPORT_FIELDS = [
+    "id", "title", "description", "category", "price", "discount_price", "size", "color",
+    "stock", "alt_text", "product_image", "not_available", *FLAG_FIELDS,
+]
+
+# Columns a row may set on a product, besides id and category
+WRITABLE_FIELDS = [
+    "title", "description", "price", "discount_price", "size", "color",
+    "stock", "alt_text", "product_image", "not_available", *FLAG_FIELDS,
+]
+
+BOOLEAN_FIELDS = ["not_available", *FLAG_FIELDS]
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(filename, default="csv"):
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+def iter_rows(lines, fmt="csv"):
+    """
+        Stream rows as dicts from an iterable of text lines, one line in memory at a time.
+        A line that can't be parsed is yielded as a RowError, to be reported as a failed row.
+    """
+
+    if fmt == "jsonl":
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield RowError(f"invalid JSON: {e}")
+        return
+
+    reader = csv.DictReader(lines)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            # The decoder can't go on past a bad byte, the rest of the file is lost
+            yield RowError("the file is not valid UTF-8 from here on")
+            return
+        except csv.Error as e:
+            yield RowError(f"invalid CSV: {e}")
+            continue
+        yield row
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def _decimal(value, field, required=False):
+    if value in (None, ""):
+        if required:
+            raise RowError(f"{field} is required")
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise RowError(f"{field} is not a number")
+
+
+def _clean_row(row, categories):
+    """
+        Validate one row and turn it into field values plus the target product id, if any.
+    """
+
+    values = {}
+    for field in WRITABLE_FIELDS:
+        if field in row and row[field] is not None:
+            values[field] = row[field]
+
+    for field in BOOLEAN_FIELDS:
+        if field in values:
+            values[field] = _boolean(values[field])
+
+    if "price" in values or not row.get("id"):
+        values["price"] = _decimal(values.get("price"), "price", required=True)
+    if "discount_price" in values:
+        values["discount_price"] = _decimal(values["discount_price"], "discount_price")
+
+    if "stock" in values:
+        try:
+            values["stock"] = int(values["stock"] or 0)
+        except ValueError:
+            raise RowError("stock is not a whole number")
+        if values["stock"] < 0:
+            raise RowError("stock can't be negative")
+
+    category_name = (row.get("category") or "").strip()
+    if category_name:
+        category = categories.get(category_name.lower())
+        if category is None:
+            raise RowError(f"category '{category_name}' does not exist")
+        values["category"] = category
+
+    product_id = None
+    if row.get("id"):
+        try:
+            product_id = UUID(str(row["id"]))
+        except ValueError:
+            raise RowError("id is not a valid UUID")
+    elif not values.get("title"):
+        raise RowError("title is required")
+
+    return product_id, values
+
+
+def _report(summary, row, message):
+    summary["failed"] += 1
+    if len(summary["errors"]) < 100:
+        summary["errors"].append({"row": row, "message": message})
+
+
+def _check_new(values):
+    """
+        A row whose id is not in the catalog creates the product, so it needs what
+        an update may leave out.
+    """
+
+    if values.get("price") is None:
+        raise RowError("price is required")
+    if not values.get("title"):
+        raise RowError("title is required")
+
+
+def _save_products(to_create, to_update, update_fields):
+    with transaction.atomic():
+        Product.objects.bulk_create(to_create)
+        if to_update:
+            Product.objects.bulk_update(to_update, sorted(update_fields))
+
+
+def _write_chunk(chunk, summary):
+    """
+        Create and update one chunk of cleaned rows in a single transaction.
+        If the database still rejects it, the rows are written one by one, each in its own
+        savepoint, so only the rows at fault fail.
+    """
+
+    # A product listed twice in one chunk is written once with the later values winning
+    merged = {}
+    rows = []
+    for line_number, product_id, values in chunk:
+        if product_id and product_id in merged:
+            merged[product_id].update(values)
+            continue
+        if product_id:
+            merged[product_id] = values
+        rows.append((line_number, product_id, values))
+
+    ids = list(merged)
+    existing = Product.objects.in_bulk(ids) if ids else {}
+
+    to_create = []
+    to_update = []
+    update_fields = {"updated_at"}
+    now = timezone.now()
+
+    for line_number, product_id, values in rows:
+        product = existing.get(product_id)
+        if product is None:
+            try:
+                _check_new(values)
+            except RowError as e:
+                _report(summary, line_number, str(e))
+                continue
+            product = Product(**values)
+            if product_id:
+                product.id = product_id
+            to_create.append((line_number, product))
+        else:
+            for field, value in values.items():
+                setattr(product, field, value)
+            product.updated_at = now
+            update_fields.update(values)
+            to_update.append((line_number, product))
+
+    try:
+        _save_products(
+            [product for _, product in to_create], [product for _, product in to_update], update_fields
+        )
+    except DatabaseError:
+        written = []
+        rows = [(line_number, product, True) for line_number, product in to_create]
+        rows += [(line_number, product, False) for line_number, product in to_update]
+        for line_number, product, created in rows:
+            try:
+                _save_products([product] if created else [], [] if created else [product], update_fields)
+            except DatabaseError as e:
+                _report(summary, line_number, str(e))
+                continue
+            summary["created" if created else "updated"] += 1
+            written.append(product.pk)
+        return written
+
+    summary["created"] += len(to_create)
+    summary["updated"] += len(to_update)
+    return [product.pk for _, product in to_create + to_update]
+
+
+def _create_categories(rows, categories):
+    """
+        Create the categories named by a chunk of rows that don't exist yet, in one query.
+        Like the products, they skip the model signals. Returns how many were missing.
+    """
+
+    missing = {}
+    for _, row in rows:
+        name = row.get("category") if isinstance(row, dict) else None
+        name = name.strip() if isinstance(name, str) else ""
+        if name and name.lower() not in categories:
+            missing.setdefault(name.lower(), name)
+
+    if missing:
+        Category.objects.bulk_create([Category(name=name) for name in missing.values()], ignore_conflicts=True)
+        for category in Category.objects.filter(name__in=list(missing.values())):
+            categories[category.name.lower()] = category
+    return len(missing)
+
+
+def _import_chunk(rows, categories, summary):
+    chunk = []
+    for line_number, row in rows:
+        if isinstance(row, RowError):
+            _report(summary, line_number, str(row))
+            continue
+        try:
+            product_id, values = _clean_row(row, categories)
+        except (RowError, AttributeError) as e:
+            _report(summary, line_number, str(e))
+            continue
+        chunk.append((line_number, product_id, values))
+
+    return _write_chunk(chunk, summary) if chunk else []
+
+
+def import_products(rows, chunk_size=IMPORT_CHUNK_SIZE, create_categories=False):
+    """
+        Create or update products from an iterable of row dicts.
+
+        Rows with an existing `id` update that product, every other row creates one.
+        Categories are resolved by name from a single query up front, and missing ones are
+        created in one query per chunk with create_categories. Rows are written with
+        bulk_create/bulk_update in chunked transactions, and invalid rows (RowError items
+        from iter_rows included) are reported without stopping the import.
+
+        bulk writes skip the model signals, so the search index, facets and catalog cache
+        are refreshed once at the end instead of once per product.
+    """
+
+    categories = {category.name.lower(): category for category in Category.objects.all()}
+    summary = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+    touched = []
+    new_categories = 0
+    rows_in_chunk = []
+
+    def flush():
+        nonlocal new_categories
+        if create_categories:
+            new_categories += _create_categories(rows_in_chunk, categories)
+        touched.extend(_import_chunk(rows_in_chunk, categories, summary))
+        rows_in_chunk.clear()
+
+    # Chunks already committed stay committed, so they are indexed even if the import stops early
+    try:
+        for line_number, row in enumerate(rows, start=1):
+            rows_in_chunk.append((line_number, row))
+            if len(rows_in_chunk) >= chunk_size:
+                flush()
+
+        if rows_in_chunk:
+            flush()
+    finally:
+        if touched:
+            for start in range(0, len(touched), chunk_size):
+                index_products(
+                    Product.objects.filter(pk__in=touched[start:start + chunk_size]).select_related("category")
+                )
+        if touched or new_categories:
+            drop_facet_index()
+            invalidate_catalog()
+
+    return summary
+
+
+def export_products(fmt="csv", chunk_size=1000):
+    """
+        Stream the whole catalog as CSV or JSONL lines without loading it into memory.
+    """
+
+    columns = ["category__name" if field == "category" else field for field in EXPORT_FIELDS]
+    products = (
+        Product.objects.order_by("created_at", "id")
+        .values_list(*columns)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    if fmt == "jsonl":
+        for values in products:
+            row = dict(zip(EXPORT_FIELDS, values))
+            yield json.dumps(row, default=str) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(EXPORT_FIELDS)
+    yield flush()
+    for values in products:
+        writer.writerow(values)
+        yield flush()
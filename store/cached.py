@@ -0,0 +1,174 @@
+from .models import Product, Category
+from .serializers import CategorySerializer
+from .fragments import serialize_products
+from .representation import ProductRepresentation
+from .invalidation import CATALOG_NAMESPACE, CATEGORIES_NAMESPACE
+from utils.cache.cache import get_or_set_namespaced
+from utils.cache.rendered import warm_response, refresh_response
+from utils.cache.category_cache_key import category_cache_key, category_cache_namespace
+from utils.cache.public_products_cache_key import public_products_cache_key
+from utils.pagination.keyset import paginate_keyset, DEFAULT_PAGE_SIZE
+
+# Builders of the cached catalog responses, shared by the views and the cache warmers.
+# Each returns the data part of the response, or None when there is nothing to cache.
+
+CATEGORY_PRODUCTS_TTL = 60 * 60 * 24 * 30
+FALLBACK_PRODUCTS_COUNT = 3
+
+
+def products_page_cache_key(page_size, cursor, representation):
+    return public_products_cache_key(page_size, cursor) + representation.cache_suffix
+
+
+def admin_products_cache_key(representation):
+    return f"all_admin_products{representation.cache_suffix}"
+
+
+def category_products_cache_key(name, representation):
+    return category_cache_key(name) + representation.cache_suffix
+
+
+def build_products_page(cursor, page_size, representation):
+    # Resolve only the ids of the requested page, the fragments come from cache
+    products = Product.objects.filter(not_available=False).only("id", "created_at", "updated_at")
+    items, next_cursor, previous_cursor = paginate_keyset(products, cursor, page_size)
+    return {
+        "product": representation.apply(serialize_products(items, representation.view)),
+        "next": next_cursor,
+        "previous": previous_cursor,
+        "limit": page_size,
+    }
+
+
+def build_admin_products(representation):
+    products = Product.objects.only("id", "updated_at").order_by("-created_at")
+    return {"product": representation.apply(serialize_products(products, representation.view))}
+
+
+def build_categories():
+    categories = Category.objects.all()
+    return {"category": CategorySerializer(categories, many=True).data}
+
+
+def get_category_names():
+    """
+        Lowercased names of every category, cached with the category list.
+        Lets views tell unknown category names apart without keying anything on them.
+    """
+
+    return get_or_set_namespaced(
+        CATEGORIES_NAMESPACE,
+        "category_names",
+        lambda: [name.lower() for name in Category.objects.values_list("name", flat=True)]
+    )
+
+
+def build_category_products(name, representation):
+    category = Category.objects.filter(name__iexact=name).first()  # case-insensitive match
+    if not category:
+        return None
+
+    products = Product.objects.filter(category=category).only("id", "updated_at").order_by("-created_at")
+    return {"product": representation.apply(serialize_products(products, representation.view))}
+
+
+def build_fallback_products(category_name=None):
+    if category_name:
+        products = Product.objects.filter(category__name__iexact=category_name)
+    else:
+        products = Product.objects.filter(is_new=True)
+    products = products.only("id", "updated_at").order_by("-created_at")[:FALLBACK_PRODUCTS_COUNT]
+    return serialize_products(products)
+
+
+def get_fallback_products(category_name=None):
+    """
+        Products suggested next to a 404, cached with the category's (or the catalog's) lists.
+        The category comes from the query string, so it is looked up first: names that aren't
+        a category share the catalog's fallback instead of each getting keys of their own.
+    """
+
+    if category_name:
+        category_name = Category.objects.filter(name__iexact=category_name).values_list("name", flat=True).first()
+
+    if category_name:
+        namespace, key = category_cache_namespace(category_name), f"fallback_{category_cache_key(category_name)}"
+    else:
+        namespace, key = CATALOG_NAMESPACE, "fallback_new_products"
+    return get_or_set_namespaced(namespace, key, lambda: build_fallback_products(category_name))
+
+
+# Cache warmers, see CACHE_WARMERS
+
+def warm_catalog():
+    """
+        First page of the public catalog and the staff product list (default representation),
+        and the 404 fallback products.
+    """
+
+    representation = ProductRepresentation()
+    warm_response(
+        CATALOG_NAMESPACE,
+        products_page_cache_key(DEFAULT_PAGE_SIZE, None, representation),
+        lambda: build_products_page(None, DEFAULT_PAGE_SIZE, representation)
+    )
+    warm_response(
+        CATALOG_NAMESPACE,
+        admin_products_cache_key(representation),
+        lambda: build_admin_products(representation)
+    )
+    get_fallback_products()
+
+
+def warm_categories():
+    """
+        The category list, and every category's product list and 404 fallback products.
+    """
+
+    warm_response(CATEGORIES_NAMESPACE, "all_categories", build_categories)
+    get_category_names()
+
+    representation = ProductRepresentation()
+    for name in Category.objects.values_list("name", flat=True):
+        warm_response(
+            category_cache_namespace(name),
+            category_products_cache_key(name, representation),
+            lambda name=name: build_category_products(name, representation),
+            timeout=CATEGORY_PRODUCTS_TTL
+        )
+        get_fallback_products(name)
+
+
+# Background refreshers of soft-expired responses, see CACHE_REFRESHERS.
+# The representation travels as (view, fields) so the arguments stay JSON-friendly.
+
+def refresh_products_page(cursor, page_size, view, fields):
+    representation = ProductRepresentation(view, fields)
+    refresh_response(
+        CATALOG_NAMESPACE,
+        products_page_cache_key(page_size, cursor, representation),
+        lambda: build_products_page(cursor, page_size, representation)
+    )
+
+
+def refresh_admin_products(view, fields):
+    representation = ProductRepresentation(view, fields)
+    refresh_response(
+        CATALOG_NAMESPACE,
+        admin_products_cache_key(representation),
+        lambda: build_admin_products(representation)
+    )
+
+
+def refresh_categories():
+    refresh_response(CATEGORIES_NAMESPACE, "all_categories", build_categories)
+
+
+def refresh_category_products(name, view, fields):
+    representation = ProductRepresentation(view, fields)
+    refresh_response(
+        category_cache_namespace(name),
+        category_products_cache_key(name, representation),
+        lambda: build_category_products(name, representation),
+        timeout=CATEGORY_PRODUCTS_TTL
+    )
@@ -0,0 +1,356 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from .models import Product
+
+FACET_INDEX_GENERATION_KEY = "product_facet_index"
+FACET_INDEX_LOCK_KEY = "product_facet_index_lock"
+FACET_INDEX_LOCK_TIMEOUT = 10
+# Keys of an index generation expire after this long and the next read rebuilds it
+FACET_INDEX_TTL = getattr(settings, "FACET_INDEX_TTL", 60 * 60 * 24)
+FACET_INDEX_IDS_CHUNK = 1024
+
+FLAG_FIELDS = ["is_hot", "is_new", "is_best", "is_trending", "is_featured"]
+FACET_NAMES = ["flag", "color", "size", "category", "price"]
+
+# Upper bounds of the price buckets, the last bucket is open ended
+PRICE_BUCKETS = getattr(settings, "FACET_PRICE_BUCKETS", [50, 100, 200, 500, 1000])
+
+# The facet index keeps one bitmap (a Python int) per facet value.
+# Bit N is set when the product at position N has that value. Positions follow creation
+# order, so the highest bit is the newest product. Filtering is a handful of AND/OR
+# operations and counting is int.bit_count().
+#
+# Each build is a new generation, spread over small keys so an update only rewrites what
+# it touches:
+#
+#   product_facet_index                     -> current generation
+#   product_facet_index:<gen>:all           -> bitmap of every available product
+#   product_facet_index:<gen>:values        -> {"color": ["gold", ...], ...}
+#   product_facet_index:<gen>:v:<facet>:<h> -> bitmap of one facet value (h hashes the value)
+#   product_facet_index:<gen>:count         -> positions handed out
+#   product_facet_index:<gen>:ids:<chunk>   -> ids at positions chunk * 1024 onwards
+#   product_facet_index:<gen>:p:<id>        -> (position, facet values) of one product
+#
+# The generation pointer expires a minute before the keys it points to, so readers never
+# see a half expired generation.
+
+
+def price_bucket(price):
+    lower = 0
+    for upper in PRICE_BUCKETS:
+        if price < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+
+def product_facets(product):
+    """
+        (facet, value) pairs a product belongs to, none when it is not available.
+    """
+
+    if product.not_available:
+        return []
+
+    facets = [("flag", field) for field in FLAG_FIELDS if getattr(product, field)]
+
+    if product.color:
+        facets.append(("color", product.color.strip().lower()))
+    if product.size:
+        facets.append(("size", product.size.strip().lower()))
+    if product.category_id:
+        facets.append(("category", product.category.name.lower()))
+
+    price = product.discount_price if product.discount_price is not None else product.price
+    if price is not None:
+        facets.append(("price", price_bucket(price)))
+
+    return facets
+
+
+def _key(generation, *parts):
+    return ":".join([FACET_INDEX_GENERATION_KEY, str(generation), *parts])
+
+
+def _value_key(generation, facet, value):
+    return _key(generation, "v", facet, hashlib.md5(value.encode("utf-8")).hexdigest())
+
+
+def _ids_key(generation, chunk):
+    return _key(generation, "ids", str(chunk))
+
+
+def _product_key(generation, product_id):
+    return _key(generation, "p", str(product_id))
+
+
+def _lock(wait):
+    deadline = time.monotonic() + wait
+    while not cache.add(FACET_INDEX_LOCK_KEY, 1, FACET_INDEX_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _unlock():
+    cache.delete(FACET_INDEX_LOCK_KEY)
+
+
+def _set_many(data):
+    items = list(data.items())
+    for start in range(0, len(items), 1000):
+        cache.set_many(dict(items[start:start + 1000]), FACET_INDEX_TTL)
+
+
+def build_facet_index():
+    """
+        Build a new generation of the index from the database and switch readers to it.
+        Holds the update lock meanwhile, so no incremental update is lost in between.
+        When the lock can't be had the index is only returned, not stored.
+
+        Returns {"ids": [...], "all": bitmap, "facets": {facet: {value: bitmap}}}.
+    """
+
+    locked = _lock(FACET_INDEX_LOCK_TIMEOUT)
+    try:
+        index = {"ids": [], "all": 0, "facets": {name: {} for name in FACET_NAMES}}
+        entries = {}
+        products = (
+            Product.objects.select_related("category")
+            .order_by("created_at", "id")
+            .iterator(chunk_size=1000)
+        )
+
+        for position, product in enumerate(products):
+            index["ids"].append(str(product.pk))
+            bit = 1 << position
+            facets = product_facets(product)
+            if facets:
+                index["all"] |= bit
+            for facet, value in facets:
+                values = index["facets"][facet]
+                values[value] = values.get(value, 0) | bit
+            entries[product.pk] = (position, facets)
+
+        if locked:
+            generation = time.time_ns()
+            data = {
+                _key(generation, "all"): index["all"],
+                _key(generation, "values"): {facet: sorted(values) for facet, values in index["facets"].items()},
+                _key(generation, "count"): len(index["ids"]),
+            }
+            for facet, values in index["facets"].items():
+                for value, bitmap in values.items():
+                    data[_value_key(generation, facet, value)] = bitmap
+            for start in range(0, len(index["ids"]), FACET_INDEX_IDS_CHUNK):
+                data[_ids_key(generation, start // FACET_INDEX_IDS_CHUNK)] = index["ids"][start:start + FACET_INDEX_IDS_CHUNK]
+            for product_id, entry in entries.items():
+                data[_product_key(generation, product_id)] = entry
+
+            _set_many(data)
+            cache.set(FACET_INDEX_GENERATION_KEY, generation, FACET_INDEX_TTL - 60)
+
+        return index
+
+    finally:
+        if locked:
+            _unlock()
+
+
+def get_facet_index():
+    """
+        (all, {facet: {value: bitmap}}, ids_at) of the current generation, built when
+        missing. ids_at(positions) turns bit positions into product ids, fetching only the
+        chunks of ids it needs.
+    """
+
+    generation = cache.get(FACET_INDEX_GENERATION_KEY)
+    if generation is not None:
+        meta = cache.get_many([_key(generation, "all"), _key(generation, "values")])
+        if len(meta) == 2:
+            keys = {
+                _value_key(generation, facet, value): (facet, value)
+                for facet, values in meta[_key(generation, "values")].items()
+                for value in values
+            }
+            bitmaps = cache.get_many(list(keys))
+            if len(bitmaps) == len(keys):
+                facets = {name: {} for name in FACET_NAMES}
+                for key, (facet, value) in keys.items():
+                    facets[facet][value] = bitmaps[key]
+                return meta[_key(generation, "all")], facets, lambda positions: _ids_at(generation, positions)
+
+    index = build_facet_index()
+    return index["all"], index["facets"], lambda positions: [index["ids"][position] for position in positions]
+
+
+def _ids_at(generation, positions):
+    chunks = cache.get_many([_ids_key(generation, chunk) for chunk in {position // FACET_INDEX_IDS_CHUNK for position in positions}])
+    ids = []
+    for position in positions:
+        chunk = chunks.get(_ids_key(generation, position // FACET_INDEX_IDS_CHUNK))
+        if chunk is not None and position % FACET_INDEX_IDS_CHUNK < len(chunk):
+            ids.append(chunk[position % FACET_INDEX_IDS_CHUNK])
+    return ids
+
+
+def drop_facet_index():
+    # The keys of the dropped generation expire on their own
+    cache.delete(FACET_INDEX_GENERATION_KEY)
+
+
+def _update_index(product_id, product=None):
+    """
+        Move one product's bits under a short lock so concurrent saves can't lose updates.
+        Only the keys of the facet values it leaves or joins are read and written.
+        If the lock can't be taken the index is dropped and rebuilt on the next read instead.
+    """
+
+    if not _lock(1):
+        drop_facet_index()
+        return
+
+    try:
+        generation = cache.get(FACET_INDEX_GENERATION_KEY)
+        if generation is None:
+            return
+
+        product_key = _product_key(generation, product_id)
+        all_key, values_key, count_key = _key(generation, "all"), _key(generation, "values"), _key(generation, "count")
+        found = cache.get_many([product_key, all_key, values_key, count_key])
+        if not {all_key, values_key, count_key} <= found.keys():
+            drop_facet_index()
+            return
+
+        entry = found.get(product_key)
+        if entry is None and product is None:
+            return
+
+        to_set, to_delete = {}, []
+        if entry is None:
+            # A new product takes the next position
+            position = found[count_key]
+            chunk_key = _ids_key(generation, position // FACET_INDEX_IDS_CHUNK)
+            chunk = cache.get(chunk_key) if position % FACET_INDEX_IDS_CHUNK else []
+            if chunk is None:
+                drop_facet_index()
+                return
+            to_set[chunk_key] = chunk + [str(product_id)]
+            to_set[count_key] = position + 1
+            old = set()
+        else:
+            position, old = entry[0], {tuple(facet) for facet in entry[1]}
+
+        new = set(product_facets(product)) if product is not None else set()
+        bit = 1 << position
+        values = found[values_key]
+        values_changed = False
+
+        bitmaps = cache.get_many([_value_key(generation, facet, value) for facet, value in old ^ new])
+        for facet, value in old - new:
+            key = _value_key(generation, facet, value)
+            bitmap = bitmaps.get(key, 0) & ~bit
+            if bitmap:
+                to_set[key] = bitmap
+            else:
+                to_delete.append(key)
+                if value in values[facet]:
+                    values[facet].remove(value)
+                    values_changed = True
+        for facet, value in new - old:
+            key = _value_key(generation, facet, value)
+            to_set[key] = bitmaps.get(key, 0) | bit
+            if value not in values[facet]:
+                values[facet].append(value)
+                values_changed = True
+
+        # Written before the bitmaps it lists, readers treat a listed value without a key as a stale generation
+        if values_changed:
+            cache.set(values_key, values, FACET_INDEX_TTL)
+
+        all_bits = found[all_key]
+        to_set[all_key] = all_bits | bit if new else all_bits & ~bit
+        if product is not None:
+            to_set[product_key] = (position, sorted(new))
+        else:
+            to_delete.append(product_key)
+
+        cache.set_many(to_set, FACET_INDEX_TTL)
+        if to_delete:
+            cache.delete_many(to_delete)
+
+    finally:
+        _unlock()
+
+
+def update_product_facets(product):
+    _update_index(product.pk, product)
+
+
+def remove_product_facets(product_id):
+    _update_index(product_id)
+
+
+def _union(values, selected):
+    bitmap = 0
+    for value in selected:
+        bitmap |= values.get(value, 0)
+    return bitmap
+
+
+def filter_products(filters, offset=0, limit=24):
+    """
+        Apply facet filters and count every facet value against the result.
+
+        `filters` maps a facet name to the selected values. Flags must all be set,
+        the values of any other facet are alternatives (gold OR silver).
+        Each facet's counts ignore that facet's own selection so the client can
+        show how many products switching to another value would give.
+
+        Returns (product_ids, total, counts).
+    """
+
+    all_bits, facets, ids_at = get_facet_index()
+
+    restrictions = {}
+    for facet, selected in filters.items():
+        if not selected:
+            continue
+        if facet == "flag":
+            bitmap = all_bits
+            for flag in selected:
+                bitmap &= facets["flag"].get(flag, 0)
+            restrictions[facet] = bitmap
+        else:
+            restrictions[facet] = _union(facets[facet], selected)
+
+    result = all_bits
+    for bitmap in restrictions.values():
+        result &= bitmap
+
+    counts = {}
+    for facet, values in facets.items():
+        if facet == "flag":
+            base = result
+        else:
+            base = all_bits
+            for other, bitmap in restrictions.items():
+                if other != facet:
+                    base &= bitmap
+        counts[facet] = {value: (bitmap & base).bit_count() for value, bitmap in values.items() if bitmap & base}
+
+    positions = []
+    remaining = result
+    skipped = 0
+    while remaining and len(positions) < limit:
+        position = remaining.bit_length() - 1
+        remaining &= ~(1 << position)
+        if skipped < offset:
+            skipped += 1
+            continue
+        positions.append(position)
+
+    return ids_at(positions), result.bit_count(), counts
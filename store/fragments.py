@@ -0,0 +1,47 @@
+from .models import Product
+from .representation import PRODUCT_VIEWS
+from .invalidation import PRODUCT_FRAGMENTS_NAMESPACE
+from utils.cache.cache import get_many_cached_data, set_many_cached_data, namespace_prefix
+from utils.cache.product_fragment_cache_key import product_fragment_cache_key
+
+
+def serialize_products(products, view="full"):
+    """
+        Serialize products through the per-product fragment cache.
+        Each representation in PRODUCT_VIEWS has fragments of its own.
+
+        `products` only needs id and updated_at loaded (e.g. `.only("id", "updated_at")`).
+        All fragments are fetched with a single get_many and only the products
+        missing from the cache are loaded in full and serialized.
+        The result keeps the order of `products`.
+    """
+
+    products = list(products)
+    if not products:
+        return []
+
+    prefix = namespace_prefix(PRODUCT_FRAGMENTS_NAMESPACE)
+    keys = {
+        product.pk: prefix + product_fragment_cache_key(product.pk, product.updated_at, view)
+        for product in products
+    }
+    cached = get_many_cached_data(list(keys.values()))
+
+    fragments = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in keys if pk not in fragments]
+
+    if missing:
+        fresh = Product.objects.filter(id__in=missing).select_related("category")
+        if view == "full":
+            fresh = fresh.prefetch_related("images")
+        fresh = list(fresh)
+        fresh_data = PRODUCT_VIEWS[view](fresh, many=True).data
+
+        to_cache = {}
+        for product, data in zip(fresh, fresh_data):
+            fragments[product.pk] = data
+            to_cache[prefix + product_fragment_cache_key(product.pk, product.updated_at, view)] = data
+
+        set_many_cached_data(to_cache)
+
+    return [fragments[product.pk] for product in products if product.pk in fragments]
@@ -0,0 +1,65 @@
+from .models import Category
+from utils.cache.cache import bump_namespaces
+from utils.cache.category_cache_key import category_cache_namespace
+from utils.cache.surrogate import product_surrogate_key
+from handlers.tasks.cacheWarming import schedule_cache_warming
+
+# Every product list and page, and the ETags of the catalog endpoints
+CATALOG_NAMESPACE = "catalog"
+# The category list
+CATEGORIES_NAMESPACE = "categories"
+# Per-product serialized fragments, which embed their category
+PRODUCT_FRAGMENTS_NAMESPACE = "product-fragments"
+
+
+def invalidate_product(product, previous_category_name=None):
+    """
+        A product changed: retire the catalog, the product lists of its category
+        and of the category it was moved out of, and the responses tagged with the product.
+    """
+
+    namespaces = [CATALOG_NAMESPACE, product_surrogate_key(product.pk)]
+    if product.category_id and product.category:
+        namespaces.append(category_cache_namespace(product.category.name))
+    if previous_category_name:
+        namespaces.append(category_cache_namespace(previous_category_name))
+
+    bump_namespaces(namespaces)
+    schedule_cache_warming("catalog", "categories")
+
+
+def invalidate_stock(product_ids):
+    """
+        Stock changed without going through Product.save() (orders and their reservations):
+        retire the lists and pages showing these products. The stock updates also move
+        their updated_at forward, which retires their fragments.
+    """
+
+    names = Category.objects.filter(category__id__in=product_ids).values_list("name", flat=True).distinct()
+    bump_namespaces(
+        [CATALOG_NAMESPACE]
+        + [product_surrogate_key(pk) for pk in product_ids]
+        + [category_cache_namespace(name) for name in names]
+    )
+    schedule_cache_warming("catalog", "categories")
+
+
+def invalidate_categories(*names):
+    """
+        Categories changed: serialized products embed them, so fragments go too.
+    """
+
+    bump_namespaces(
+        [CATALOG_NAMESPACE, CATEGORIES_NAMESPACE, PRODUCT_FRAGMENTS_NAMESPACE]
+        + [category_cache_namespace(name) for name in names]
+    )
+    schedule_cache_warming("catalog", "categories")
+
+
+def invalidate_catalog():
+    """
+        For changes that reach across the catalog without going through the model
+        signals, such as bulk imports and image backfills.
+    """
+
+    invalidate_categories(*Category.objects.values_list("name", flat=True))
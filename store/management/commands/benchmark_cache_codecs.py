@@ -0,0 +1,59 @@
+import pickle
+import time
+from django.core.management.base import BaseCommand
+from store.cached import build_admin_products
+from store.representation import ProductRepresentation
+from Orders.cached import build_all_orders
+from utils.cache.codec import SERIALIZERS, COMPRESSORS, encode, decode
+
+PAYLOADS = {
+    "admin_products": lambda: build_admin_products(ProductRepresentation())["product"],
+    "staff_orders": build_all_orders,
+}
+
+
+def _best_of(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+class Command(BaseCommand):
+    help = "Compare size and encode/decode time of the cache codecs on the largest cached values"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+
+        for name, build in PAYLOADS.items():
+            value = build()
+            baseline = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: {len(value)} items, pickled {baseline} bytes"))
+
+            for _, (serializer, *_, serializer_available) in SERIALIZERS.items():
+                for _, (compressor, *_, compressor_available) in COMPRESSORS.items():
+                    if not (serializer_available and compressor_available):
+                        continue
+
+                    try:
+                        stored, encode_ms = _best_of(
+                            lambda: encode(value, serializer, compressor, min_bytes=0), repeat
+                        )
+                    except Exception as e:
+                        self.stdout.write(f"  {serializer:>8} + {compressor:<5} failed: {e}")
+                        continue
+
+                    # What the cache backend does on top of it
+                    raw = pickle.dumps(stored, pickle.HIGHEST_PROTOCOL)
+                    _, decode_ms = _best_of(lambda: decode(pickle.loads(raw)), repeat)
+
+                    self.stdout.write(
+                        f"  {serializer:>8} + {compressor:<5} {len(raw):>10} bytes "
+                        f"({len(raw) / baseline:6.1%})  encode {encode_ms:8.2f} ms  decode {decode_ms:8.2f} ms"
+                    )
@@ -0,0 +1,56 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from store.models import Product, ProductImages, Category
+from store.invalidation import invalidate_catalog
+from utils.images.derivatives import build_derivatives
+
+# model -> name of the image field derivatives are built from
+IMAGE_FIELDS = [
+    (Product, "product_image"),
+    (ProductImages, "image"),
+    (Category, "image"),
+]
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG derivatives for existing product and category images"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to the CPU count")
+        parser.add_argument("--all", action="store_true", help="Rebuild images that already have derivatives")
+
+    def handle(self, *args, **options):
+        converted = 0
+        failed = 0
+
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            for model, field in IMAGE_FIELDS:
+                queryset = model.objects.exclude(**{field: ""}).exclude(**{f"{field}__isnull": True})
+                if not options["all"]:
+                    queryset = queryset.filter(image_variants={})
+
+                instances = {instance.pk: instance for instance in queryset.only("pk", field, "image_variants")}
+                futures = {
+                    pool.submit(build_derivatives, getattr(instance, field).name): pk
+                    for pk, instance in instances.items()
+                }
+
+                updated = []
+                for future in as_completed(futures):
+                    instance = instances[futures[future]]
+                    try:
+                        instance.image_variants = future.result()
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f"{model.__name__} {instance.pk}: {e}")
+                        continue
+                    updated.append(instance)
+
+                model.objects.bulk_update(updated, ["image_variants"], batch_size=500)
+                converted += len(updated)
+
+        # bulk_update skips the signals, clear the catalog once for the whole run
+        if converted:
+            invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {converted} images, {failed} failed"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from store.related import compute_related_products, RELATED_PRODUCTS_COUNT
+
+
+class Command(BaseCommand):
+    help = "Precompute the related products shown on product detail pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=RELATED_PRODUCTS_COUNT)
+
+    def handle(self, *args, **options):
+        processed = compute_related_products(count=options["count"])
+        self.stdout.write(self.style.SUCCESS(f"Computed related products for {processed} products"))
@@ -0,0 +1,22 @@
+import sys
+from django.core.management.base import BaseCommand
+from store.bulk import export_products, detect_format
+
+
+class Command(BaseCommand):
+    help = "Stream the product catalog out as CSV or JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=None, help="File to write, defaults to stdout")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or detect_format(options["output"])
+        lines = export_products(fmt, chunk_size=options["chunk_size"])
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as target:
+                target.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
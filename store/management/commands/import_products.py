@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from store.bulk import import_products, iter_rows, detect_format, IMPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Stream-import products from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument("--create-categories", action="store_true", help="Create categories that don't exist yet")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or detect_format(options["path"])
+
+        with open(options["path"], encoding="utf-8-sig", newline="") as source:
+            summary = import_products(
+                iter_rows(source, fmt),
+                chunk_size=options["chunk_size"],
+                create_categories=options["create_categories"],
+            )
+
+        for error in summary["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['message']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {summary['created']}, updated {summary['updated']}, failed {summary['failed']}"
+        ))
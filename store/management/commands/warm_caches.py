@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from utils.cache.warming import warm_caches, get_warmer_names
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached catalog, category, order and coupon lists that are missing (e.g. after a deploy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names", nargs="*",
+            help=f"Cache families to warm, all by default: {', '.join(get_warmer_names())}"
+        )
+
+    def handle(self, *args, **options):
+        for name, result in warm_caches(options["names"]).items():
+            if isinstance(result, str):
+                self.stdout.write(self.style.ERROR(f"{name}: {result}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: warmed in {result}s"))
@@ -26,6 +26,7 @@ class Category(models.Model):
     )
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='store/category/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return self.name
@@ -36,6 +37,7 @@ class Product(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     product_image = models.ImageField(upload_to='store/main_product/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
     alt_text = models.CharField(max_length=255, blank=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='category')
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -60,7 +62,20 @@ class Product(models.Model):
 class ProductImages(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images", blank=True, null=True)
     image = models.ImageField(upload_to='store/product/images/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"image for {self.product}"
\ No newline at end of file
+        return f"image for {self.product}"
+
+
+class ProductSearchTerm(models.Model):
+    """
+        One posting of the product search inverted index: a term and how strongly it describes a product.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="search_terms")
+    term = models.CharField(max_length=64, db_index=True)
+    weight = models.FloatField(default=1)
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id}"
@@ -0,0 +1,116 @@
+import heapq
+from collections import defaultdict
+from django.conf import settings
+from .models import Product
+from .facets import FLAG_FIELDS, price_bucket
+from utils.cache.cache import set_many_cached_data, get_cached_data, bump_namespace
+from utils.cache.related_products_cache_key import related_products_cache_key
+
+RELATED_PRODUCTS_COUNT = getattr(settings, "RELATED_PRODUCTS_COUNT", 6)
+# Outlives several runs of the batch job, lists of deleted products expire
+RELATED_PRODUCTS_TTL = getattr(settings, "RELATED_PRODUCTS_TTL", 60 * 60 * 24 * 7)
+# Bumped after every run, for the responses showing related products
+RELATED_PRODUCTS_NAMESPACE = "related-products"
+
+# How much each kind of shared feature adds to the similarity of two products
+FEATURE_WEIGHTS = {
+    "category": 4,
+    "price": 2,
+    "color": 2,
+    "size": 1,
+    "flag": 1,
+}
+
+
+class FeatureSpace:
+    """
+        Maps feature values to bit positions so a product's features become one int.
+        Similarity of two products is then a weighted popcount of the AND of their vectors.
+    """
+
+    def __init__(self):
+        self.bits = {}
+        self.masks = defaultdict(int)
+
+    def bit(self, kind, value):
+        key = (kind, value)
+        if key not in self.bits:
+            self.bits[key] = 1 << len(self.bits)
+            self.masks[kind] |= self.bits[key]
+        return self.bits[key]
+
+    def vector(self, product):
+        vector = 0
+        if product.category_id:
+            vector |= self.bit("category", product.category_id)
+        if product.color:
+            vector |= self.bit("color", product.color.strip().lower())
+        if product.size:
+            vector |= self.bit("size", product.size.strip().lower())
+
+        price = product.discount_price if product.discount_price is not None else product.price
+        if price is not None:
+            vector |= self.bit("price", price_bucket(price))
+
+        for field in FLAG_FIELDS:
+            if getattr(product, field):
+                vector |= self.bit("flag", field)
+        return vector
+
+    def similarity(self, a, b):
+        shared = a & b
+        return sum(weight * (shared & self.masks[kind]).bit_count() for kind, weight in FEATURE_WEIGHTS.items())
+
+
+def compute_related_products(count=RELATED_PRODUCTS_COUNT):
+    """
+        Compute the top `count` similar available products of every product and cache the id lists.
+
+        Products with identical feature vectors are grouped, so scores are computed
+        once per pair of distinct vectors rather than once per pair of products.
+        Ties go to the newest product. Returns the number of products processed.
+    """
+
+    space = FeatureSpace()
+    groups = defaultdict(list)
+
+    products = (
+        Product.objects.filter(not_available=False)
+        .only("id", "category_id", "color", "size", "price", "discount_price", *FLAG_FIELDS)
+        .order_by("-created_at")
+        .iterator(chunk_size=1000)
+    )
+    for product in products:
+        groups[space.vector(product)].append(str(product.pk))
+
+    # Dicts keep insertion order, so a lower position means the group holds newer products
+    position = {vector: index for index, vector in enumerate(groups)}
+
+    related = {}
+    for vector, members in groups.items():
+        # count + 1 groups always hold enough products once the product itself is skipped
+        best = heapq.nlargest(
+            count + 1,
+            groups,
+            key=lambda other: (space.similarity(vector, other), -position[other])
+        )
+        candidates = [candidate for other in best for candidate in groups[other]]
+
+        for product_id in members:
+            picks = [candidate for candidate in candidates[:count + 1] if candidate != product_id][:count]
+            related[related_products_cache_key(product_id)] = picks
+
+    keys = list(related)
+    for start in range(0, len(keys), 1000):
+        set_many_cached_data({key: related[key] for key in keys[start:start + 1000]}, RELATED_PRODUCTS_TTL)
+
+    bump_namespace(RELATED_PRODUCTS_NAMESPACE)
+    return len(related)
+
+
+def get_related_product_ids(product_id):
+    """
+        Precomputed related ids of a product, or None when the batch job hasn't covered it yet.
+    """
+
+    return get_cached_data(related_products_cache_key(product_id))
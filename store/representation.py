@@ -0,0 +1,41 @@
+from .serializers import ProductSerializer, CompactProductSerializer
+
+PRODUCT_VIEWS = {
+    "full": ProductSerializer,
+    "compact": CompactProductSerializer,
+}
+
+
+class ProductRepresentation:
+    """
+        Which product representation a list request asked for:
+        ?view=compact picks the lean serializer and ?fields=id,title,price keeps only those keys.
+    """
+
+    def __init__(self, view="full", fields=None):
+        self.view = view if view in PRODUCT_VIEWS else "full"
+        allowed = PRODUCT_VIEWS[self.view].Meta.fields
+        self.fields = [field for field in allowed if field in set(fields or [])] or None
+
+    @classmethod
+    def from_request(cls, request):
+        fields = request.query_params.get("fields")
+        return cls(
+            view=request.query_params.get("view", "full"),
+            fields=[field.strip() for field in fields.split(",")] if fields else None,
+        )
+
+    @property
+    def cache_suffix(self):
+        """
+            Empty for the default representation so its cache keys stay unchanged.
+        """
+        suffix = "" if self.view == "full" else f"_{self.view}"
+        if self.fields:
+            suffix += "_fields_" + "-".join(self.fields)
+        return suffix
+
+    def apply(self, items):
+        if not self.fields:
+            return items
+        return [{field: item[field] for field in self.fields} for item in items]
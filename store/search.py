@@ -0,0 +1,171 @@
+import math
+import operator
+import re
+from collections import defaultdict
+from functools import reduce
+from django.db import transaction
+from django.db.models import Q, F, Case, When, Value, Max, Count, FloatField
+from .models import Product, ProductSearchTerm
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MIN_TOKEN_LENGTH = 2
+# Shorter last tokens only match whole terms, "ri" would otherwise scan half the index
+MIN_PREFIX_LENGTH = 3
+MAX_QUERY_TOKENS = 8
+
+# How much a term found in each field counts towards a product's score
+FIELD_WEIGHTS = {
+    "title": 5.0,
+    "category": 3.0,
+    "color": 2.0,
+    "size": 2.0,
+    "description": 1.0,
+}
+
+# A term that only starts with the query token ranks below an exact match
+PREFIX_MATCH_FACTOR = 0.5
+
+STOP_WORDS = {"a", "an", "and", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOP_WORDS
+    ]
+
+
+def build_terms(product):
+    """
+        Weighted terms of a product: {term: weight}.
+        Repeated terms count with diminishing returns so long descriptions don't drown the title.
+    """
+
+    fields = {
+        "title": product.title,
+        "category": product.category.name if product.category else "",
+        "color": product.color,
+        "size": product.size,
+        "description": product.description,
+    }
+
+    terms = defaultdict(float)
+    for field, text in fields.items():
+        counts = defaultdict(int)
+        for token in tokenize(text):
+            counts[token] += 1
+        for token, count in counts.items():
+            terms[token[:64]] += FIELD_WEIGHTS[field] * (1 + math.log(count))
+
+    return terms
+
+
+def _postings(product):
+    return [
+        ProductSearchTerm(product_id=product.pk, term=term, weight=weight)
+        for term, weight in build_terms(product).items()
+    ]
+
+
+def index_product(product):
+    """
+        Replace the postings of a single product.
+    """
+
+    with transaction.atomic():
+        ProductSearchTerm.objects.filter(product_id=product.pk).delete()
+        ProductSearchTerm.objects.bulk_create(_postings(product))
+
+
+def index_products(products):
+    """
+        Replace the postings of several products in one pass.
+    """
+
+    products = list(products)
+    with transaction.atomic():
+        ProductSearchTerm.objects.filter(product_id__in=[product.pk for product in products]).delete()
+        ProductSearchTerm.objects.bulk_create(
+            [posting for product in products for posting in _postings(product)],
+            batch_size=1000
+        )
+
+
+def rebuild_index(chunk_size=500):
+    """
+        Drop and rebuild the whole index. Returns the number of products indexed.
+    """
+
+    indexed = 0
+    with transaction.atomic():
+        ProductSearchTerm.objects.all().delete()
+
+        batch = []
+        for product in Product.objects.select_related("category").iterator(chunk_size=chunk_size):
+            batch.extend(_postings(product))
+            indexed += 1
+            if len(batch) >= 1000:
+                ProductSearchTerm.objects.bulk_create(batch)
+                batch = []
+
+        ProductSearchTerm.objects.bulk_create(batch)
+
+    return indexed
+
+
+def find_products(query, offset=0, limit=24):
+    """
+        Rank available products against a free-text query.
+
+        Every query token must match a term exactly, except the last one (still being typed),
+        which may also match as a prefix once it is MIN_PREFIX_LENGTH long. Matches are scored
+        by field weight times inverse document frequency, so rare words weigh more than ones
+        shared by half the catalog. Scoring, ranking and paging all happen in the database.
+
+        Returns (product_ids, total_matches).
+    """
+
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return [], 0
+
+    prefix = tokens[-1] if len(tokens[-1]) >= MIN_PREFIX_LENGTH else None
+
+    def matches(token):
+        return Q(term__startswith=token) if token == prefix else Q(term=token)
+
+    postings = ProductSearchTerm.objects.filter(
+        reduce(operator.or_, (matches(token) for token in tokens)),
+        product__not_available=False
+    )
+
+    frequencies = postings.aggregate(**{
+        f"df{i}": Count("product_id", distinct=True, filter=matches(token))
+        for i, token in enumerate(tokens)
+    })
+    if not all(frequencies.values()):
+        return [], 0
+
+    document_count = Product.objects.filter(not_available=False).count() or 1
+    idf = [math.log(1 + document_count / frequencies[f"df{i}"]) for i in range(len(tokens))]
+
+    # Best match of each token in each product, the exact term ranking above longer ones
+    best = {}
+    for i, token in enumerate(tokens):
+        whens = [When(term=token, then=F("weight"))]
+        if token == prefix:
+            whens.append(When(term__startswith=token, then=F("weight") * Value(PREFIX_MATCH_FACTOR)))
+        best[f"m{i}"] = Max(Case(*whens, output_field=FloatField()))
+
+    ranked = (
+        postings.values("product_id")
+        .annotate(**best)
+        .filter(**{f"m{i}__isnull": False for i in range(len(tokens))})
+        .annotate(score=sum((F(f"m{i}") * Value(idf[i]) for i in range(len(tokens))), Value(0.0)))
+    )
+
+    total = ranked.count()
+    page = ranked.order_by("-score", "product_id")[offset:offset + limit]
+    return [row["product_id"] for row in page], total
@@ -1,22 +1,35 @@
 from rest_framework import serializers
 from .models import Product, Category, ProductImages
+from utils.images.derivatives import derivative_urls
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Category
         fields = "__all__"
 
+    def get_image_variants(self, obj):
+        return derivative_urls(obj.image_variants)
+
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImages
-        fields = ["image"]
+        fields = ["image", "image_variants"]
+
+    def get_image_variants(self, obj):
+        return derivative_urls(obj.image_variants)
 
 
 class ProductSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
+    product_image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = [
@@ -26,6 +39,7 @@ class ProductSerializer(serializers.ModelSerializer):
             'price',
             'discount_price',
             'product_image',
+            'product_image_variants',
             'alt_text',
             'stock',
             'category',
@@ -39,3 +53,46 @@ class ProductSerializer(serializers.ModelSerializer):
             'is_featured',
             'images',
         ]
+
+    def get_product_image_variants(self, obj):
+        return derivative_urls(obj.image_variants)
+
+
+class CategorySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ["id", "name"]
+
+
+class CompactProductSerializer(serializers.ModelSerializer):
+    """
+        Lean product representation for grid views: no description, the category as
+        id/name and only the primary image instead of the whole gallery.
+    """
+    category = CategorySummarySerializer(read_only=True)
+    product_image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            'id',
+            'title',
+            'price',
+            'discount_price',
+            'product_image',
+            'product_image_variants',
+            'alt_text',
+            'stock',
+            'category',
+            'size',
+            'not_available',
+            'color',
+            'is_hot',
+            'is_new',
+            'is_best',
+            'is_trending',
+            'is_featured',
+        ]
+
+    def get_product_image_variants(self, obj):
+        return derivative_urls(obj.image_variants)
@@ -1,20 +1,118 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
-from .models import Product
+from .models import Product, ProductImages, Category
+from .invalidation import invalidate_product, invalidate_categories
+from .search import index_product, index_products
+from .facets import update_product_facets, remove_product_facets, drop_facet_index
+
+# Saves that only touch these fields don't change what search and facets index
+UNINDEXED_FIELDS = {"updated_at", "image_variants"}
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, **kwargs):
+    """
+        A product moved to another category has to leave the old category's lists too.
+    """
+    if instance._state.adding:
+        return
+
+    instance._previous_category_name = (
+        Product.objects.filter(pk=instance.pk).values_list("category__name", flat=True).first()
+    )
+
 
 @receiver([post_save, post_delete], sender=Product)
 def clear_product_cache(sender, instance, **kwargs):
     try:
-        keys_to_clear = [
-            "all_public_products",
-            "all_admin_products",
-            f"products_in_{instance.category.name.lower()}"
-        ]
+        invalidate_product(instance, getattr(instance, "_previous_category_name", None))
+        print(f"Cache cleared for product {instance.pk}")
+
+    except Exception as e:
+        print(f"Error clearing cache: {e}")
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, update_fields=None, **kwargs):
+    """
+        Keep the search postings of a product in step with its text.
+        Postings are removed together with the product through the foreign key cascade.
+    """
+    if update_fields is not None and set(update_fields) <= UNINDEXED_FIELDS:
+        return
+
+    try:
+        index_product(instance)
+    except Exception as e:
+        print(f"Error indexing product: {e}")
+
+
+@receiver(post_save, sender=Product)
+def update_product_facet_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= UNINDEXED_FIELDS:
+        return
+
+    try:
+        update_product_facets(instance)
+    except Exception as e:
+        print(f"Error updating facets: {e}")
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_facet_index(sender, instance, **kwargs):
+    try:
+        remove_product_facets(instance.pk)
+    except Exception as e:
+        print(f"Error updating facets: {e}")
 
-        for key in keys_to_clear:
-            cache.delete(key)
-            print(f"Cache cleared for {key}")
+
+@receiver([post_save, post_delete], sender=ProductImages)
+def clear_product_images_cache(sender, instance, **kwargs):
+    """
+        Product fragments are keyed on updated_at, so touch the product
+        whenever its gallery changes and let the product signal clear the lists.
+    """
+    try:
+        product = Product.objects.filter(pk=instance.product_id).first()
+        if product:
+            product.save(update_fields=["updated_at"])
 
     except Exception as e:
         print(f"Error clearing cache: {e}")
+
+
+@receiver(pre_save, sender=Category)
+def remember_previous_category_name(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+
+    instance._previous_name = Category.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Category)
+def clear_category_cache(sender, instance, **kwargs):
+    """
+        Serialized products embed their category, so a category change retires every product fragment.
+    """
+    try:
+        invalidate_categories(instance.name, *filter(None, [getattr(instance, "_previous_name", None)]))
+        # Category facet values are names, let the index rebuild on the next read
+        drop_facet_index()
+        print(f"Cache cleared for category {instance.name}")
+
+    except Exception as e:
+        print(f"Error clearing cache: {e}")
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, update_fields=None, **kwargs):
+    """
+        The category name is part of every product's postings.
+    """
+    if update_fields is not None and set(update_fields) <= UNINDEXED_FIELDS:
+        return
+
+    try:
+        index_products(Product.objects.filter(category=instance).select_related("category"))
+    except Exception as e:
+        print(f"Error indexing products: {e}")
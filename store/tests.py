@@ -1,3 +1,952 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, DatabaseError
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from PIL import Image
+from .models import Product, Category
+from .search import find_products
+from .bulk import import_products, iter_rows
+from .related import RELATED_PRODUCTS_NAMESPACE, compute_related_products, get_related_product_ids
+from .cached import get_fallback_products
+from .fragments import serialize_products
+from . import views
+from .facets import filter_products, build_facet_index, FACET_INDEX_GENERATION_KEY, FACET_INDEX_LOCK_KEY
+from utils.cache.near import near_cache, NearCache, _handle_message
+from utils.cache.codec import encode, decode, MAGIC
+from utils.cache.rendered import render_entry
+from utils.cache.warming import warm_caches
+from handlers.tasks import cacheWarming, cacheRefresh
+from handlers.tasks.imageDerivatives import generate_image_derivatives
+from utils.images.derivatives import build_derivatives, delete_derivatives
+from utils.cache.cache import get_or_set_cache, get_or_set_namespaced, get_namespace_version, bump_namespace, bump_namespaces, namespaced_key, refresh_cache
+from utils.pagination.keyset import encode_cursor, decode_cursor, InvalidCursor
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 # Create your tests here.
+
+
+class CacheTestCase(TestCase):
+    """
+        Every test starts from an empty cache, cached responses and versions included.
+    """
+
+    def setUp(self):
+        cache.clear()
+        near_cache.clear()
+        self.client = APIClient()
+
+
+def raw_cursor(*parts):
+    return base64.urlsafe_b64encode(json.dumps(parts).encode()).decode().rstrip("=")
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class KeysetPaginationTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="rings")
+        now = timezone.now()
+        self.products = []
+        for i in range(5):
+            product = Product.objects.create(title=f"ring {i}", description="", category=category, price=Decimal("10.00"))
+            # Two products share a timestamp, the id breaks the tie
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(minutes=min(i, 3)))
+            self.products.append(product)
+
+    def page(self, cursor=None):
+        params = {"limit": 2, "view": "card"}
+        if cursor:
+            params["cursor"] = cursor
+        return self.client.get("/api/v1/store/products/all/", params)
+
+    def test_cursor_round_trip(self):
+        created_at, pk = timezone.now(), self.products[0].pk
+        self.assertEqual(decode_cursor(encode_cursor(created_at, pk, "p")), (created_at, pk, "p"))
+
+    def test_pages_cover_every_product_once(self):
+        seen, pages, cursor = [], [], None
+        while True:
+            response = self.page(cursor)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            seen += [product["id"] for product in response.data["product"]]
+            cursor = response.data["next"]
+            if not cursor:
+                break
+
+        self.assertEqual(sorted(seen), sorted(str(product.pk) for product in self.products))
+        self.assertEqual(len(seen), len(set(seen)))
+
+        # The previous cursor of the second page leads back to the first one
+        previous = self.page(pages[1]["previous"])
+        self.assertEqual(previous.data["product"], pages[0]["product"])
+
+    def test_tampered_cursors_are_rejected(self):
+        cursors = [
+            raw_cursor("2026-10-18T10:00:00+00:00", "not-a-uuid", "n"),
+            raw_cursor("2026-10-18T10:00:00", str(self.products[0].pk), "n"),
+            raw_cursor("2026-10-18T10:00:00+00:00", str(self.products[0].pk), "x"),
+            raw_cursor("yesterday", str(self.products[0].pk), "n"),
+            raw_cursor("2026-10-18T10:00:00+00:00", None, "n"),
+            raw_cursor(1, 2),
+            "%%%not-base64",
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    decode_cursor(cursor)
+                self.assertEqual(self.page(cursor).status_code, 400)
+
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SearchTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rings = Category.objects.create(name="rings")
+        necklaces = Category.objects.create(name="necklaces")
+
+        def product(title, description="", category=rings, **fields):
+            return Product.objects.create(title=title, description=description, category=category, price=Decimal("10.00"), **fields)
+
+        self.gold_ring = product("Gold ring", "A classic band")
+        self.silver_ring = product("Silver ring", "Goes well with gold earrings")
+        self.gold_necklace = product("Gold necklace", category=necklaces)
+        self.hidden = product("Gold ring deluxe", not_available=True)
+
+    def search(self, query, **kwargs):
+        return find_products(query, **kwargs)
+
+    def test_title_match_ranks_first(self):
+        ids, total = self.search("gold")
+
+        self.assertEqual(total, 3)
+        self.assertEqual(ids[-1], self.silver_ring.pk)
+        self.assertNotIn(self.hidden.pk, ids)
+
+    def test_every_token_must_match(self):
+        ids, total = self.search("gold ring")
+
+        self.assertEqual(total, 2)
+        self.assertEqual(ids[0], self.gold_ring.pk)
+
+    def test_last_token_matches_as_prefix(self):
+        self.assertEqual(self.search("neckl")[0], [self.gold_necklace.pk])
+        self.assertEqual(self.search("gold neck")[0], [self.gold_necklace.pk])
+        # Only the token being typed is a prefix
+        self.assertEqual(self.search("neck gold"), ([], 0))
+
+    def test_exact_match_ranks_above_prefix(self):
+        product = Product.objects.create(title="Goldfish charm", description="", price=Decimal("10.00"))
+
+        ids, _ = self.search("gold")
+        self.assertEqual(set(ids[:2]), {self.gold_ring.pk, self.gold_necklace.pk})
+        self.assertEqual(ids[2], product.pk)
+
+    def test_short_prefix_only_matches_whole_terms(self):
+        Product.objects.create(title="Ox ring", description="", price=Decimal("10.00"))
+
+        self.assertEqual(self.search("ri"), ([], 0))
+        self.assertEqual(self.search("ox")[1], 1)
+
+    def test_paging(self):
+        ids, total = self.search("gold")
+        first, _ = self.search("gold", offset=0, limit=2)
+        second, _ = self.search("gold", offset=2, limit=2)
+
+        self.assertEqual(first + second, ids)
+        self.assertEqual(total, 3)
+
+    def test_search_endpoint(self):
+        response = self.client.get("/api/v1/store/products/search/", {"q": "silver"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 1)
+        self.assertEqual(response.data["product"][0]["id"], str(self.silver_ring.pk))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class FacetTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rings = Category.objects.create(name="rings")
+
+        def product(title, color, price, **fields):
+            return Product.objects.create(title=title, description="", category=rings, color=color, price=Decimal(price), **fields)
+
+        self.gold = product("Gold ring", "Gold", "40.00", is_hot=True)
+        self.silver = product("Silver ring", "Silver", "80.00")
+        self.rose = product("Rose ring", "Gold", "120.00", is_hot=True)
+
+    def test_filters_and_counts(self):
+        ids, total, counts = filter_products({"color": ["gold"], "flag": ["is_hot"]})
+
+        # Newest first
+        self.assertEqual(ids, [str(self.rose.pk), str(self.gold.pk)])
+        self.assertEqual(total, 2)
+        # The color counts ignore the color selection
+        self.assertEqual(counts["color"], {"gold": 2})
+        self.assertEqual(counts["price"], {"0-50": 1, "100-200": 1})
+
+        _, total, counts = filter_products({"color": ["gold", "silver"]})
+        self.assertEqual(total, 3)
+        self.assertEqual(counts["color"], {"gold": 2, "silver": 1})
+
+    def test_counts_follow_updates(self):
+        build_facet_index()
+        generation = cache.get(FACET_INDEX_GENERATION_KEY)
+
+        self.silver.color = "Gold"
+        self.silver.save()
+        new = Product.objects.create(title="Copper ring", description="", color="Copper", price=Decimal("10.00"))
+
+        _, total, counts = filter_products({})
+        self.assertEqual(total, 4)
+        self.assertEqual(counts["color"], {"gold": 3, "copper": 1})
+
+        self.rose.delete()
+        new.not_available = True
+        new.save()
+
+        ids, total, counts = filter_products({})
+        self.assertEqual(ids, [str(self.silver.pk), str(self.gold.pk)])
+        self.assertEqual(counts["color"], {"gold": 2})
+        self.assertNotIn("100-200", counts["price"])
+        # Updated in place, not rebuilt
+        self.assertEqual(cache.get(FACET_INDEX_GENERATION_KEY), generation)
+
+    def test_paging(self):
+        first, total, _ = filter_products({}, offset=0, limit=2)
+        second, _, _ = filter_products({}, offset=2, limit=2)
+
+        self.assertEqual(total, 3)
+        self.assertEqual(first + second, [str(product.pk) for product in (self.rose, self.silver, self.gold)])
+
+    def test_build_waits_for_the_update_lock(self):
+        cache.add(FACET_INDEX_LOCK_KEY, 1, 10)
+
+        with mock.patch("store.facets.FACET_INDEX_LOCK_TIMEOUT", 0.05):
+            index = build_facet_index()
+
+        # Computed for the caller but not published over a concurrent update
+        self.assertEqual(len(index["ids"]), 3)
+        self.assertIsNone(cache.get(FACET_INDEX_GENERATION_KEY))
+        self.assertEqual(cache.get(FACET_INDEX_LOCK_KEY), 1)
+
+    def test_facets_endpoint(self):
+        response = self.client.get("/api/v1/store/products/facets/", {"color": "silver"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 1)
+        self.assertEqual(response.data["product"][0]["id"], str(self.silver.pk))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class NamespaceVersionTests(CacheTestCase):
+
+    def test_bump_invalidates_every_key_of_the_namespace(self):
+        builds = []
+
+        def fetch(value):
+            def build():
+                builds.append(value)
+                return value
+            return build
+
+        self.assertEqual(get_or_set_namespaced("category:rings", "page-1", fetch("a")), "a")
+        self.assertEqual(get_or_set_namespaced("category:rings", "page-2", fetch("b")), "b")
+        self.assertEqual(get_or_set_namespaced("category:necklaces", "page-1", fetch("c")), "c")
+        self.assertEqual(get_or_set_namespaced("category:rings", "page-1", fetch("stale")), "a")
+
+        bump_namespace("category:rings")
+
+        self.assertEqual(get_or_set_namespaced("category:rings", "page-1", fetch("d")), "d")
+        self.assertEqual(get_or_set_namespaced("category:rings", "page-2", fetch("e")), "e")
+        self.assertEqual(get_or_set_namespaced("category:necklaces", "page-1", fetch("stale")), "c")
+        self.assertEqual(builds, ["a", "b", "c", "d", "e"])
+
+    def test_versions_only_move_forward(self):
+        version = get_namespace_version("catalog")
+        bump_namespaces(["catalog", "catalog"])
+
+        self.assertEqual(get_namespace_version("catalog"), version + 1)
+
+    def test_seeded_versions_expire(self):
+        with mock.patch("utils.cache.cache.CACHE_VERSION_TTL", 1):
+            version = get_namespace_version("category:made-up")
+            time.sleep(1.1)
+
+        self.assertIsNone(cache.get("cache_version_category:made-up"))
+        self.assertGreaterEqual(get_namespace_version("category:made-up"), version)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class FallbackProductTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rings = Category.objects.create(name="Rings")
+        self.ring = Product.objects.create(title="Gold ring", description="", category=self.rings, price=Decimal("10.00"))
+        self.new = Product.objects.create(title="New charm", description="", price=Decimal("10.00"), is_new=True)
+
+    def test_known_category(self):
+        self.assertEqual([product["id"] for product in get_fallback_products("rings")], [str(self.ring.pk)])
+
+    def test_unknown_category_shares_the_catalog_fallback(self):
+        for name in ("made-up", "another"):
+            self.assertEqual([product["id"] for product in get_fallback_products(name)], [str(self.new.pk)])
+            self.assertIsNone(cache.get(f"cache_version_category:{name}"))
+            self.assertIsNone(cache.get(f"stale:category:{name}:fallback_products_in_{name}"))
+
+    def test_unknown_product_is_looked_up_once(self):
+        get_fallback_products()
+        request = APIRequestFactory().get("/api/v1/store/product/7d1f6c2e-1d7e-4f3a-9a55-3c1f0b9d2a11/")
+
+        def product_lookups():
+            with CaptureQueriesContext(connection) as queries:
+                response = views.get_product_via_id(request, "7d1f6c2e-1d7e-4f3a-9a55-3c1f0b9d2a11")
+            self.assertEqual(response.status_code, 404)
+            return [query for query in queries if 'FROM "store_product"' in query["sql"]]
+
+        self.assertEqual(len(product_lookups()), 1)
+        # Remembered as missing from then on
+        self.assertEqual(product_lookups(), [])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ConditionalGetTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rings = Category.objects.create(name="Rings")
+        self.ring = Product.objects.create(title="Gold ring", description="", category=self.rings, price=Decimal("10.00"))
+
+    def revalidate(self, path, params=None):
+        first = self.client.get(path, params)
+        self.assertIn("ETag", first)
+        return first["ETag"], self.client.get(path, params, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    def test_product_etag_follows_every_namespace(self):
+        path = f"/api/v1/store/product/{self.ring.pk}/"
+
+        for namespace in (RELATED_PRODUCTS_NAMESPACE, "category:rings", "product-fragments", f"product:{self.ring.pk}"):
+            with self.subTest(namespace=namespace):
+                etag, response = self.revalidate(path)
+                self.assertEqual(response.status_code, 304)
+
+                bump_namespace(namespace)
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_category_etag(self):
+        etag, response = self.revalidate("/api/v1/store/category/product/", {"category_name": "rings"})
+        self.assertEqual(response.status_code, 304)
+
+        bump_namespace("category:rings")
+        response = self.client.get("/api/v1/store/category/product/", {"category_name": "rings"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_names_leave_no_keys(self):
+        response = self.client.get("/api/v1/store/category/product/", {"category_name": "made-up"})
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response)
+
+        response = self.client.get("/api/v1/store/product/not-a-uuid/", {"category": "made-up"})
+        self.assertEqual(response.status_code, 404)
+
+        self.assertIsNone(cache.get("cache_version_category:made-up"))
+        self.assertIsNone(cache.get("cache_version_product:not-a-uuid"))
+
+    def test_new_category_is_found(self):
+        self.assertEqual(self.client.get("/api/v1/store/category/product/", {"category_name": "charms"}).status_code, 404)
+
+        charms = Category.objects.create(name="Charms")
+        Product.objects.create(title="Star charm", description="", category=charms, price=Decimal("10.00"))
+
+        self.assertEqual(self.client.get("/api/v1/store/category/product/", {"category_name": "charms"}).status_code, 200)
+
+
+class CacheCodecTests(TestCase):
+
+    def big(self, **extra):
+        return {"product": [{"id": str(i), "title": f"ring {i}", "price": "10.00"} for i in range(500)], **extra}
+
+    def test_round_trip_keeps_types(self):
+        values = [
+            self.big(),
+            self.big(pair=(1, 2), by_id={1: "a", 2: "b"}, tags={"gold"}),
+            [("ring", Decimal("10.00"))] * 2000,
+            "x" * 20000,
+        ]
+        for value in values:
+            with self.subTest(value=type(value)):
+                stored = encode(value)
+                self.assertTrue(stored.startswith(MAGIC))
+                self.assertEqual(decode(stored), value)
+
+        restored = decode(encode(self.big(pair=(1, 2), by_id={1: "a"})))
+        self.assertIsInstance(restored["pair"], tuple)
+        self.assertEqual(list(restored["by_id"]), [1])
+
+    def test_big_values_are_compressed(self):
+        value = self.big()
+        self.assertLess(len(encode(value)), len(json.dumps(value)) / 2)
+
+    def test_small_values_are_left_alone(self):
+        for value in ({"product": []}, [1, 2, 3], "ring", 3, None):
+            with self.subTest(value=value):
+                self.assertIs(encode(value), value)
+                self.assertIs(decode(value), value)
+
+    def test_rendered_entries_are_left_alone(self):
+        entry = render_entry(self.big())
+
+        self.assertIsNotNone(entry["gzip"])
+        self.assertIs(encode(entry), entry)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BulkImportTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rings = Category.objects.create(name="Rings")
+        self.ring = Product.objects.create(title="Gold ring", description="", category=self.rings, price=Decimal("10.00"))
+
+    def test_unknown_id_without_price_fails_alone(self):
+        summary = import_products([
+            {"id": str(self.ring.pk), "price": "12.00"},
+            {"id": "7d1f6c2e-1d7e-4f3a-9a55-3c1f0b9d2a11", "title": "Lost ring"},
+            {"title": "Silver ring", "price": "8.00", "category": "rings"},
+        ])
+
+        self.assertEqual((summary["created"], summary["updated"], summary["failed"]), (1, 1, 1))
+        self.assertEqual(summary["errors"], [{"row": 2, "message": "price is required"}])
+        self.ring.refresh_from_db()
+        self.assertEqual(self.ring.price, Decimal("12.00"))
+        self.assertTrue(Product.objects.filter(title="Silver ring", category=self.rings).exists())
+
+    def test_rows_the_database_rejects_fail_alone(self):
+        bulk_create = Product.objects.bulk_create
+
+        def reject_bad_titles(products, *args, **kwargs):
+            if any(product.title == "bad" for product in products):
+                raise DatabaseError("value too long")
+            return bulk_create(products, *args, **kwargs)
+
+        with mock.patch.object(Product.objects, "bulk_create", side_effect=reject_bad_titles):
+            summary = import_products([
+                {"title": "first", "price": "1.00"},
+                {"title": "bad", "price": "1.00"},
+                {"id": str(self.ring.pk), "stock": "3"},
+            ])
+
+        self.assertEqual((summary["created"], summary["updated"], summary["failed"]), (1, 1, 1))
+        self.assertEqual(summary["errors"], [{"row": 2, "message": "value too long"}])
+        self.assertTrue(Product.objects.filter(title="first").exists())
+        self.assertFalse(Product.objects.filter(title="bad").exists())
+
+    def test_missing_categories_are_created_in_one_query(self):
+        rows = [{"title": f"charm {i}", "price": "5.00", "category": name} for i, name in enumerate(["Charms", "charms", "Anklets", "Rings"])]
+
+        with CaptureQueriesContext(connection) as queries:
+            summary = import_products(rows, create_categories=True)
+
+        self.assertEqual(summary["created"], 4)
+        self.assertEqual(sorted(Category.objects.values_list("name", flat=True)), ["Anklets", "Charms", "Rings"])
+        inserts = [query for query in queries if query["sql"].startswith("INSERT") and "store_category" in query["sql"]]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Product.objects.filter(category__name="Charms").count(), 2)
+
+
+    def test_unreadable_lines_fail_alone(self):
+        lines = [
+            '{"title": "Rose ring", "price": "5.00"}\n',
+            '{"title": "Rose band", "price": "5.00"}\n',
+            '{not json\n',
+            '{"title": "Rose charm", "price": "5.00"}\n',
+        ]
+        build_facet_index()
+
+        summary = import_products(iter_rows(lines, "jsonl"), chunk_size=2)
+
+        self.assertEqual((summary["created"], summary["failed"]), (3, 1))
+        self.assertEqual(summary["errors"][0]["row"], 3)
+        self.assertTrue(summary["errors"][0]["message"].startswith("invalid JSON"))
+        self.assertEqual(find_products("rose")[1], 3)
+        self.assertIsNone(cache.get(FACET_INDEX_GENERATION_KEY))
+
+    def test_committed_chunks_are_indexed_when_the_import_stops(self):
+        def rows():
+            yield {"title": "Rose ring", "price": "5.00"}
+            yield {"title": "Rose band", "price": "5.00"}
+            raise OSError("upload interrupted")
+
+        with self.assertRaises(OSError):
+            import_products(rows(), chunk_size=2)
+
+        self.assertEqual(find_products("rose")[1], 2)
+
+    def test_undecodable_csv(self):
+        def lines():
+            yield "title,price\n"
+            yield "Rose ring,5.00\n"
+            raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+        summary = import_products(iter_rows(lines(), "csv"))
+
+        self.assertEqual((summary["created"], summary["failed"]), (1, 1))
+        self.assertEqual(summary["errors"], [{"row": 2, "message": "the file is not valid UTF-8 from here on"}])
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SingleFlightTests(CacheTestCase):
+
+    def run_concurrently(self, function, count=8):
+        results = [None] * count
+        start = threading.Barrier(count)
+
+        def run(i):
+            start.wait()
+            results[i] = function()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def slow_fetch(self, builds, value):
+        def fetch():
+            builds.append(value)
+            time.sleep(0.2)
+            return value
+        return fetch
+
+    def test_waiters_get_the_one_rebuild(self):
+        builds = []
+
+        results = self.run_concurrently(lambda: get_or_set_cache("single-flight", self.slow_fetch(builds, "fresh")))
+
+        self.assertEqual(builds, ["fresh"])
+        self.assertEqual(results, ["fresh"] * 8)
+
+    def test_waiters_get_the_stale_copy_meanwhile(self):
+        cache.set("stale:single-flight", "old")
+        builds = []
+
+        results = self.run_concurrently(
+            lambda: get_or_set_cache("single-flight", self.slow_fetch(builds, "fresh"), stale_key="stale:single-flight")
+        )
+
+        self.assertEqual(builds, ["fresh"])
+        self.assertEqual(sorted(results), ["fresh"] + ["old"] * 7)
+        self.assertEqual(get_or_set_cache("single-flight", self.slow_fetch(builds, "again")), "fresh")
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AnonymousResponseCacheTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.rings = Category.objects.create(name="rings")
+        self.ring = Product.objects.create(title="Gold ring", description="", category=self.rings, price=Decimal("10.00"))
+        self.other = Product.objects.create(title="Silver ring", description="", price=Decimal("10.00"))
+        self.path = f"/api/v1/store/product/{self.ring.pk}/"
+
+    def test_hit_skips_the_view(self):
+        first = self.client.get(self.path, {"a": "1", "b": "2"})
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("public", first["Cache-Control"])
+
+        # The query string is normalized
+        with self.assertNumQueries(0):
+            second = self.client.get(self.path, {"b": "2", "a": "1"})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+
+    def test_not_modified_from_the_cache(self):
+        etag = self.client.get(self.path)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_purged_when_a_tagged_key_is_bumped(self):
+        self.client.get(self.path)
+
+        self.ring.title = "Rose gold ring"
+        self.ring.save()
+
+        response = self.client.get(self.path)
+        self.assertEqual(response.json()["product"]["title"], "Rose gold ring")
+
+    def test_other_products_changing_keeps_the_entry(self):
+        self.client.get(self.path)
+
+        self.other.title = "Silver band"
+        self.other.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.path).status_code, 200)
+
+    def test_authenticated_requests_are_not_cached(self):
+        self.assertEqual(self.client.get(self.path, HTTP_AUTHORIZATION="Bearer token").status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.path)
+        self.assertTrue(queries)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RenderedResponseTests(CacheTestCase):
+    """
+        The views are called directly, the anonymous response cache would answer first otherwise.
+    """
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="rings")
+        for i in range(20):
+            Product.objects.create(title=f"ring {i}", description="A ring", category=category, price=Decimal("10.00"))
+        self.factory = APIRequestFactory()
+
+    def get(self, **headers):
+        response = views.get_products(self.factory.get("/api/v1/store/products/all/", {"limit": 20}, **headers))
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    def test_hits_are_served_as_rendered_bytes(self):
+        built = self.get()
+        self.assertEqual(built.status_code, 200)
+
+        with self.assertNumQueries(0):
+            hit = self.get()
+
+        self.assertNotIn("Content-Encoding", hit)
+        self.assertEqual(hit["Content-Type"], "application/json")
+        self.assertEqual(json.loads(hit.content)["product"], json.loads(built.content)["product"])
+        self.assertEqual(json.loads(hit.content)["message"], "ok (from cache)")
+
+    def test_gzip_for_clients_that_take_it(self):
+        built = self.get()
+
+        hit = self.get(HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(hit["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", hit["Vary"])
+        self.assertEqual(json.loads(gzip.decompress(hit.content))["product"], json.loads(built.content)["product"])
+        self.assertEqual(hit["Content-Length"], str(len(hit.content)))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProductFragmentTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="rings")
+        for i in range(5):
+            Product.objects.create(title=f"ring {i}", description="", category=category, price=Decimal("10.00"))
+
+    def stubs(self):
+        return list(Product.objects.only("id", "updated_at").order_by("-title"))
+
+    def test_cached_fragments_need_no_queries(self):
+        stubs = self.stubs()
+        first = serialize_products(stubs)
+
+        with self.assertNumQueries(0):
+            second = serialize_products(stubs)
+
+        self.assertEqual(second, first)
+        # In the order given
+        self.assertEqual([item["title"] for item in second], [f"ring {i}" for i in range(4, -1, -1)])
+
+    def test_only_changed_products_are_serialized_again(self):
+        serialize_products(self.stubs())
+        product = Product.objects.get(title="ring 2")
+        product.title = "ring two"
+        product.save()
+
+        stubs = self.stubs()
+        with CaptureQueriesContext(connection) as queries:
+            items = serialize_products(stubs)
+
+        self.assertIn("ring two", [item["title"] for item in items])
+        loaded = [query["sql"] for query in queries if 'FROM "store_product"' in query["sql"]]
+        self.assertEqual(len(loaded), 1)
+        self.assertIn(str(product.pk).replace("-", ""), loaded[0])
+
+    def test_representations_have_fragments_of_their_own(self):
+        stubs = self.stubs()
+        full = serialize_products(stubs)
+        compact = serialize_products(stubs, "compact")
+
+        self.assertLess(compact[0].keys(), full[0].keys())
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RelatedProductTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rings = Category.objects.create(name="rings")
+        necklaces = Category.objects.create(name="necklaces")
+
+        def product(title, category, price="10.00", **fields):
+            return Product.objects.create(title=title, description="", category=category, price=Decimal(price), **fields)
+
+        self.ring = product("Gold ring", rings, color="gold")
+        self.gold_ring = product("Gold band", rings, color="gold")
+        self.silver_ring = product("Silver ring", rings, color="silver")
+        self.expensive_ring = product("Diamond ring", rings, price="900.00")
+        self.necklace = product("Gold necklace", necklaces, color="gold")
+        self.hidden = product("Gold ring deluxe", rings, color="gold", not_available=True)
+
+    def test_most_similar_first(self):
+        self.assertEqual(compute_related_products(count=3), 5)
+
+        related = get_related_product_ids(self.ring.pk)
+        # The diamond ring (same category) and the necklace (same color and price) tie, the newer one wins
+        self.assertEqual(related, [str(self.gold_ring.pk), str(self.silver_ring.pk), str(self.necklace.pk)])
+        self.assertNotIn(str(self.hidden.pk), related)
+        self.assertIsNone(get_related_product_ids(self.hidden.pk))
+
+    def test_product_detail_shows_them(self):
+        compute_related_products(count=2)
+
+        response = self.client.get(f"/api/v1/store/product/{self.ring.pk}/")
+
+        self.assertEqual([item["id"] for item in response.json()["related"]], [str(self.gold_ring.pk), str(self.silver_ring.pk)])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ProductRepresentationTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="rings")
+        Product.objects.create(title="Gold ring", description="A ring", category=category, price=Decimal("10.00"))
+        self.factory = APIRequestFactory()
+
+    def get(self, **params):
+        response = views.get_products(self.factory.get("/api/v1/store/products/all/", params))
+        if hasattr(response, "render"):
+            response.render()
+        return json.loads(response.content)["product"][0]
+
+    def test_sparse_fieldsets(self):
+        item = self.get(fields="title,id,bogus")
+
+        self.assertEqual(list(item), ["id", "title"])
+
+    def test_views_are_cached_apart(self):
+        compact = self.get(view="compact")
+        full = self.get()
+        self.assertEqual(self.get(view="compact"), compact)
+
+        self.assertNotIn("description", compact)
+        self.assertEqual(full["description"], "A ring")
+        self.assertEqual(compact["category"]["name"], "rings")
+        self.assertEqual(self.get(view="unknown"), full)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class NearCacheTests(CacheTestCase):
+
+    def test_least_recently_used_are_evicted(self):
+        near = NearCache(max_entries=2, max_bytes=100)
+        near.set("a", "x")
+        near.set("b", "x")
+        near.get("a")
+        near.set("c", "x")
+
+        self.assertEqual(near.get_many(["a", "b", "c"]), {"a": "x", "c": "x"})
+
+    def test_byte_budget(self):
+        near = NearCache(max_entries=10, max_bytes=100)
+        near.set("a", "x" * 40)
+        near.set("b", "x" * 40)
+        near.set("c", "x" * 40)
+        self.assertEqual(list(near.get_many(["a", "b", "c"])), ["b", "c"])
+
+        near.set("huge", "x" * 101)
+        self.assertIsNone(near.get("huge"))
+        self.assertEqual(len(near), 2)
+
+    def test_entries_expire(self):
+        near = NearCache()
+        near.set("key", "value", ttl=-1)
+
+        self.assertIsNone(near.get("key"))
+        self.assertEqual(len(near), 0)
+
+    def test_namespaced_hits_stay_in_process_until_bumped(self):
+        fetch = mock.Mock(side_effect=["first", "second"])
+        get_or_set_namespaced("tests", "value", fetch)
+
+        # Gone from the shared cache, still served by this process
+        cache.delete(namespaced_key("tests", "value"))
+        self.assertEqual(get_or_set_namespaced("tests", "value", fetch), "first")
+
+        bump_namespace("tests")
+        self.assertEqual(get_or_set_namespaced("tests", "value", fetch), "second")
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_invalidation_messages(self):
+        near_cache.set("version", 1)
+        _handle_message("not json")
+        self.assertEqual(near_cache.get("version"), 1)
+
+        _handle_message(json.dumps({"keys": ["version"], "pid": 1}))
+        self.assertIsNone(near_cache.get("version"))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CacheWarmingTests(CacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name="rings")
+        Product.objects.create(title="Gold ring", description="A ring", category=category, price=Decimal("10.00"))
+        self.factory = APIRequestFactory()
+
+    def test_warmed_responses_need_no_queries(self):
+        results = warm_caches(["catalog", "categories"])
+        self.assertIsInstance(results["catalog"], float)
+        self.assertIsInstance(results["categories"], float)
+
+        with self.assertNumQueries(0):
+            products = views.get_products(self.factory.get("/api/v1/store/products/all/"))
+            rings = views.get_product_via_category(
+                self.factory.get("/api/v1/store/category/product/", {"category_name": "rings"})
+            )
+
+        self.assertEqual(products.status_code, 200)
+        self.assertEqual(rings.status_code, 200)
+
+    def test_failures_are_reported(self):
+        with mock.patch("store.cached.warm_catalog", side_effect=RuntimeError("down")):
+            results = warm_caches(["catalog", "nope"])
+
+        self.assertEqual(results, {"catalog": "down", "nope": "unknown cache warmer"})
+
+    def test_changes_share_one_queued_warm_up(self):
+        # Forget the warm-up queued by the product created above
+        cache.clear()
+
+        with mock.patch.object(cacheWarming.warm_caches, "apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                cacheWarming.schedule_cache_warming("catalog", "categories")
+                cacheWarming.schedule_cache_warming("catalog")
+
+        apply_async.assert_called_once_with(args=[["catalog", "categories"]], countdown=cacheWarming.CACHE_WARM_DELAY)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class SoftExpiryTests(CacheTestCase):
+
+    def test_stale_value_served_while_refreshed_once(self):
+        refresh = mock.Mock(return_value=True)
+        get_or_set_cache("key", lambda: "old", soft_ttl=0)
+
+        self.assertEqual(get_or_set_cache("key", lambda: "new", soft_ttl=0, refresh=refresh), "old")
+        self.assertEqual(get_or_set_cache("key", lambda: "new", soft_ttl=0, refresh=refresh), "old")
+        refresh.assert_called_once_with()
+
+        self.assertEqual(refresh_cache("key", lambda: "new", soft_ttl=0), "new")
+        self.assertEqual(get_or_set_cache("key", lambda: "newer", soft_ttl=0, refresh=refresh), "new")
+        self.assertEqual(refresh.call_count, 2)
+
+    def test_rebuilt_in_line_when_no_refresh_can_be_queued(self):
+        get_or_set_cache("key", lambda: "old", soft_ttl=0)
+
+        self.assertEqual(get_or_set_cache("key", lambda: "new", soft_ttl=0, refresh=lambda: False), "new")
+        self.assertEqual(get_or_set_cache("key", lambda: "newer", refresh=lambda: True), "new")
+
+    def test_catalog_pages_are_refreshed_in_the_background(self):
+        category = Category.objects.create(name="rings")
+        product = Product.objects.create(title="Gold ring", description="", category=category, price=Decimal("10.00"))
+        factory = APIRequestFactory()
+
+        def titles():
+            response = views.get_products(factory.get("/api/v1/store/products/all/", {"limit": 5}))
+            if hasattr(response, "render"):
+                response.render()
+            return [item["title"] for item in json.loads(response.content)["product"]]
+
+        with mock.patch("utils.cache.cache.CACHE_SOFT_TTL", 0), \
+                mock.patch.object(cacheRefresh.refresh_cached_value, "delay") as delay:
+            self.assertEqual(titles(), ["Gold ring"])
+            # Changed behind the cache's back, so only a refresh picks it up
+            Product.objects.filter(pk=product.pk).update(title="Rose gold ring", updated_at=timezone.now())
+            # Hits from this process's near cache skip the check until their own short TTL ends
+            near_cache.clear()
+
+            self.assertEqual(titles(), ["Gold ring"])
+            delay.assert_called_once_with("products_page", [None, 5, "full", None])
+
+            cacheRefresh.refresh_cached_value(*delay.call_args.args)
+            self.assertEqual(titles(), ["Rose gold ring"])
+
+
+def image_file(width, height, mode="RGB"):
+    buffer = BytesIO()
+    Image.new(mode, (width, height)).save(buffer, "PNG")
+    return ContentFile(buffer.getvalue(), name="photo.png")
+
+
+@override_settings(CACHES=LOCAL_CACHES, STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class ImageDerivativeTests(CacheTestCase):
+
+    def test_sizes_and_formats(self):
+        name = default_storage.save("photos/photo.png", image_file(800, 400, "RGBA"))
+
+        variants = build_derivatives(name)
+
+        self.assertEqual(variants["webp"], {"320": "photos/photo__w320.webp", "640": "photos/photo__w640.webp"})
+        with default_storage.open(variants["jpeg"]["640"]) as derivative:
+            image = Image.open(derivative)
+            self.assertEqual((image.format, image.size, image.mode), ("JPEG", (640, 320), "RGB"))
+
+        delete_derivatives(variants)
+        self.assertFalse(default_storage.exists(variants["webp"]["320"]))
+
+    def test_small_images_are_not_upscaled(self):
+        name = default_storage.save("photos/small.png", image_file(100, 50))
+
+        self.assertEqual(build_derivatives(name)["webp"], {"100": "photos/small__w100.webp"})
+
+    def test_task_stores_the_variants(self):
+        product = Product.objects.create(
+            title="Gold ring", description="", price=Decimal("10.00"), product_image=image_file(700, 700)
+        )
+
+        generate_image_derivatives("store.product", str(product.pk))
+
+        product.refresh_from_db()
+        self.assertEqual(sorted(product.image_variants["jpeg"]), ["320", "640"])
+        response = self.client.get(f"/api/v1/store/product/{product.pk}/")
+        self.assertTrue(response.json()["product"]["product_image_variants"]["webp"]["640"].endswith("__w640.webp"))
@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path("products/all/", views.get_products),
     path("products/admin_all/", views.get_all_products),
+    path("products/search/", views.search_products),
+    path("products/facets/", views.get_product_facets),
     path("product/<str:uuid>/", views.get_product_via_id),
     path("category/", views.get_categories),
     path("category/create/", views.create_category),
@@ -11,4 +13,6 @@ urlpatterns = [
     path('products/create/', views.create_product, name='create-product'),
     path('products/<uuid:product_id>/edit/', views.edit_product, name='edit-product'),
     path("products/delete/", views.delete_product),
+    path("products/import/", views.import_products),
+    path("products/export/", views.export_products),
 ]
\ No newline at end of file
@@ -1,16 +1,36 @@
 from django.shortcuts import render
+from django.http import StreamingHttpResponse
+import codecs
 from rest_framework.decorators import api_view, permission_classes, parser_classes, authentication_classes
 from .models import Product, Category
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import ProductSerializer, CategorySerializer, ProductImages
+from .serializers import ProductImages
+from .fragments import serialize_products
+from .cached import (
+    build_products_page, build_admin_products, build_categories, build_category_products,
+    get_fallback_products, get_category_names, products_page_cache_key, admin_products_cache_key, category_products_cache_key, CATEGORY_PRODUCTS_TTL
+)
+from .representation import ProductRepresentation
+from .invalidation import CATALOG_NAMESPACE, CATEGORIES_NAMESPACE, PRODUCT_FRAGMENTS_NAMESPACE
+from .search import find_products
+from .facets import filter_products, FLAG_FIELDS
+from .related import get_related_product_ids, RELATED_PRODUCTS_COUNT, RELATED_PRODUCTS_NAMESPACE
+from .bulk import import_products as run_import, export_products as stream_export, iter_rows, detect_format
 from uuid import UUID
 from admin_panel.permissions import IsStaffUser
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import throttle_classes
 from django.views.decorators.cache import cache_page
-from utils.cache.cache import set_cached_data, get_cached_data
-from utils.cache.category_cache_key import category_cache_key
+from utils.cache.rendered import get_or_set_response
+from utils.cache.conditional import versioned_condition
+from utils.cache.surrogate import tag_response, product_surrogate_key
+from utils.cache.cache import is_cached_missing, cache_missing
+from utils.cache.category_cache_key import category_cache_namespace
+from utils.images.derivatives import delete_derivatives
+from handlers.tasks.imageDerivatives import schedule_image_derivatives
+from handlers.tasks.cacheRefresh import background_refresh
+from utils.pagination.keyset import get_page_size, decode_cursor, InvalidCursor
 
 # Create your views here.
 
@@ -18,37 +38,33 @@ from utils.cache.category_cache_key import category_cache_key
 @permission_classes([])
 @authentication_classes([])
 @throttle_classes([])
+@versioned_condition(CATALOG_NAMESPACE)
 def get_products(request):
     try:
-        cache_key = "all_public_products"
-        cached_data = get_cached_data(cache_key)
-
-        if cached_data:
-            print("✅ Cache hit: public products")
-            return Response({
-                "status": "success",
-                "message": "ok (from cache)",
-                "product": cached_data
-            }, status=status.HTTP_200_OK)
-
-        # Fetch from DB if not cached
-        products = (
-            Product.objects.filter(not_available=False)
-            .select_related("category")
-            .prefetch_related("images")
-            .order_by("-created_at")
+        page_size = get_page_size(request.query_params.get("limit"))
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            decode_cursor(cursor)
+
+        representation = ProductRepresentation.from_request(request)
+
+        # Each page is cached on its own for a month, rebuilt by one request at a time
+        response = get_or_set_response(
+            request,
+            CATALOG_NAMESPACE,
+            products_page_cache_key(page_size, cursor, representation),
+            lambda: build_products_page(cursor, page_size, representation),
+            refresh=background_refresh(
+                "products_page", cursor, page_size, representation.view, representation.fields
+            )
         )
-        serializer = ProductSerializer(products, many=True)
-
-        # Cache result for a month
-        set_cached_data(cache_key, serializer.data)
-        print(" Cached public products for 30 days")
+        return tag_response(response, CATALOG_NAMESPACE)
 
+    except InvalidCursor as e:
         return Response({
-            "status": "success",
-            "message": "ok",
-            "product": serializer.data
-        }, status=status.HTTP_200_OK)
+            "status": "error",
+            "message": str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
 
     except Exception as e:
         return Response({
@@ -62,32 +78,18 @@ def get_products(request):
 @api_view(["GET"])
 @permission_classes([IsStaffUser])
 @throttle_classes([])
+@versioned_condition(CATALOG_NAMESPACE)
 def get_all_products(request):
     try:
-        cache_key = "all_admin_products"
-        cached_data = get_cached_data(cache_key)
-
-        if cached_data:
-            return Response({
-                "status": "success",
-                "message": "ok (from cache)",
-                "product": cached_data
-            }, status=status.HTTP_200_OK)
-
-        products = (
-            Product.objects.select_related("category")
-            .prefetch_related("images")
-            .order_by("-created_at")
+        representation = ProductRepresentation.from_request(request)
+
+        return get_or_set_response(
+            request,
+            CATALOG_NAMESPACE,
+            admin_products_cache_key(representation),
+            lambda: build_admin_products(representation),
+            refresh=background_refresh("admin_products", representation.view, representation.fields)
         )
-        serializer = ProductSerializer(products, many=True)
-
-        set_cached_data(cache_key, serializer.data)
-
-        return Response({
-            "status": "success",
-            "message": "ok",
-            "product": serializer.data
-        }, status=status.HTTP_200_OK)
 
     except Exception as e:
         return Response({
@@ -96,18 +98,58 @@ def get_all_products(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def get_fallback_products(category_name=None):
-    if category_name:
-        products = Product.objects.filter(category__name__iexact=category_name)[:3]
+def lookup_product(request, product_id):
+    """
+        The product of a detail request, or None. Fetched once per request, for the ETag and
+        the response alike. Unknown ids are remembered for a few minutes, until the catalog changes.
+    """
+
+    looked_up = getattr(request, "_product_lookup", None)
+    if looked_up is not None and looked_up[0] == product_id:
+        return looked_up[1]
+
+    missing_key = f"product_{product_id}"
+    product = None
+    if not is_cached_missing(CATALOG_NAMESPACE, missing_key):
+        product = Product.objects.filter(id=product_id).select_related("category").first()
+        if product is None:
+            cache_missing(CATALOG_NAMESPACE, missing_key)
+
+    request._product_lookup = (product_id, product)
+    return product
+
+
+def product_namespaces(request, uuid):
+    """
+        Namespaces the product detail response is built from: the product, its category,
+        the fragments and the related products. A 404 is built from the fallback products.
+    """
+
+    namespaces = [CATALOG_NAMESPACE, PRODUCT_FRAGMENTS_NAMESPACE]
+    try:
+        product_id = UUID(uuid)
+    except ValueError:
+        product_id = None
+
+    product = lookup_product(request, product_id) if product_id else None
+
+    if product is not None:
+        namespaces += [product_surrogate_key(product_id), RELATED_PRODUCTS_NAMESPACE]
+        category_name = product.category.name if product.category_id else None
     else:
-        products = Product.objects.filter(is_new=True)[:3]
-    return ProductSerializer(products, many=True).data
+        category_name = request.query_params.get("category")
+        if category_name and category_name.lower() not in get_category_names():
+            category_name = None
 
+    if category_name:
+        namespaces.append(category_cache_namespace(category_name))
+    return namespaces
 
 
 @api_view(["GET"])
 @authentication_classes([])
 @throttle_classes([])
+@versioned_condition(product_namespaces)
 def get_product_via_id(request, uuid):
     try:
 
@@ -124,9 +166,8 @@ def get_product_via_id(request, uuid):
             }, status=404)
 
 
-        try:
-            product = Product.objects.get(id=uuid)
-        except Product.DoesNotExist:
+        product = lookup_product(request, uuid_obj)
+        if product is None:
             fallback_data = get_fallback_products(request.query_params.get("category"))
 
             return Response({
@@ -135,16 +176,121 @@ def get_product_via_id(request, uuid):
                 "fallback": fallback_data
             }, status=status.HTTP_404_NOT_FOUND)
 
-        product_serializer = ProductSerializer(product)
+        related_ids = get_related_product_ids(product.id)
+        if related_ids is not None:
+            related = Product.objects.filter(id__in=related_ids, not_available=False).only("id", "updated_at").in_bulk()
+            related_products = [related[UUID(pk)] for pk in related_ids if UUID(pk) in related]
+        else:
+            # Not covered by the batch job yet, fall back to the newest products of the category
+            related_products = (
+                Product.objects.filter(category=product.category, not_available=False)
+                .exclude(id=product.id)
+                .only("id", "updated_at")
+                .order_by("-created_at")[:RELATED_PRODUCTS_COUNT]
+            )
+
+        response = Response({
+            "status": "success",
+            "message": "ok",
+            "product": serialize_products([product])[0],
+            "related": serialize_products(related_products)
+        }, status=status.HTTP_200_OK)
+
+        # Purged when the product, one of its related products, or its category changes
+        return tag_response(
+            response,
+            product_surrogate_key(product.id),
+            *[product_surrogate_key(related.id) for related in related_products],
+            category_cache_namespace(product.category.name) if product.category_id else None,
+            PRODUCT_FRAGMENTS_NAMESPACE,
+            RELATED_PRODUCTS_NAMESPACE,
+        )
+
+    except Exception as e:
+        return Response({
+            "status": "error",
+            "message": str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+
+
+@api_view(["GET"])
+@permission_classes([])
+@authentication_classes([])
+def search_products(request):
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return Response({
+            "status": "error",
+            "message": "Search query wasn't passed. Please check and try again."
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page_size = get_page_size(request.query_params.get("limit"))
+        try:
+            page = max(int(request.query_params.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+
+        representation = ProductRepresentation.from_request(request)
+        product_ids, total = find_products(query, offset=(page - 1) * page_size, limit=page_size)
+        products = Product.objects.only("id", "updated_at").in_bulk(product_ids)
+
+        return Response({
+            "status": "success",
+            "message": "ok",
+            "product": representation.apply(
+                serialize_products((products[pk] for pk in product_ids if pk in products), representation.view)
+            ),
+            "total": total,
+            "page": page,
+            "limit": page_size,
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({
+            "status": "error",
+            "message": str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 
-        related_products = Product.objects.filter(category=product.category).exclude(id=product.id)[:6]
-        related_serializer = ProductSerializer(related_products, many=True)
+
+@api_view(["GET"])
+@permission_classes([])
+@authentication_classes([])
+@throttle_classes([])
+def get_product_facets(request):
+    try:
+        params = request.query_params
+
+        filters = {
+            "flag": [flag for flag in FLAG_FIELDS if params.get(flag, "").lower() in ("1", "true")],
+        }
+        for facet in ("color", "size", "category", "price"):
+            filters[facet] = [value.strip().lower() for value in params.get(facet, "").split(",") if value.strip()]
+
+        page_size = get_page_size(params.get("limit"))
+        try:
+            page = max(int(params.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+
+        representation = ProductRepresentation.from_request(request)
+        product_ids, total, counts = filter_products(filters, offset=(page - 1) * page_size, limit=page_size)
+        products = Product.objects.only("id", "updated_at").in_bulk(product_ids, field_name="id")
 
         return Response({
             "status": "success",
             "message": "ok",
-            "product": product_serializer.data,
-            "related": related_serializer.data
+            "product": representation.apply(
+                serialize_products((products[UUID(pk)] for pk in product_ids if UUID(pk) in products), representation.view)
+            ),
+            "facets": counts,
+            "total": total,
+            "page": page,
+            "limit": page_size,
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -188,7 +334,8 @@ def create_category(request):
                 )
             
 
-        Category.objects.create(name=name, description=description, image=image_file)
+        category = Category.objects.create(name=name, description=description, image=image_file)
+        schedule_image_derivatives(category)
         
         return Response({
             "status":"success",
@@ -208,29 +355,17 @@ def create_category(request):
 @permission_classes([])
 @authentication_classes([])
 @throttle_classes([])
+@versioned_condition(CATEGORIES_NAMESPACE)
 def get_categories(request):
     try:
-        cache_key = "all_categories"
-        cached_data = get_cached_data(cache_key)
-
-        if cached_data:
-            return Response({
-                "status": "success",
-                "message": "ok (from cache)",
-                "category": cached_data,
-            }, status=status.HTTP_200_OK)
-
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
-
-        set_cached_data(cache_key, serializer.data)
-        print(" Cached categories for 30 days")
-
-        return Response({
-            "status": "success",
-            "message": "ok",
-            "category": serializer.data,
-        }, status=status.HTTP_200_OK)
+        response = get_or_set_response(
+            request,
+            CATEGORIES_NAMESPACE,
+            "all_categories",
+            build_categories,
+            refresh=background_refresh("categories")
+        )
+        return tag_response(response, CATEGORIES_NAMESPACE)
 
     except Exception as e:
         return Response({
@@ -239,10 +374,26 @@ def get_categories(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def category_namespace(name):
+    """
+        Namespace of an existing category, None for names that aren't one.
+    """
+
+    if not name or name.lower() not in get_category_names():
+        return None
+    return category_cache_namespace(name)
+
+
+def category_namespaces(request):
+    namespace = category_namespace(request.query_params.get("category_name", ""))
+    return [namespace, PRODUCT_FRAGMENTS_NAMESPACE] if namespace else None
+
+
 @api_view(["GET"])
 @permission_classes([])
 @authentication_classes([])
 @throttle_classes([])
+@versioned_condition(category_namespaces)
 def get_product_via_category(request):
     query = request.query_params.get("category_name")
     if not query:
@@ -251,34 +402,33 @@ def get_product_via_category(request):
             "message": "Category name wasn't passed. Please check and try again."
         }, status=status.HTTP_400_BAD_REQUEST)
 
-    cache_key = category_cache_key(query)
-    cached_data = get_cached_data(cache_key)
-    if cached_data:
-        return Response({
-            "status": "success",
-            "message": "ok (from cache)",
-            "product": cached_data,
-        }, status=status.HTTP_200_OK)
+    representation = ProductRepresentation.from_request(request)
+    namespace = category_namespace(query)
 
     try:
-        category = Category.objects.filter(name__iexact=query).first()  # case-insensitive match
-        if not category:
+        # Checked against the cached category names, so unknown names leave nothing in the cache
+        if namespace is None:
             return Response({
                 "status": "error",
                 "message": f"Category '{query}' not found."
             }, status=status.HTTP_404_NOT_FOUND)
 
-        products = Product.objects.filter(category=category).select_related("category").prefetch_related("images").order_by("-created_at")
-        serializer = ProductSerializer(products, many=True)
-
         # Cache for 30 days
-        set_cached_data(cache_key, serializer.data, timeout=60 * 60 * 24 * 30)
+        response = get_or_set_response(
+            request,
+            namespace,
+            category_products_cache_key(query, representation),
+            lambda: build_category_products(query, representation),
+            timeout=CATEGORY_PRODUCTS_TTL,
+            refresh=background_refresh("category_products", query, representation.view, representation.fields)
+        )
+        if response is None:
+            return Response({
+                "status": "error",
+                "message": f"Category '{query}' not found."
+            }, status=status.HTTP_404_NOT_FOUND)
 
-        return Response({
-            "status": "success",
-            "message": "ok",
-            "product": serializer.data,
-        }, status=status.HTTP_200_OK)
+        return tag_response(response, namespace, PRODUCT_FRAGMENTS_NAMESPACE)
 
     except Exception as e:
         return Response({
@@ -321,9 +471,12 @@ def create_product(request):
             is_featured=request.data.get('is_featured', False),
         )
 
+        if product.product_image:
+            schedule_image_derivatives(product)
+
         images = request.FILES.getlist('images')
         for img in images:
-            ProductImages.objects.create(product=product, image=img)
+            schedule_image_derivatives(ProductImages.objects.create(product=product, image=img))
 
         return Response({
             "status":"success",
@@ -378,18 +531,28 @@ def edit_product(request, product_id):
         product.is_trending = request.data.get('is_trending', product.is_trending)
         product.is_featured = request.data.get('is_featured', product.is_featured)
 
-        if request.FILES.get('product_image'):
+        new_product_image = request.FILES.get('product_image')
+        if new_product_image:
             if product.product_image:
                 product.product_image.delete()
-                
-            product.product_image = request.FILES.get('product_image')
+            delete_derivatives(product.image_variants)
+
+            product.product_image = new_product_image
+            product.image_variants = {}
 
         product.save()
 
+        if new_product_image:
+            schedule_image_derivatives(product)
+
         if 'images' in request.FILES:
-            ProductImages.objects.filter(product=product).delete()
+            old_images = ProductImages.objects.filter(product=product)
+            for old_image in old_images:
+                delete_derivatives(old_image.image_variants)
+            old_images.delete()
+
             for img in request.FILES.getlist('images'):
-                ProductImages.objects.create(product=product, image=img)
+                schedule_image_derivatives(ProductImages.objects.create(product=product, image=img))
 
         return Response({
             "status":"success",
@@ -440,4 +603,55 @@ def delete_product(request):
         return Response({
             "status":"error",
             "message": f"{e}"
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)    
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+
+@api_view(['POST'])
+@permission_classes([IsStaffUser])
+@parser_classes([MultiPartParser, FormParser])
+def import_products(request):
+    upload = request.FILES.get('file')
+
+    try:
+        if not upload:
+            return Response({
+                "status":"error",
+                "message":"A CSV or JSONL file is required"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        fmt = request.data.get('format') or detect_format(upload.name)
+        create_categories = str(request.data.get('create_categories', '')).lower() in ("1", "true")
+
+        summary = run_import(
+            iter_rows(codecs.iterdecode(upload, "utf-8-sig"), fmt),
+            create_categories=create_categories
+        )
+
+        return Response({
+            "status":"success",
+            "message": "Import finished.",
+            **summary
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({
+            "status":"error",
+            "message": f"{e}"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffUser])
+@throttle_classes([])
+def export_products(request):
+    # ?format= is reserved by DRF content negotiation
+    fmt = "jsonl" if request.query_params.get("type") == "jsonl" else "csv"
+
+    response = StreamingHttpResponse(
+        stream_export(fmt),
+        content_type="application/x-ndjson" if fmt == "jsonl" else "text/csv"
+    )
+    response["Content-Disposition"] = f'attachment; filename="products.{fmt}"'
+    return response
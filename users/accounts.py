@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import UserAccount
+from utils.cache.cache import get_cached_data, set_cached_data, delete_cache_key
+from utils.cache.user_account_cache_key import user_account_cache_key
+
+USER_ACCOUNT_CACHE_TTL = getattr(settings, "USER_ACCOUNT_CACHE_TTL", 60 * 15)
+
+_MISSING = object()
+
+# What authentication and the views read from request.user. The password hash, last_login
+# and date_joined are left out, they are loaded from the database if something asks for them.
+USER_CACHED_FIELDS = ["id", "username", "first_name", "last_name", "email", "is_active", "is_staff", "is_superuser"]
+
+
+def _from_db(model, values):
+    # from_db() takes the loaded values in the model's field order
+    fields = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db("default", fields, [values[field] for field in fields])
+
+
+def _cache_entry(user, account):
+    return {
+        "user": {field: getattr(user, field) for field in USER_CACHED_FIELDS},
+        # What revoked tokens are checked against, rather than the hash itself
+        "password": get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None,
+        "account": {field.attname: getattr(account, field.attname) for field in account._meta.concrete_fields} if account else None,
+    }
+
+
+def _from_cache_entry(entry):
+    # Built like rows loaded with only(): saving them writes only the loaded fields
+    user = _from_db(User, entry["user"])
+    user.password_md5 = entry["password"]
+
+    account = None
+    if entry["account"] is not None:
+        account = _from_db(UserAccount, entry["account"])
+        UserAccount.user.field.set_cached_value(account, user)
+    return user, account
+
+
+def get_user_and_account(user_id):
+    """
+        (User, UserAccount) for a user id, cached. The account is None for users without one,
+        the user is None for ids that do not exist. Costs one query on a miss.
+        Only the fields authentication and the views need are cached, see USER_CACHED_FIELDS;
+        user.password_md5 holds what simplejwt compares revoked tokens with.
+    """
+
+    key = user_account_cache_key(user_id)
+    cached = get_cached_data(key)
+    if isinstance(cached, dict):
+        return _from_cache_entry(cached)
+
+    account = UserAccount.objects.select_related("user").filter(user_id=user_id).order_by("id").first()
+    if account is not None:
+        user = account.user
+    else:
+        user = User.objects.filter(id=user_id).first()
+        if user is None:
+            return None, None
+
+    entry = _cache_entry(user, account)
+    set_cached_data(key, entry, USER_ACCOUNT_CACHE_TTL)
+    return _from_cache_entry(entry)
+
+
+def get_user_account(request):
+    """
+        UserAccount of the authenticated user, resolved once per request.
+        Raises UserAccount.DoesNotExist like UserAccount.objects.get() would.
+    """
+
+    user = request.user
+    account = getattr(request, "user_account", _MISSING)
+    if account is _MISSING:
+        # Authenticated some other way than CookieJWTAuthentication, e.g. a session
+        account = get_user_and_account(user.id)[1] if user.is_authenticated else None
+        request.user_account = account
+
+    if account is None:
+        raise UserAccount.DoesNotExist("User account not found.")
+    return account
+
+
+def invalidate_user_account(user_id):
+    if user_id is not None:
+        delete_cache_key(user_account_cache_key(user_id))
@@ -1,12 +1,47 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .accounts import get_user_and_account
 
 class CookieJWTAuthentication(JWTAuthentication):
+    """
+        JWT from the Authorization header or the "at" cookie. The user and their UserAccount are
+        resolved together from cache, and the account is attached to the request as request.user_account.
+    """
+
     def authenticate(self, request):
         header = self.get_header(request)
         if header is None:
             raw_token = request.COOKIES.get("at")
-            if raw_token is None:
-                return None
-            validated_token = self.get_validated_token(raw_token)
-            return self.get_user(validated_token), validated_token
-        return super().authenticate(request)
\ No newline at end of file
+        else:
+            raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        user, account = self.get_user_and_account(validated_token)
+        request.user_account = account
+        return user, validated_token
+
+    def get_user(self, validated_token):
+        return self.get_user_and_account(validated_token)[0]
+
+    def get_user_and_account(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user, account = get_user_and_account(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user.password_md5:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user, account
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import UserAccount
+from .accounts import invalidate_user_account
+
+
+@receiver([post_save, post_delete], sender=User)
+def clear_user_cache(sender, instance, **kwargs):
+    """
+        Drop the cached user/account pair used by authentication when the user changes.
+    """
+
+    invalidate_user_account(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserAccount)
+def clear_user_account_cache(sender, instance, **kwargs):
+    """
+        Drop the cached user/account pair when the account changes.
+    """
+
+    invalidate_user_account(instance.user_id)
@@ -1,3 +1,89 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .accounts import get_user_and_account
+from .models import UserAccount
+from utils.cache.user_account_cache_key import user_account_cache_key
+
+LOCAL_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 # Create your tests here.
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CachedUserTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="secret", first_name="Ama")
+        self.account = UserAccount.objects.create(user=self.user, city="Accra")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_cache_holds_no_password_hash(self):
+        get_user_and_account(self.user.id)
+
+        entry = cache.get(user_account_cache_key(self.user.id))
+        self.assertNotIn(self.user.password, repr(entry))
+        self.assertNotIn("password", repr(entry["user"]))
+
+    def test_cached_user_and_account(self):
+        get_user_and_account(self.user.id)
+
+        with self.assertNumQueries(0):
+            user, account = get_user_and_account(self.user.id)
+            self.assertEqual((user.id, user.email, user.is_active, user.is_staff), (self.user.id, "buyer@example.com", True, False))
+            self.assertEqual((account.id, account.city), (self.account.id, "Accra"))
+            self.assertIs(account.user, user)
+
+        self.assertEqual(get_user_and_account(0), (None, None))
+
+    def test_authenticated_requests_use_the_cache(self):
+        self.assertEqual(self.client.get("/api/v1/user/me/").status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/user/me/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["user"]["first_name"], "Ama")
+        self.assertFalse([query for query in queries if "auth_user" in query["sql"]])
+
+    def test_saving_a_cached_user_keeps_the_password(self):
+        get_user_and_account(self.user.id)
+        user, _ = get_user_and_account(self.user.id)
+
+        user.first_name = "Esi"
+        user.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "Esi")
+        self.assertTrue(self.user.check_password("secret"))
+
+    def test_change_password_through_a_cached_user(self):
+        self.client.get("/api/v1/user/me/")
+
+        response = self.client.post("/api/v1/user/me/change_password/", {
+            "currentPassword": "secret",
+            "newPassword": "n3w-secret",
+            "confirmPassword": "n3w-secret",
+        }, format="json")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("n3w-secret"))
+
+    def test_revoked_tokens_are_checked_without_the_hash(self):
+        with mock.patch.object(api_settings, "CHECK_REVOKE_TOKEN", True, create=True):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+            self.assertEqual(client.get("/api/v1/user/me/").status_code, 200)
+            self.assertEqual(client.get("/api/v1/user/me/").status_code, 200)
+
+            self.user.set_password("changed")
+            self.user.save()
+            self.assertEqual(client.get("/api/v1/user/me/").status_code, 403)
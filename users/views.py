@@ -10,6 +10,7 @@ from rest_framework import status
 from django.contrib import auth
 from .models import UserAccount, Cart, Wishlist, UserFeedback
 from .serializers import UserAccountSerializer, CartSerializer, WishlistSerializer, UserFeedbackSerializer
+from .accounts import get_user_account
 from store.models import Product
 from django.db import transaction
 from admin_panel.permissions import IsStaffUser
@@ -177,7 +178,7 @@ def get_user(request):
     try:
         user = request.user
 
-        user_account = UserAccount.objects.get(user=user)
+        user_account = get_user_account(request)
 
         account_serializer = UserAccountSerializer(user_account)
 
@@ -236,7 +237,7 @@ def save_cart(request):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            user = UserAccount.objects.get(user=request.user)
+            user = get_user_account(request)
         except UserAccount.DoesNotExist:
             return Response({
                 "status": "error",
@@ -279,7 +280,7 @@ def get_user_cart(request):
     try:
 
         try:
-            user = UserAccount.objects.get(user=request.user)
+            user = get_user_account(request)
         except UserAccount.DoesNotExist:
             return Response({
                 "status": "error",
@@ -311,7 +312,7 @@ def delete_cart(request, uuid):
     try:
 
         try:
-            user = UserAccount.objects.get(user=request.user)
+            user = get_user_account(request)
         except UserAccount.DoesNotExist:
             return Response({
                 "status": "error",
@@ -354,7 +355,7 @@ def save_wishlist(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        user = UserAccount.objects.get(user=request.user)
+        user = get_user_account(request)
     except UserAccount.DoesNotExist:
         return Response({
             "status": "error",
@@ -384,7 +385,7 @@ def get_user_wishlist(request):
     try:
 
         try:
-            user = UserAccount.objects.get(user=request.user)
+            user = get_user_account(request)
         except UserAccount.DoesNotExist:
             return Response({
                 "status": "error",
@@ -418,7 +419,7 @@ def delete_wishlist(request, id):
 
     try:
 
-        user = UserAccount.objects.get(user=request.user)
+        user = get_user_account(request)
 
         try:
             product = Product.objects.get(id=id)
@@ -721,7 +722,7 @@ def make_user_staff(request):
 def delete_user_account(request):
     try:
         try:
-            user = UserAccount.objects.get(user=request.user)
+            user = get_user_account(request)
         except UserAccount.DoesNotExist:   
             return Response({
                 "status":"error",
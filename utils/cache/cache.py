@@ -1,5 +1,11 @@
 from django.core.cache import cache
 from django.conf import settings
+import math
+import random
+import time
+from .near import near_cache, ensure_listener, publish_invalidation, estimate_size
+from .stats import record, elapsed_us
+from .codec import encode, decode
 
 CACHE_TTL = getattr(settings, "CACHE_TTL", 60 * 60 * 24 * 30) 
 
@@ -9,15 +15,25 @@ def get_cached_data(key):
         Returns None if not found.
     """
 
-    return cache.get(key)
+    started = time.monotonic()
+    data = decode(cache.get(key))
+    record(key, lookups=1, lookup_us=elapsed_us(started), **({"hits": 1} if data is not None else {"misses": 1}))
+    return data
 
 
 def set_cached_data(key, data, timeout=CACHE_TTL):
     """
         Store data in cache for a specific duration (in seconds).
+        Large values are stored compressed, see utils.cache.codec.
     """
 
-    cache.set(key, data, timeout)
+    stored = encode(data)
+    cache.set(key, stored, timeout)
+    record(key, sets=1, bytes_set=_stored_size(stored))
+
+
+def _stored_size(stored):
+    return len(stored) if isinstance(stored, bytes) else estimate_size(stored)
 
 
 def delete_cache_key(key):
@@ -26,16 +42,351 @@ def delete_cache_key(key):
     """
 
     cache.delete(key)
+    record(key, deletes=1)
+
+
+CACHE_LOCK_TIMEOUT = getattr(settings, "CACHE_LOCK_TIMEOUT", 30)
+CACHE_LOCK_WAIT = getattr(settings, "CACHE_LOCK_WAIT", 5)
+CACHE_EARLY_EXPIRY_BETA = getattr(settings, "CACHE_EARLY_EXPIRY_BETA", 1.0)
+# After this many seconds a cached value is served stale while it is refreshed in the background
+CACHE_SOFT_TTL = getattr(settings, "CACHE_SOFT_TTL", 60 * 10)
+
+
+def _lock_key(key):
+    return f"lock:{key}"
+
+
+def _stale_key(key):
+    return f"stale:{key}"
+
+
+def _refresh_key(key):
+    return f"refreshing:{key}"
+
+
+def _is_entry(entry):
+    return isinstance(entry, dict) and "value" in entry and "delta" in entry
+
+
+def _expires_early(entry, beta):
+    """
+        Probabilistic early expiration (XFetch): the closer a key gets to its expiry,
+        and the longer it took to build, the likelier one caller refreshes it ahead of time.
+    """
+
+    if entry["expires"] is None or beta <= 0:
+        return False
+    return time.time() - entry["delta"] * beta * math.log(1.0 - random.random()) >= entry["expires"]
 
 
-def get_or_set_cache(key, fetch_function, timeout):
+def _soft_expired(entry):
+    soft_expires = entry.get("soft_expires")
+    return soft_expires is not None and time.time() >= soft_expires
+
+
+def get_or_set_cache(
+    key, fetch_function, timeout=CACHE_TTL, stale_key=None, beta=CACHE_EARLY_EXPIRY_BETA,
+    near=False, soft_ttl=None, refresh=None
+):
     """
-        Common pattern: returns cached data if exists,
-        else runs fetch_function(), caches the result, and returns it.
+        Returns cached data if it exists, else runs fetch_function(), caches the result and returns it.
+        Only one caller rebuilds a missing key at a time (a short lock taken with cache.add);
+        the others get the stale copy under stale_key, or wait for the rebuilt value.
+        A fetch_function returning None is not cached.
+
+        With near=True the value is also kept in the in-process near cache. Only use it for keys
+        that change through a namespace version, the near cache is not told about plain sets.
+
+        soft_ttl enables stale-while-revalidate: once a value is older than soft_ttl, callers keep
+        getting it and refresh() is called once to rebuild it in the background (see refresh_cache).
+        refresh() returns False when it could not schedule anything, the value is then rebuilt in line.
     """
-    
-    data = get_cached_data(key)
-    if not data:
-        data = fetch_function()
-        set_cached_data(key, data, timeout)
+
+    near = near and ensure_listener()
+    if near:
+        data = near_cache.get(key)
+        if data is not None:
+            record(key, near_hits=1)
+            return data
+
+    started = time.monotonic()
+    entry = cache.get(key)
+    if _is_entry(entry):
+        entry["value"] = decode(entry["value"])
+    record(key, lookups=1, lookup_us=elapsed_us(started))
+    if _is_entry(entry):
+        if _soft_expired(entry):
+            if refresh is not None and _schedule_refresh(key, refresh):
+                record(key, stale_hits=1)
+                return entry["value"]
+        elif not _expires_early(entry, beta):
+            record(key, hits=1)
+            if near:
+                near_cache.set(key, entry["value"])
+            return entry["value"]
+
+    lock_key = _lock_key(key)
+    if cache.add(lock_key, 1, CACHE_LOCK_TIMEOUT):
+        try:
+            return _rebuild(key, fetch_function, timeout, stale_key, near, soft_ttl)
+        finally:
+            cache.delete(lock_key)
+
+    # Somebody else is rebuilding this key
+    if _is_entry(entry):
+        record(key, hits=1)
+        return entry["value"]
+
+    if stale_key:
+        stale = decode(cache.get(stale_key))
+        if stale is not None:
+            record(key, stale_hits=1)
+            return stale
+
+    deadline = time.monotonic() + CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if _is_entry(entry):
+            record(key, hits=1)
+            return decode(entry["value"])
+        if cache.get(lock_key) is None:
+            break
+
+    # The rebuild failed or is taking too long, do it ourselves
+    return _rebuild(key, fetch_function, timeout, stale_key, near, soft_ttl)
+
+
+def _schedule_refresh(key, refresh):
+    """
+        Ask for a background refresh of a key, once until that refresh is done.
+    """
+
+    if not cache.add(_refresh_key(key), 1, CACHE_LOCK_TIMEOUT):
+        return True
+    if refresh() is False:
+        cache.delete(_refresh_key(key))
+        return False
+    return True
+
+
+def refresh_cache(key, fetch_function, timeout=CACHE_TTL, stale_key=None, near=False, soft_ttl=None):
+    """
+        Rebuild a key whatever its state, from a background task. Skipped when somebody else
+        is already rebuilding it.
+    """
+
+    lock_key = _lock_key(key)
+    if not cache.add(lock_key, 1, CACHE_LOCK_TIMEOUT):
+        return None
+
+    try:
+        return _rebuild(key, fetch_function, timeout, stale_key, near and ensure_listener(), soft_ttl)
+    finally:
+        cache.delete_many([lock_key, _refresh_key(key)])
+
+
+def _rebuild(key, fetch_function, timeout, stale_key, near, soft_ttl=None):
+    started = time.monotonic()
+    data = fetch_function()
+    delta = time.monotonic() - started
+    record(key, misses=1, builds=1, build_us=delta * 1_000_000)
+    if data is None:
+        return None
+
+    now = time.time()
+    expires = now + timeout if timeout is not None else None
+    soft_expires = now + soft_ttl if soft_ttl is not None else None
+    stored = encode(data)
+    cache.set(key, {"value": stored, "delta": delta, "expires": expires, "soft_expires": soft_expires}, timeout)
+    if stale_key:
+        cache.set(stale_key, stored, timeout)
+    if near:
+        near_cache.set(key, data)
+    record(key, sets=1, bytes_set=_stored_size(stored))
     return data
+
+
+# Cache namespaces
+#
+# A namespace is a family of keys that is invalidated as a whole, e.g. "catalog",
+# "category:rings" or "user-orders:42". Every key in it embeds the namespace's
+# current version, so invalidating it is one atomic incr however many derived
+# keys exist. Old generations are never read again and simply expire.
+#
+# Version counters expire too, after CACHE_VERSION_TTL, so namespaces of deleted
+# objects don't stay in Redis forever. A counter that expired is seeded again
+# from the clock and moves past every generation it handed out.
+
+CACHE_VERSION_TTL = getattr(settings, "CACHE_VERSION_TTL", CACHE_TTL)
+
+def _version_key(namespace):
+    return f"cache_version_{namespace}"
+
+
+def _modified_key(namespace):
+    return f"cache_modified_{namespace}"
+
+
+def get_namespace_versions(namespaces):
+    """
+        Current versions of several namespaces in one round trip: {namespace: version}.
+        Counters are created on first use, so only pass namespaces of objects that exist.
+    """
+
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    use_near = ensure_listener()
+    found = near_cache.get_many(keys) if use_near else {}
+    missing = [key for key in keys if key not in found]
+    if missing:
+        from_redis = cache.get_many(missing)
+        if use_near:
+            for version_key, version in from_redis.items():
+                near_cache.set(version_key, version)
+        found.update(from_redis)
+
+    versions = {}
+    for version_key, namespace in keys.items():
+        version = found.get(version_key)
+        if version is None:
+            # Seed from the clock so a lost counter never reuses an old generation.
+            cache.add(version_key, int(time.time()), CACHE_VERSION_TTL)
+            version = cache.get(version_key, int(time.time()))
+        versions[namespace] = version
+    return versions
+
+
+def get_namespace_version(namespace):
+    return get_namespace_versions([namespace])[namespace]
+
+
+def namespace_prefix(*namespaces):
+    """
+        Key prefix carrying the versions of every namespace a value depends on.
+        Bumping any one of them moves the prefix, and with it every key built on it.
+    """
+
+    versions = get_namespace_versions(namespaces)
+    return "".join(f"{namespace}@{versions[namespace]}:" for namespace in namespaces)
+
+
+def namespaced_key(namespace, key):
+    return namespace_prefix(namespace) + key
+
+
+def get_or_set_namespaced(namespace, key, fetch_function, timeout=CACHE_TTL, refresh=None):
+    """
+        get_or_set_cache() for a namespaced key. The last value built for the key, whatever
+        its generation, is kept as the stale copy served while the new generation is rebuilt.
+        Versioned keys only change in place through a soft-expiry refresh, so hits are served
+        from the near cache. Values older than CACHE_SOFT_TTL are refreshed in the background
+        when refresh is given, by the next caller otherwise.
+    """
+
+    return get_or_set_cache(
+        namespaced_key(namespace, key),
+        fetch_function,
+        timeout,
+        stale_key=_stale_key(f"{namespace}:{key}"),
+        near=True,
+        soft_ttl=CACHE_SOFT_TTL,
+        refresh=refresh
+    )
+
+
+def refresh_namespaced(namespace, key, fetch_function, timeout=CACHE_TTL):
+    """
+        Background counterpart of get_or_set_namespaced(), see refresh_cache().
+    """
+
+    return refresh_cache(
+        namespaced_key(namespace, key),
+        fetch_function,
+        timeout,
+        stale_key=_stale_key(f"{namespace}:{key}"),
+        near=True,
+        soft_ttl=CACHE_SOFT_TTL
+    )
+
+
+# Negative caching
+#
+# "This does not exist" answers are remembered for a short while under the namespace
+# the missing object would belong to, so creating it bumps the entry away.
+
+NEGATIVE_CACHE_TTL = getattr(settings, "NEGATIVE_CACHE_TTL", 60 * 5)
+
+
+def _missing_key(namespace, key):
+    return namespaced_key(namespace, f"missing:{key}")
+
+
+def is_cached_missing(namespace, key):
+    return cache.get(_missing_key(namespace, key)) is not None
+
+
+def cache_missing(namespace, key, timeout=NEGATIVE_CACHE_TTL):
+    cache.set(_missing_key(namespace, key), True, timeout)
+
+
+def bump_namespace(namespace):
+    """
+        Invalidate every key of a namespace at once.
+    """
+
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), int(time.time()), CACHE_VERSION_TTL)
+    cache.set(_modified_key(namespace), time.time(), CACHE_VERSION_TTL)
+    publish_invalidation([_version_key(namespace)])
+
+
+def bump_namespaces(namespaces):
+    namespaces = list(dict.fromkeys(namespaces))
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.set(_version_key(namespace), int(time.time()), CACHE_VERSION_TTL)
+    cache.set_many({_modified_key(namespace): time.time() for namespace in namespaces}, CACHE_VERSION_TTL)
+    # One message for the whole batch
+    publish_invalidation([_version_key(namespace) for namespace in namespaces])
+
+
+def get_namespace_version_info(namespace):
+    """
+        (version, modified_at timestamp) of a namespace in one round trip.
+        modified_at is None until the namespace is bumped for the first time.
+    """
+
+    found = cache.get_many([_version_key(namespace), _modified_key(namespace)])
+    if _version_key(namespace) not in found:
+        return get_namespace_version(namespace), None
+    return found[_version_key(namespace)], found.get(_modified_key(namespace))
+
+
+def get_namespaces_modified(namespaces):
+    """
+        {namespace: last bump timestamp, or None if never bumped} in one round trip.
+    """
+
+    found = cache.get_many([_modified_key(namespace) for namespace in namespaces])
+    return {namespace: found.get(_modified_key(namespace)) for namespace in namespaces}
+
+
+def get_many_cached_data(keys):
+    """
+        Fetch several keys in one round trip.
+        Returns a dict holding only the keys that were found.
+    """
+
+    return cache.get_many(keys)
+
+
+def set_many_cached_data(data, timeout=CACHE_TTL):
+    """
+        Store a {key: value} mapping in one round trip.
+    """
+
+    cache.set_many(data, timeout)
@@ -1,3 +1,8 @@
 def category_cache_key(category_name: str) -> str:
     """Generate a consistent cache key for a category."""
     return f"products_in_{category_name.lower().replace(' ', '-')}"
+
+
+def category_cache_namespace(category_name: str) -> str:
+    """Cache namespace holding everything derived from one category's products."""
+    return f"category:{category_name.lower().replace(' ', '-')}"
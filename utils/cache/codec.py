@@ -0,0 +1,150 @@
+import json
+import pickle
+import zlib
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Values whose encoded form is at least this big are stored compressed
+CACHE_CODEC_MIN_BYTES = getattr(settings, "CACHE_CODEC_MIN_BYTES", 16 * 1024)
+CACHE_CODEC_SERIALIZER = getattr(settings, "CACHE_CODEC_SERIALIZER", "msgpack" if msgpack else "json")
+CACHE_CODEC_COMPRESSOR = getattr(settings, "CACHE_CODEC_COMPRESSOR", "lz4" if lz4 else "zlib")
+
+# Encoded values are bytes starting with this marker, then one byte each for the
+# serializer and the compressor used
+MAGIC = b"\x00cc"
+
+
+def _json_dumps(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _msgpack_dumps(value):
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _msgpack_loads(data):
+    return msgpack.unpackb(data, raw=False)
+
+
+def _pickle_dumps(value):
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+# id -> (name, dumps, loads, available)
+SERIALIZERS = {
+    1: ("json", _json_dumps, _json_loads, True),
+    2: ("msgpack", _msgpack_dumps, _msgpack_loads, msgpack is not None),
+    3: ("pickle", _pickle_dumps, pickle.loads, True),
+}
+
+COMPRESSORS = {
+    0: ("none", lambda data: data, lambda data: data, True),
+    1: ("zlib", lambda data: zlib.compress(data, 6), zlib.decompress, True),
+    2: ("lz4", lambda data: lz4.frame.compress(data), lambda data: lz4.frame.decompress(data), lz4 is not None),
+}
+
+
+def _find(table, name):
+    for codec_id, (codec_name, *_, available) in table.items():
+        if codec_name == name and available:
+            return codec_id
+    return None
+
+
+def _inspect(value):
+    """
+        One pass over a value without serializing it: (rough encoded size, whether JSON and
+        msgpack give back the same types, whether it carries bytes).
+        Tuples, sets, non-string dict keys and objects only survive pickle.
+    """
+
+    size, plain, has_bytes = 0, True, False
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item) + 2
+        elif item is None or isinstance(item, (bool, int, float)):
+            size += 8
+        elif isinstance(item, (bytes, bytearray)):
+            size += len(item)
+            has_bytes = True
+        elif isinstance(item, dict):
+            size += 2
+            for key, child in item.items():
+                if not isinstance(key, str):
+                    plain = False
+                stack.append(key)
+                stack.append(child)
+        elif isinstance(item, list):
+            size += 2
+            stack.extend(item)
+        elif isinstance(item, (tuple, set, frozenset)):
+            plain = False
+            size += 2
+            stack.extend(item)
+        else:
+            plain = False
+            size += 64
+    return size, plain, has_bytes
+
+
+def encode(value, serializer=None, compressor=None, min_bytes=None):
+    """
+        Encode a value for the cache. Small values are returned untouched (the cache backend
+        pickles them as usual), judged by a size estimate so they are never serialized twice.
+        Big ones are serialized with the configured serializer, or pickle for values it would
+        hand back with other types (tuples, int keys), and compressed.
+        Values carrying bytes (rendered responses, already gzipped) are left untouched too.
+    """
+
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+
+    min_bytes = CACHE_CODEC_MIN_BYTES if min_bytes is None else min_bytes
+    size, plain, has_bytes = _inspect(value)
+    if size < min_bytes or has_bytes:
+        return value
+
+    serializer_id = _find(SERIALIZERS, serializer or CACHE_CODEC_SERIALIZER)
+    if serializer_id is None:
+        serializer_id = 1
+    compressor_id = _find(COMPRESSORS, compressor or CACHE_CODEC_COMPRESSOR)
+    if compressor_id is None:
+        compressor_id = 1
+
+    if not plain:
+        serializer_id = 3
+    try:
+        data = SERIALIZERS[serializer_id][1](value)
+    except (TypeError, ValueError, OverflowError):
+        serializer_id = 3
+        data = _pickle_dumps(value)
+
+    return MAGIC + bytes([serializer_id, compressor_id]) + COMPRESSORS[compressor_id][1](data)
+
+
+def decode(value):
+    """
+        Reverse encode(). Anything that was not encoded is returned as is.
+    """
+
+    if not isinstance(value, bytes) or not value.startswith(MAGIC):
+        return value
+
+    serializer_id, compressor_id = value[len(MAGIC)], value[len(MAGIC) + 1]
+    data = COMPRESSORS[compressor_id][2](value[len(MAGIC) + 2:])
+    return SERIALIZERS[serializer_id][2](data)
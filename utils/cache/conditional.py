@@ -0,0 +1,70 @@
+import hashlib
+from datetime import datetime, timezone
+from django.views.decorators.http import condition
+from .cache import get_namespace_version_info, get_namespace_versions, get_namespaces_modified
+from .rendered import accepts_gzip
+
+
+def _version_info(request, namespaces):
+    """
+        Look the versions up once per request, condition() asks for the ETag and Last-Modified separately.
+        Returns ([version, ...], latest modified_at), modified_at is None unless every namespace was bumped.
+    """
+
+    memo = getattr(request, "_namespace_version_info", None)
+    if memo is None or memo[0] != namespaces:
+        if len(namespaces) == 1:
+            version, modified_at = get_namespace_version_info(namespaces[0])
+            info = ([version], modified_at)
+        else:
+            versions = get_namespace_versions(namespaces)
+            modified = get_namespaces_modified(namespaces)
+            info = (
+                [versions[namespace] for namespace in namespaces],
+                None if None in modified.values() else max(modified.values())
+            )
+        memo = (namespaces, info)
+        request._namespace_version_info = memo
+    return memo[1]
+
+
+def versioned_condition(namespace):
+    """
+        Conditional GET for views whose output only changes when cache namespaces are bumped.
+        `namespace` is a name or a list of names, or a callable taking the request and the
+        view's arguments and returning either. List every namespace the response is built from,
+        and only namespaces of objects that exist: the callable returns None to skip the ETag.
+
+        The strong ETag is derived from the namespace versions, the full path and whether the client
+        takes gzip, so a matching If-None-Match is answered with 304 before the view touches
+        the database or the cached payload.
+    """
+
+    def resolve(request, *args, **kwargs):
+        namespaces = getattr(request, "_versioned_namespaces", None)
+        if namespaces is None:
+            namespaces = namespace(request, *args, **kwargs) if callable(namespace) else namespace
+            if isinstance(namespaces, str):
+                namespaces = [namespaces]
+            namespaces = tuple(namespaces or ())
+            request._versioned_namespaces = namespaces
+        return namespaces
+
+    def etag_func(request, *args, **kwargs):
+        namespaces = resolve(request, *args, **kwargs)
+        if not namespaces:
+            return None
+        versions, _ = _version_info(request, namespaces)
+        raw = f"{':'.join(map(str, versions))}:{request.get_full_path()}:{int(accepts_gzip(request))}"
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        namespaces = resolve(request, *args, **kwargs)
+        if not namespaces:
+            return None
+        _, modified_at = _version_info(request, namespaces)
+        if modified_at is None:
+            return None
+        return datetime.fromtimestamp(modified_at, tz=timezone.utc)
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
@@ -0,0 +1,200 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+NEAR_CACHE_ENABLED = getattr(settings, "NEAR_CACHE_ENABLED", True)
+NEAR_CACHE_MAX_ENTRIES = getattr(settings, "NEAR_CACHE_MAX_ENTRIES", 512)
+NEAR_CACHE_MAX_BYTES = getattr(settings, "NEAR_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+# Upper bound on how long a value may outlive a lost invalidation message
+NEAR_CACHE_TTL = getattr(settings, "NEAR_CACHE_TTL", 60)
+NEAR_CACHE_CHANNEL = getattr(settings, "NEAR_CACHE_CHANNEL", "cache-invalidation")
+
+
+def estimate_size(value):
+    """
+        Rough in-memory size of a cached value, in bytes.
+    """
+
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(8 + estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class NearCache:
+    """
+        Bounded in-process LRU sitting in front of Redis. Entries expire after a TTL and the
+        least recently used ones are evicted once either the entry or byte budget is exceeded.
+    """
+
+    def __init__(self, max_entries=NEAR_CACHE_MAX_ENTRIES, max_bytes=NEAR_CACHE_MAX_BYTES, ttl=NEAR_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[2] < time.monotonic():
+                self._pop(key)
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl=None):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_MISSING = object()
+
+near_cache = NearCache()
+
+
+# Cross-process invalidation
+#
+# Every process keeps its own near cache, so a namespace bump is announced on a Redis
+# pub/sub channel and each process drops its local copy of that namespace's version.
+# Values themselves live under versioned keys and never need to be purged explicitly.
+
+def _redis_url():
+    location = settings.CACHES["default"].get("LOCATION", "")
+    if isinstance(location, (list, tuple)):
+        location = location[0]
+    if redis is None or not str(location).startswith(("redis://", "rediss://", "unix://")):
+        return None
+    return location
+
+
+_publisher = None
+_publisher_pid = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _get_publisher():
+    global _publisher, _publisher_pid
+    if _publisher_pid != os.getpid():
+        _publisher = redis.Redis.from_url(_redis_url())
+        _publisher_pid = os.getpid()
+    return _publisher
+
+
+def publish_invalidation(keys):
+    """
+        Tell every process (this one included) to drop the given near cache keys.
+    """
+
+    for key in keys:
+        near_cache.delete(key)
+
+    if not NEAR_CACHE_ENABLED or _redis_url() is None:
+        return
+
+    try:
+        _get_publisher().publish(NEAR_CACHE_CHANNEL, json.dumps({"keys": list(keys), "pid": os.getpid()}))
+    except Exception as e:
+        print(f"⚠️ Could not publish near cache invalidation: {e}")
+
+
+def _handle_message(data):
+    try:
+        message = json.loads(data)
+    except (TypeError, ValueError):
+        return
+
+    for key in message.get("keys", []):
+        near_cache.delete(key)
+
+
+def _listen(url):
+    while True:
+        try:
+            pubsub = redis.Redis.from_url(url).pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(NEAR_CACHE_CHANNEL)
+            # Messages sent while we were not subscribed are lost, start from scratch
+            near_cache.clear()
+            for message in pubsub.listen():
+                _handle_message(message["data"])
+        except Exception as e:
+            print(f"⚠️ Near cache invalidation listener disconnected: {e}")
+            near_cache.clear()
+            time.sleep(1)
+
+
+def ensure_listener():
+    """
+        Start the invalidation listener of this process, once per process (workers are forked).
+        Returns False when the near cache must not be used.
+    """
+
+    global _listener_pid
+
+    if not NEAR_CACHE_ENABLED:
+        return False
+
+    url = _redis_url()
+    if url is None:
+        # No pub/sub to keep other processes in sync, local invalidation only
+        return True
+
+    if _listener_pid == os.getpid():
+        return True
+
+    with _listener_lock:
+        if _listener_pid != os.getpid():
+            near_cache.clear()
+            threading.Thread(target=_listen, args=(url,), name="near-cache-invalidation", daemon=True).start()
+            _listener_pid = os.getpid()
+    return True
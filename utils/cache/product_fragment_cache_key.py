@@ -0,0 +1,4 @@
+def product_fragment_cache_key(product_id, updated_at, view: str = "full") -> str:
+    """Generate a consistent cache key for one serialized product."""
+    suffix = "" if view == "full" else f"_{view}"
+    return f"product_fragment_{product_id}_{updated_at.timestamp()}{suffix}"
@@ -0,0 +1,3 @@
+def public_products_cache_key(page_size: int, cursor: str = None) -> str:
+    """Generate a consistent cache key for one page of the public catalog."""
+    return f"public_products_{page_size}_{cursor or 'first'}"
@@ -0,0 +1,3 @@
+def related_products_cache_key(product_id) -> str:
+    """Generate a consistent cache key for a product's precomputed related products."""
+    return f"related_products_{product_id}"
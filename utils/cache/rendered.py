@@ -0,0 +1,102 @@
+import gzip
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from .cache import get_or_set_namespaced, refresh_namespaced, CACHE_TTL
+
+CACHE_RENDERED_RESPONSES = getattr(settings, "CACHE_RENDERED_RESPONSES", True)
+CACHE_GZIP_MIN_BYTES = getattr(settings, "CACHE_GZIP_MIN_BYTES", 1024)
+
+
+def accepts_gzip(request):
+    return "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+
+
+def entry_response(entry, request):
+    """
+        Build the response for a cached entry, or None if the entry is not one.
+    """
+
+    if not isinstance(entry, dict):
+        return None
+
+    if "body" in entry:
+        if entry["gzip"] is not None and accepts_gzip(request):
+            response = HttpResponse(entry["gzip"], content_type="application/json", status=entry["status"])
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(entry["body"], content_type="application/json", status=entry["status"])
+
+        if entry["gzip"] is not None:
+            response["Vary"] = "Accept-Encoding"
+        response["Content-Length"] = str(len(response.content))
+        return response
+
+    if "payload" in entry:
+        return Response(entry["payload"], status=entry["status"])
+
+    return None
+
+
+def render_entry(payload, status=200):
+    """
+        Cache entry for a response payload. With CACHE_RENDERED_RESPONSES on, the payload is
+        encoded to JSON once here (and gzipped when large enough) so later hits never re-render it.
+    """
+
+    if not CACHE_RENDERED_RESPONSES:
+        return {"payload": payload, "status": status}
+
+    body = JSONRenderer().render(payload)
+    compressed = gzip.compress(body, compresslevel=6) if len(body) >= CACHE_GZIP_MIN_BYTES else None
+
+    return {"body": body, "gzip": compressed, "status": status}
+
+
+def _entry_builder(build_data, built):
+    def build_entry():
+        data = build_data()
+        if data is None:
+            return None
+        built["data"] = data
+        return render_entry({"status": "success", "message": "ok (from cache)", **data})
+    return build_entry
+
+
+def get_or_set_response(request, namespace, key, build_data, timeout=CACHE_TTL, refresh=None):
+    """
+        Serve a cached "success" response for a namespaced key, building it with build_data()
+        on a miss. Concurrent misses are collapsed into a single rebuild (see get_or_set_cache),
+        and refresh schedules the background rebuild of a soft-expired one.
+        Returns None when build_data() returns None, which is never cached.
+    """
+
+    built = {}
+    entry = get_or_set_namespaced(namespace, key, _entry_builder(build_data, built), timeout, refresh=refresh)
+    if entry is None:
+        return None
+
+    if "data" in built:
+        return Response({"status": "success", "message": "ok", **built["data"]}, status=200)
+
+    return entry_response(entry, request)
+
+
+def warm_response(namespace, key, build_data, timeout=CACHE_TTL):
+    """
+        Make sure the response cached by get_or_set_response() for a key exists, outside any request.
+        Returns True when it had to be built.
+    """
+
+    built = {}
+    get_or_set_namespaced(namespace, key, _entry_builder(build_data, built), timeout)
+    return "data" in built
+
+
+def refresh_response(namespace, key, build_data, timeout=CACHE_TTL):
+    """
+        Rebuild the response cached by get_or_set_response() for a key, from a background task.
+    """
+
+    refresh_namespaced(namespace, key, _entry_builder(build_data, {}), timeout)
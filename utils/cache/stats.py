@@ -0,0 +1,136 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_STATS_ENABLED = getattr(settings, "CACHE_STATS_ENABLED", True)
+# Counters are kept per process and added to the shared totals in Redis this often
+CACHE_STATS_FLUSH_INTERVAL = getattr(settings, "CACHE_STATS_FLUSH_INTERVAL", 10)
+
+# Base key prefix -> family name, first match wins
+KEY_FAMILIES = (
+    ("public_products_", "public_products"),
+    ("all_admin_products", "admin_products"),
+    ("products_in_", "category"),
+    ("all_categories", "categories"),
+    ("user_orders_", "user_orders"),
+    ("all_orders_admin", "staff_orders"),
+    ("all_coupons_admin", "coupons"),
+)
+
+# Durations are counted in microseconds so every counter is an integer
+COUNTERS = (
+    "hits", "near_hits", "stale_hits", "misses", "sets", "deletes",
+    "bytes_set", "lookup_us", "lookups", "builds", "build_us",
+)
+
+# The base key follows the namespace prefixes ("catalog@12:public_products_24_first")
+_FAMILY_PATTERN = re.compile("(?:^|:)(" + "|".join(re.escape(prefix) for prefix, _ in KEY_FAMILIES) + ")")
+_FAMILIES = dict(KEY_FAMILIES)
+
+_local = defaultdict(lambda: defaultdict(int))
+_local_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def key_family(key):
+    """
+        Family of a cache key, ignoring its namespace versions. None for keys we do not track.
+    """
+
+    match = _FAMILY_PATTERN.search(key)
+    return _FAMILIES[match.group(1)] if match else None
+
+
+def record(key, **counters):
+    """
+        Add to the counters of the key's family, e.g. record(key, hits=1, lookup_us=120).
+    """
+
+    if not CACHE_STATS_ENABLED:
+        return
+
+    family = key_family(key)
+    if family is None:
+        return
+
+    with _local_lock:
+        totals = _local[family]
+        for name, value in counters.items():
+            totals[name] += int(value)
+
+    if time.monotonic() - _last_flush >= CACHE_STATS_FLUSH_INTERVAL:
+        flush_cache_stats()
+
+
+def elapsed_us(started):
+    return (time.monotonic() - started) * 1_000_000
+
+
+def _stats_key(family, name):
+    return f"cache_stats:{family}:{name}"
+
+
+def flush_cache_stats():
+    """
+        Move this process's counters into the shared totals.
+    """
+
+    global _last_flush
+
+    with _local_lock:
+        pending = {family: dict(totals) for family, totals in _local.items()}
+        _local.clear()
+        _last_flush = time.monotonic()
+
+    try:
+        for family, totals in pending.items():
+            for name, value in totals.items():
+                if not value:
+                    continue
+                key = _stats_key(family, name)
+                cache.add(key, 0, None)
+                cache.incr(key, value)
+    except Exception as e:
+        print(f"⚠️ Could not flush cache stats: {e}")
+
+
+def get_cache_stats():
+    """
+        Totals per key family across every process, with hit ratio, average payload size and
+        average lookup and rebuild times worked out.
+    """
+
+    flush_cache_stats()
+
+    families = [family for _, family in KEY_FAMILIES]
+    keys = [_stats_key(family, name) for family in families for name in COUNTERS]
+    found = cache.get_many(keys)
+
+    stats = {}
+    for family in families:
+        totals = {name: found.get(_stats_key(family, name), 0) for name in COUNTERS}
+        served = totals["hits"] + totals["near_hits"] + totals["stale_hits"]
+        requests = served + totals["misses"]
+        stats[family] = {
+            "hits": totals["hits"],
+            "near_hits": totals["near_hits"],
+            "stale_hits": totals["stale_hits"],
+            "misses": totals["misses"],
+            "sets": totals["sets"],
+            "deletes": totals["deletes"],
+            "hit_ratio": round(served / requests, 4) if requests else None,
+            "bytes_set": totals["bytes_set"],
+            "avg_payload_bytes": totals["bytes_set"] // totals["sets"] if totals["sets"] else None,
+            "avg_lookup_ms": round(totals["lookup_us"] / totals["lookups"] / 1000, 3) if totals["lookups"] else None,
+            "avg_build_ms": round(totals["build_us"] / totals["builds"] / 1000, 3) if totals["builds"] else None,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    with _local_lock:
+        _local.clear()
+    cache.delete_many([_stats_key(family, name) for _, family in KEY_FAMILIES for name in COUNTERS])
@@ -0,0 +1,27 @@
+from django.conf import settings
+
+SURROGATE_KEY_HEADER = "Surrogate-Key"
+# How long anonymous responses are kept by the response cache middleware and a CDN
+ANON_RESPONSE_CACHE_TTL = getattr(settings, "ANON_RESPONSE_CACHE_TTL", 60 * 10)
+# How long browsers may reuse them without revalidating
+ANON_RESPONSE_MAX_AGE = getattr(settings, "ANON_RESPONSE_MAX_AGE", 60)
+
+
+def product_surrogate_key(product_id):
+    return f"product:{product_id}"
+
+
+def tag_response(response, *keys):
+    """
+        Mark a response as cacheable for anonymous visitors and tag it with surrogate keys.
+        Keys are cache namespaces: bumping any of them purges the response (see
+        core.middleware.AnonymousResponseCacheMiddleware) and can be forwarded to a CDN.
+    """
+
+    existing = response.get(SURROGATE_KEY_HEADER, "").split()
+    response[SURROGATE_KEY_HEADER] = " ".join(dict.fromkeys(existing + [key for key in keys if key]))
+    return response
+
+
+def get_surrogate_keys(response):
+    return response.get(SURROGATE_KEY_HEADER, "").split()
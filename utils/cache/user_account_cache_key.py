@@ -0,0 +1,3 @@
+def user_account_cache_key(user_id) -> str:
+    """Generate a consistent cache key for an authenticated user and their account"""
+    return f"user_account_{user_id}"
@@ -1,3 +1,8 @@
 def user_orders_cache_key(user_id: int) -> str:
     """Generate a consistent cache key for a user's orders"""
-    return f"user_orders_{user_id}"
\ No newline at end of file
+    return f"user_orders_{user_id}"
+
+
+def user_orders_cache_namespace(user_id: int) -> str:
+    """Cache namespace holding everything derived from a user's orders"""
+    return f"user-orders:{user_id}"
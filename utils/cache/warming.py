@@ -0,0 +1,32 @@
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# name -> dotted path of a function that rebuilds that family of cached responses if missing
+CACHE_WARMERS = getattr(settings, "CACHE_WARMERS", {})
+
+
+def get_warmer_names():
+    return list(CACHE_WARMERS)
+
+
+def warm_caches(names=None):
+    """
+        Run the given cache warmers (all of them by default).
+        Returns {name: seconds taken}, or the error message for warmers that failed.
+    """
+
+    results = {}
+    for name in names or get_warmer_names():
+        if name not in CACHE_WARMERS:
+            results[name] = "unknown cache warmer"
+            continue
+
+        started = time.monotonic()
+        try:
+            import_string(CACHE_WARMERS[name])()
+            results[name] = round(time.monotonic() - started, 3)
+        except Exception as e:
+            print(f"⚠️ Cache warmer {name} failed: {e}")
+            results[name] = str(e)
+    return results
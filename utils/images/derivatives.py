@@ -0,0 +1,68 @@
+import os
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+DERIVATIVE_WIDTHS = getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", [320, 640, 1024])
+
+# format name -> (Pillow format, extension, quality)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "webp", 80),
+    "jpeg": ("JPEG", "jpg", 82),
+}
+
+
+def derivative_name(name, width, fmt):
+    base, _ = os.path.splitext(name)
+    return f"{base}__w{width}.{DERIVATIVE_FORMATS[fmt][1]}"
+
+
+def build_derivatives(name, storage=default_storage):
+    """
+        Resize a stored image to every configured width, in WebP and JPEG.
+        Widths above the original are skipped, so nothing is ever upscaled.
+
+        Returns {"webp": {"320": "<name>", ...}, "jpeg": {...}}.
+    """
+
+    with storage.open(name, "rb") as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    widths = [width for width in DERIVATIVE_WIDTHS if width < original.width] or [original.width]
+
+    variants = {fmt: {} for fmt in DERIVATIVE_FORMATS}
+    for width in widths:
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.LANCZOS)
+
+        for fmt, (pillow_format, _, quality) in DERIVATIVE_FORMATS.items():
+            image = resized
+            if pillow_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+
+            buffer = BytesIO()
+            image.save(buffer, pillow_format, quality=quality, optimize=True)
+
+            target = derivative_name(name, width, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            variants[fmt][str(width)] = storage.save(target, ContentFile(buffer.getvalue()))
+
+    return variants
+
+
+def delete_derivatives(variants, storage=default_storage):
+    for sizes in (variants or {}).values():
+        for name in sizes.values():
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def derivative_urls(variants, storage=default_storage):
+    return {
+        fmt: {width: storage.url(name) for width, name in sizes.items()}
+        for fmt, sizes in (variants or {}).items()
+    }
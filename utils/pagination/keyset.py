@@ -0,0 +1,102 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk, direction):
+    """
+        Build an opaque cursor pointing at a (created_at, id) position.
+        `direction` is "n" for the next page and "p" for the previous one.
+    """
+
+    raw = json.dumps([created_at.isoformat(), str(pk), direction], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+        Turn a cursor produced by encode_cursor back into (created_at, id, direction).
+        Raises InvalidCursor if the value was tampered with or is malformed.
+        Ids are UUIDs, like the primary keys of the products paged through.
+    """
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(created_at)
+        pk = uuid.UUID(pk)
+    except (ValueError, TypeError, AttributeError, binascii.Error):
+        raise InvalidCursor("Invalid cursor")
+
+    # encode_cursor always writes aware timestamps (USE_TZ)
+    if created_at.tzinfo is None or direction not in ("n", "p"):
+        raise InvalidCursor("Invalid cursor")
+
+    return created_at, pk, direction
+
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+        Parse a ?limit= value, falling back to the default and capping at maximum.
+    """
+
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+
+    if size < 1:
+        return default
+    return min(size, maximum)
+
+
+def paginate_keyset(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+        Keyset pagination over (created_at, id), newest first.
+        Only the rows of the requested page (plus one look-ahead row) are fetched,
+        so the cost of a page does not grow with its depth in the catalog.
+
+        Returns (items, next_cursor, previous_cursor).
+    """
+
+    if cursor:
+        created_at, pk, direction = decode_cursor(cursor)
+    else:
+        created_at, pk, direction = None, None, "n"
+
+    if direction == "n":
+        page = queryset.order_by("-created_at", "-id")
+        if created_at is not None:
+            page = page.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        items = list(page[:page_size + 1])
+        has_next = len(items) > page_size
+        has_previous = created_at is not None
+        items = items[:page_size]
+    else:
+        page = queryset.order_by("created_at", "id").filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        )
+        items = list(page[:page_size + 1])
+        has_previous = len(items) > page_size
+        has_next = True
+        items = items[:page_size][::-1]
+
+    next_cursor = None
+    previous_cursor = None
+    if items:
+        if has_next:
+            next_cursor = encode_cursor(items[-1].created_at, items[-1].pk, "n")
+        if has_previous:
+            previous_cursor = encode_cursor(items[0].created_at, items[0].pk, "p")
+
+    return items, next_cursor, previous_cursor